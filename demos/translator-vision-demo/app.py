@@ -10,38 +10,26 @@ import grpc
 import time
 
 # Add example/python to sys.path for imports
-import helpers.chat as chat
+import helpers.cache as cache
+import helpers.chunking as chunking
 import helpers.config as config
-import helpers.model as model
 import superbuilder_service_pb2 as sb
 import superbuilder_service_pb2_grpc as sbg
 import json
 
 
 
-def split_text_batches(text, batch_size=200):
-    '''
-    Helper to split text into batches of ~200 chars, only at newlines
-    '''
-    lines = text.splitlines(keepends=True)
-    batches = []
-    current = ''
-    for line in lines:
-        if len(current) + len(line) > batch_size and current:
-            batches.append(current)
-            current = ''
-        current += line
-    if current:
-        batches.append(current)
-    return batches
-
 success = False
 stub = None
 channel = None
 active_model = None
 
 MAX_CONTENT_LENGTH = 5000
-BATCH_SIZE = 200
+# Token budget of one translation batch; batches end at sentence boundaries where possible
+BATCH_MAX_TOKENS = 200
+# Number of batches requested ahead, so the next one is queued while the current one streams
+PREFETCH_BATCHES = 2
+TRANSLATE_PROMPT = "Help me translate the following text into American English. Do not show thinking. </no_think>\n\n {text}"
 ST_LOADING_HTML = sthelpers.get_loading_gif()
 
 def main():
@@ -181,8 +169,6 @@ def main():
     # Ensure session state attributes are initialized
     if 'translated_batches' not in session_state:
         session_state.translated_batches = []
-    if 'batches' not in session_state:
-        session_state.batches = []
 
     col1, col2 = st.columns([1, 1])
 
@@ -198,27 +184,14 @@ def main():
                 st.warning("No input text to translate.")
             else:
 
-                # If model is not loaded, trigger model loading
-                if not session_state.model_loaded:
+                # If model is not loaded (or the vision page switched to the VLM), trigger model loading
+                if not stub:
+                    success, stub, channel = sthelpers.aab_connect()
+                if not session_state.model_loaded or not sthelpers.models_resident(stub, sthelpers.TRANSLATOR_MODELS):
                     session_state.model_loading = True
                     session_state.pending_translation = {"input_text": input_text}
                     st.rerun()
-                else:
-                    # Prepare batches for translation
-                    batches = split_text_batches(input_text, BATCH_SIZE)
-                    session_state.batches = batches
-                    session_state.translated_batches = [None] * len(batches)
-                    session_state.streaming_text = ''
-                    session_state.translating = True
-                    session_state.translation_step_done = False
-                    st.rerun()                
-                # Prepare batches for translation
-                batches = split_text_batches(input_text, BATCH_SIZE)
-                session_state.batches = batches
-                session_state.translated_batches = [None] * len(batches)
-                session_state.streaming_text = ''
-                session_state.translating = True
-                session_state.translation_step_done = False
+                start_translation(input_text)
                 st.rerun()
 
     import random, string
@@ -243,7 +216,8 @@ def main():
                 success, stub, channel = sthelpers.aab_connect()
 
             try:
-                print(model.set_model(stub, sthelpers.DEFAULT_MODEL_PATH, sthelpers.DEFAULT_LLM, sthelpers.DEFAULT_EMBEDDER, sthelpers.DEFAULT_RANKER))
+                # Skips SetModels when another session or page already loaded the translator models
+                sthelpers.get_model_manager(stub).ensure(sthelpers.TRANSLATOR_MODELS)
             except Exception as e:
                 st.error(f"Error loading model: {e}. Default model will be used.")
 
@@ -252,23 +226,12 @@ def main():
             # If translation was pending, start it now
             pending = session_state.pop("pending_translation", None)
             if pending:
-                batches = split_text_batches(pending["input_text"], BATCH_SIZE)
-                session_state.batches = batches
-                session_state.translated_batches = [None] * len(batches)
-                session_state.streaming_text = ''
-                session_state.translating = True
-                session_state.translation_step_done = False
+                start_translation(pending["input_text"])
                 st.rerun()
             else:
                 st.rerun()
             st.stop()
 
-         # Always define translating before use
-        translating = session_state.get('translating', False)
-        batches = session_state.batches if translating else []
-        translated_batches = session_state.translated_batches if translating else []
-        next_batch_idx = None
-
         # Always show the right panel, even if no translation yet
         right_panel_container = st.container()
         # Default: show empty or previous translation
@@ -287,14 +250,6 @@ def main():
                 '<span style="font-size:1.05rem;color:#2563eb;vertical-align:middle;">Loading model... Please wait.</span>'
                 '</div>'
             )
-        elif translating and next_batch_idx is not None and not session_state.get('translation_step_done', False):
-            # Only show spinner if translating and translation_step_done is False (about to do translation)
-            spinner_html = (
-                '<div style="background-color:#e6f0fa;padding:12px 16px;border-radius:6px;margin-bottom:8px;display:flex;align-items:center;">'
-                f'{ST_LOADING_HTML}'
-                '<span style="font-size:1.05rem;color:#2563eb;vertical-align:middle;">Translating... Please wait.</span>'
-                '</div>'
-            )            
         if spinner_html:
             right_panel_container.markdown(spinner_html, unsafe_allow_html=True)
 
@@ -303,19 +258,12 @@ def main():
         # Always show the right panel's text area and spinner if needed
         right_panel_text = session_state.get('streaming_text', '')
         text_placeholder.text_area("Translated Content", right_panel_text, height=450, key="right_text_stream")
+        if session_state.get('translation_error'):
+            right_panel_container.error(session_state.translation_error)
 
-        # Streaming logic: if translating, do one step per rerun
-        translating = session_state.get('translating', False)
-        batches = session_state.batches if translating else None
-        translated_batches = session_state.translated_batches if translating else None
-        next_batch_idx = None
-        if translating:
-            for i, t in enumerate(translated_batches):
-                if t is None:
-                    next_batch_idx = i
-                    break
-
-        if translating and next_batch_idx is not None:
+        # Streaming logic: drain the background pipeline until every batch is translated
+        pipeline = session_state.get('translation_pipeline') if session_state.get('translating', False) else None
+        if pipeline is not None:
             # Show spinner
             spinner_html = (
                 '<div style="background-color:#e6f0fa;padding:12px 16px;border-radius:6px;margin-bottom:8px;display:flex;align-items:center;">'
@@ -326,36 +274,52 @@ def main():
             right_panel_container.markdown(spinner_html, unsafe_allow_html=True)
             scroll_right_panel_textarea()
 
-            # Step 1: If translation_step_done is False, set it True and rerun (to show spinner)
-            if not session_state.get('translation_step_done', False):
-                session_state.translation_step_done = True
-                st.rerun()
-            # Step 2: If translation_step_done is True, do the translation step
-            else:
-                if not stub:
-                    success, stub, channel = sthelpers.aab_connect()
+            shown_text = right_panel_text
+            while not pipeline.done:
+                if pipeline.poll() and pipeline.text != shown_text:
+                    shown_text = pipeline.text
+                    text_placeholder.text_area("Translated Content", shown_text, height=450)
+            if pipeline.error is not None:
+                session_state.translation_error = f"Translation error: {pipeline.error}"
 
-                # --- Perform translation step ---
-                prompt = f"Help me translate the following text into American English. Do not show thinking. </no_think>\n\n {batches[next_batch_idx]}"
-                response_iter = chat.set_chat_request(stub, prompt)
-                
-                translated = sthelpers.stream_and_parse_translation(
-                    chat.get_chat_response(response_iter, verbose=False),
-                    text_placeholder,
-                    session_state.translated_batches
-                )
-                channel.close()
-                session_state.translated_batches[next_batch_idx] = translated
-                session_state.streaming_text = '\n'.join([t for t in session_state.translated_batches if t])
-                session_state.translation_step_done = False  # Reset for next batch
-                st.rerun()
-        elif translating:
             # All batches done
+            session_state.translated_batches = pipeline.translated
+            session_state.streaming_text = pipeline.text
             session_state.translating = False
-            session_state.translation_step_done = False
-            session_state.streaming_text = '\n'.join([t for t in session_state.translated_batches if t])
+            session_state.pop('translation_pipeline', None)
+            st.rerun()
 
 
+@st.cache_resource
+def get_response_cache():
+    """
+    Opens the on-disk response cache once per Streamlit server, so re-translated text is replayed instantly.
+    """
+    return cache.ResponseCache()
+
+
+def start_translation(input_text):
+    """
+    Splits the input into batches and starts translating them in the background over the shared connection.
+    """
+    global success, stub, channel
+    session_state = st.session_state
+    if not stub:
+        success, stub, channel = sthelpers.aab_connect()
+
+    batches = list(chunking.chunk_text(input_text, max_tokens=BATCH_MAX_TOKENS))
+    prompts = [TRANSLATE_PROMPT.format(text=batch) for batch in batches]
+    # The whitespace after each batch (a space, a line break or a blank line) joins its translation to the next
+    separators = [batch[len(batch.rstrip()):] for batch in batches]
+    session_state.translated_batches = [None] * len(batches)
+    session_state.streaming_text = ''
+    session_state.translation_error = None
+    session_state.translating = True
+    session_state.translation_pipeline = sthelpers.TranslationPipeline(
+        stub, prompts, prefetch=PREFETCH_BATCHES, cache=get_response_cache(), models=sthelpers.TRANSLATOR_MODELS,
+        separators=separators
+    ).start()
+
 
 # Reusable function to inject JS for auto-scrolling the right panel textarea
 def scroll_right_panel_textarea():
@@ -11,7 +11,6 @@ import grpc
 
 # Add example/python to sys.path for imports (adjust path as needed)
 import helpers.config as config
-import helpers.model as model
 import helpers.chat as chat
 import tempfile
 import shutil
@@ -91,6 +90,14 @@ if uploaded_file is not None:
         st.session_state["vision_result"] = None
         st.session_state["run_vision"] = False
         st.session_state["last_uploaded_filename"] = uploaded_file.name
+        # Load the VLM in the background while the user writes the prompt
+        if not stub:
+            success, stub, channel = sthelpers.aab_connect()
+        if success:
+            try:
+                sthelpers.get_model_manager(stub).prewarm(sthelpers.VISION_MODELS)
+            except grpc.RpcError:
+                pass
 
 # --- Two Panel Layout ---
 if uploaded_file:
@@ -179,7 +186,8 @@ if uploaded_file:
             if not stub:
                 success, stub, channel = sthelpers.aab_connect()
             try:
-                print(model.set_model(stub, sthelpers.DEFAULT_MODEL_PATH, sthelpers.DEFAULT_VLM, sthelpers.DEFAULT_EMBEDDER, sthelpers.DEFAULT_RANKER))
+                # Skips SetModels when another session already loaded the VLM
+                sthelpers.get_model_manager(stub).ensure(sthelpers.VISION_MODELS)
             except Exception as e:
                 st.error(f"Error loading model: {e}. Default model will be used.")
             st.session_state.vlm_loading = False
@@ -200,6 +208,8 @@ if uploaded_file:
                             unsafe_allow_html=True
                         )  
 
+                        # One GetClientConfig call confirms the VLM is still resident; reloads it if another page or client switched models since
+                        sthelpers.get_model_manager(stub).ensure(sthelpers.VISION_MODELS)
                         image_prompt_option = chat.get_prompt_options({'name': 'QueryImagesPrompt'})
                         response_iter = chat.set_chat_request(stub, prompt=prompt, session_id=None, attachments=attachedFiles, prompt_options=image_prompt_option)
                         result = sthelpers.parse_streaming_response(chat.get_chat_response(response_iter, verbose=False))
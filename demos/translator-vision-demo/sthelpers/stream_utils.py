@@ -1,10 +1,15 @@
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'example', 'python')))
+import contextlib
 import json
+import queue
+import threading
 import grpc
 
 import helpers.mw as mw
+import helpers.batch as batch
+import helpers.model_manager as model_manager
 
 # Constants
 
@@ -15,6 +20,8 @@ DEFAULT_VLM = "Phi-3.5-vision-instruct-int4-ov"
 DEFAULT_LLM = 'Qwen3-8B-int4-ov'
 DEFAULT_EMBEDDER = 'bge-base-en-v1.5-int8-ov'
 DEFAULT_RANKER = 'bge-reranker-base-int8-ov'
+TRANSLATOR_MODELS = model_manager.ModelSet(DEFAULT_LLM, DEFAULT_EMBEDDER, DEFAULT_RANKER)
+VISION_MODELS = model_manager.ModelSet(DEFAULT_VLM, DEFAULT_EMBEDDER, DEFAULT_RANKER)
 
 LOADING_GIF=os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'loading_animation.gif'))
 
@@ -27,11 +34,31 @@ def get_loading_gif():
     return gif_html
 
 def aab_connect():
+    """
+    Returns the process-wide pooled client, so Streamlit reruns and sessions share one middleware connection.
+    The client stands in for both the stub and the channel; do not close it between requests.
+    """
     global success, stub, channel
-    channel = grpc.insecure_channel(GRPC_ADDRESS)
-    success, stub = mw.connect(channel)
+    success, stub = mw.connect_pool(GRPC_ADDRESS)
+    channel = stub
     return success, stub, channel
 
+def get_model_manager(stub):
+    """
+    Returns the process-wide model manager, so both pages and all sessions know which models are loaded
+    and switching pages only reloads models when the other page's models are resident.
+    """
+    return model_manager.get_shared_manager(stub, DEFAULT_MODEL_PATH)
+
+def models_resident(stub, models):
+    """
+    Returns True if the given ModelSet is loaded; False if not, or if the middleware cannot be asked.
+    """
+    try:
+        return get_model_manager(stub).is_resident(models)
+    except grpc.RpcError:
+        return False
+
 def parse_streaming_response(response_iter):
     reply = ""
     for resp in response_iter:
@@ -67,3 +94,83 @@ def stream_and_parse_translation(response_iter, text_placeholder, translated_bat
 
     return reply
 
+class TranslationPipeline:
+    """
+    Translates a list of prompts in a background thread over the shared connection.
+
+    Up to `prefetch` batches are requested at once, so the next batch is already queued at the
+    middleware while the current one streams. Tokens are pushed to a queue; the Streamlit script
+    drains it with poll() and redraws, instead of rerunning once per batch. With a ResponseCache,
+    batches translated before are replayed from disk instead of going through the LLM again.
+    With `models`, the run holds them through the model manager, so no other page or prewarm
+    switches models while batches are still being translated. `separators` are the whitespace
+    that followed each batch in the source text, used to join the translations (default: a newline).
+    """
+    def __init__(self, stub, prompts, prefetch=2, cache=None, models=None, separators=None):
+        self._stub = stub
+        self._models = models
+        self._cache = cache
+        self._prompts = list(prompts)
+        self._prefetch = prefetch
+        self._events = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._separators = ['\n'] * len(self._prompts) if separators is None else list(separators)
+        self.partial = [''] * len(self._prompts)
+        self.translated = [None] * len(self._prompts)
+        self.error = None
+        self.done = False
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            with contextlib.ExitStack() as stack:
+                if self._models is not None:
+                    stack.enter_context(get_model_manager(self._stub).use(self._models))
+                results = batch.run_batch(
+                    self._stub, self._prompts, concurrency=self._prefetch, ordered=True, cache=self._cache,
+                    on_token=lambda index, token: self._events.put(("token", index, token))
+                )
+                for result in results:
+                    if result.error is not None:
+                        raise result.error
+                    self._events.put(("batch", result.index, result.text))
+        except Exception as e:
+            self._events.put(("error", None, e))
+        finally:
+            self._events.put(("done", None, None))
+
+    def poll(self, timeout=0.05):
+        """
+        Applies all pending events, waiting up to `timeout` seconds for the first one.
+
+        Returns:
+            True if the translated text changed.
+        """
+        changed = False
+        try:
+            event = self._events.get(timeout=timeout)
+            while True:
+                kind, index, value = event
+                if kind == "token":
+                    self.partial[index] += value
+                    changed = True
+                elif kind == "batch":
+                    # The final text replaces whatever was streamed (a retried batch streams twice)
+                    self.partial[index] = self.translated[index] = value
+                    changed = True
+                elif kind == "error":
+                    self.error = value
+                elif kind == "done":
+                    self.done = True
+                event = self._events.get_nowait()
+        except queue.Empty:
+            pass
+        return changed
+
+    @property
+    def text(self):
+        # Batches end mid-paragraph, so each translation is followed by its batch's own separator
+        return ''.join([t.rstrip() + separator for t, separator in zip(self.partial, self._separators) if t]).rstrip()
@@ -0,0 +1,298 @@
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import grpc
+import superbuilder_service_pb2 as sb
+import helpers.chat as chat
+import helpers.config as config
+import helpers.mw as mw
+from helpers.pool import SuperBuilderClient
+from helpers.retry import RetryInterceptor
+
+# Client-side benchmark of the middleware: chat time to first token, inter-token latency and tokens/s
+# per workflow, and latency percentiles of the other RPCs. Results are written as JSON and can be
+# compared with an earlier run to catch regressions after a model or middleware update.
+# Usage: python benchmark.py [--requests 10] [--concurrency 2] [--output run.json] [--compare baseline.json]
+
+WORKFLOWS = {
+    "generic": "GenericPrompt",
+    "summarize": "SummarizePrompt",
+    "query_tables": "QueryTablesPrompt",
+    "query_images": "QueryImagesPrompt",
+    "score_documents": "ScoreDocumentsPrompt",
+    "score_resumes": "ScoreResumesPrompt",
+}
+UNARY_RPCS = {
+    "GetFileList": lambda stub: stub.GetFileList(sb.GetFileListRequest(fileType="")),
+    "GetChatHistory": lambda stub: stub.GetChatHistory(sb.GetChatHistoryRequest()),
+    "LoadModels": lambda stub: stub.LoadModels(sb.LoadModelsRequest()),
+}
+# Metrics compared by --compare, with True when higher is better
+COMPARED_METRICS = {"latency": False, "ttft": False, "inter_token_latency": False, "tokens_per_second": True}
+
+def percentile(values, p):
+    """
+    Returns the p-th percentile (0-100) of the values, interpolating linearly between ranks.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def summarize(values):
+    """
+    Returns count, mean, min, p50, p95, p99 and max of a list of samples.
+    """
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values), "mean": sum(values) / len(values), "min": min(values),
+        "p50": percentile(values, 50), "p95": percentile(values, 95), "p99": percentile(values, 99), "max": max(values),
+    }
+
+def _run_concurrently(func, requests, concurrency):
+    # Runs func() 'requests' times on 'concurrency' threads; returns (results, errors, wall time)
+    results, errors = [], {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(func) for _ in range(requests)]:
+            try:
+                results.append(future.result())
+            except grpc.RpcError as e:
+                errors[e.code().name] = errors.get(e.code().name, 0) + 1
+    return results, errors, time.perf_counter() - start
+
+def bench_chat(stub, prompt, workflow="generic", requests=10, concurrency=1, attachments=None):
+    """
+    Streams the same prompt 'requests' times and measures every response.
+
+    Args:
+        stub: The gRPC stub (or pooled client) for making requests to the server.
+        prompt (str): The prompt to send.
+        workflow (str): A key of WORKFLOWS (default is "generic").
+        requests (int): The number of chats (default is 10).
+        concurrency (int): The number of chats streaming at once (default is 1).
+        attachments: File paths to attach, None for the whole knowledge base (optional).
+
+    Returns:
+        dict: Summaries of latency, ttft, inter_token_latency, tokens and tokens_per_second,
+            plus the error counts and the aggregate throughput.
+    """
+    prompt_options = chat.get_prompt_options({"name": WORKFLOWS[workflow]})
+    attached_files = json.dumps([os.path.abspath(path) for path in attachments]) if attachments is not None else None
+
+    def one_chat():
+        request = sb.ChatRequest(name="Benchmark", prompt=prompt, sessionId=chat.init_chat_session(stub, fetch_history=False),
+                                 promptOptions=prompt_options, attachedFiles=attached_files)
+        start = time.perf_counter()
+        first = last = None
+        gaps = []
+        tokens = 0
+        for _response in stub.Chat(request):
+            now = time.perf_counter()
+            if first is None:
+                first = now
+            else:
+                gaps.append(now - last)
+            last = now
+            tokens += 1
+        end = time.perf_counter()
+        streaming = end - first if first is not None else 0
+        return {
+            "latency": end - start,
+            "ttft": first - start if first is not None else None,
+            "gaps": gaps,
+            "tokens": tokens,
+            # Decode rate after the first token, the number a model change moves
+            "tokens_per_second": (tokens - 1) / streaming if tokens > 1 and streaming > 0 else None,
+        }
+
+    runs, errors, wall = _run_concurrently(one_chat, requests, concurrency)
+    total_tokens = sum(run["tokens"] for run in runs)
+    return {
+        "workflow": WORKFLOWS[workflow],
+        "latency": summarize([run["latency"] for run in runs]),
+        "ttft": summarize([run["ttft"] for run in runs if run["ttft"] is not None]),
+        "inter_token_latency": summarize([gap for run in runs for gap in run["gaps"]]),
+        "tokens": summarize([run["tokens"] for run in runs]),
+        "tokens_per_second": summarize([run["tokens_per_second"] for run in runs if run["tokens_per_second"] is not None]),
+        "aggregate_tokens_per_second": total_tokens / wall if wall > 0 else None,
+        "errors": errors,
+    }
+
+def bench_unary(stub, rpc, requests=10, concurrency=1):
+    """
+    Calls one of UNARY_RPCS 'requests' times and returns its latency summary, response size and errors.
+    """
+    call = UNARY_RPCS[rpc]
+
+    def one_call():
+        start = time.perf_counter()
+        response = call(stub)
+        return time.perf_counter() - start, response.ByteSize()
+
+    runs, errors, wall = _run_concurrently(one_call, requests, concurrency)
+    return {
+        "latency": summarize([latency for latency, _size in runs]),
+        "response_bytes": summarize([size for _latency, size in runs]),
+        "calls_per_second": len(runs) / wall if wall > 0 else None,
+        "errors": errors,
+    }
+
+def bench_add_files(stub, file_paths, requests=1, concurrency=1, remove_after=True):
+    """
+    Uploads the files 'requests' times, measuring the whole AddFiles stream; with remove_after the
+    files are removed again after each upload so every run embeds them anew.
+    """
+    absolute_paths = [os.path.abspath(path) for path in file_paths]
+    total_bytes = sum(os.path.getsize(path) for path in absolute_paths)
+
+    def one_upload():
+        start = time.perf_counter()
+        first = None
+        messages = 0
+        for _response in stub.AddFiles(sb.AddFilesRequest(filesToUpload=json.dumps(absolute_paths))):
+            if first is None:
+                first = time.perf_counter()
+            messages += 1
+        latency = time.perf_counter() - start
+        if remove_after:
+            stub.RemoveFiles(sb.RemoveFilesRequest(filesToRemove=json.dumps(absolute_paths)))
+        return latency, (first - start) if first is not None else None, messages
+
+    runs, errors, _wall = _run_concurrently(one_upload, requests, concurrency)
+    latencies = [latency for latency, _first, _messages in runs]
+    return {
+        "files": len(absolute_paths),
+        "bytes": total_bytes,
+        "latency": summarize(latencies),
+        "first_progress": summarize([first for _latency, first, _messages in runs if first is not None]),
+        "stream_messages": summarize([messages for _latency, _first, messages in runs]),
+        "files_per_second": summarize([len(absolute_paths) / latency for latency in latencies if latency > 0]),
+        "bytes_per_second": summarize([total_bytes / latency for latency in latencies if latency > 0]),
+        "errors": errors,
+    }
+
+def compare(baseline, current, threshold=0.1):
+    """
+    Compares the p50 and p95 of the metrics in COMPARED_METRICS between two benchmark results.
+
+    Returns:
+        list: (benchmark, metric, statistic, baseline value, current value, relative change, is_regression)
+            for every value present in both runs; a regression is a change for the worse beyond threshold.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            for statistic in ("p50", "p95"):
+                old = base.get(metric, {}).get(statistic)
+                new = result.get(metric, {}).get(statistic)
+                if not old or new is None:
+                    continue
+                change = (new - old) / old
+                worse = -change if higher_is_better else change
+                rows.append((name, metric, statistic, old, new, change, worse > threshold))
+    return rows
+
+def run(stub, prompt, workflows=("generic",), rpcs=tuple(UNARY_RPCS), requests=10, concurrency=1, files=None, attachments=None):
+    """
+    Runs the selected benchmarks and returns the JSON-serializable report.
+    """
+    try:
+        model = config.get_active_model(stub)
+    except (grpc.RpcError, KeyError, ValueError):
+        model = None
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(), "model": model, "requests": requests,
+            "concurrency": concurrency, "prompt": prompt, "python": platform.python_version(), "platform": platform.platform(),
+        },
+        "results": {},
+    }
+    for workflow in workflows:
+        report["results"][f"Chat[{WORKFLOWS[workflow]}]"] = bench_chat(stub, prompt, workflow, requests, concurrency, attachments)
+    for rpc in rpcs:
+        report["results"][rpc] = bench_unary(stub, rpc, requests, concurrency)
+    if files:
+        report["results"]["AddFiles"] = bench_add_files(stub, files, max(1, requests // 10), 1)
+    return report
+
+def _ms(value):
+    return f"{value * 1000:9.1f}" if value is not None else f"{'-':>9}"
+
+def print_report(report):
+    print(f"model: {report['meta']['model']}, requests: {report['meta']['requests']}, concurrency: {report['meta']['concurrency']}")
+    print(f"{'benchmark':<28} {'metric':<20} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  errors")
+    for name, result in report["results"].items():
+        for metric in ("ttft", "inter_token_latency", "latency"):
+            if metric in result and result[metric].get("count"):
+                summary = result[metric]
+                print(f"{name:<28} {metric:<20} {_ms(summary['p50'])} {_ms(summary['p95'])} {_ms(summary['p99'])}  {result['errors'] or ''}")
+        tokens_per_second = result.get("tokens_per_second", {})
+        if tokens_per_second.get("count"):
+            print(f"{name:<28} {'tokens/s (p50)':<20} {tokens_per_second['p50']:9.1f}   aggregate {result['aggregate_tokens_per_second']:.1f} tokens/s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SuperBuilder middleware from the client side.")
+    parser.add_argument("--address", default=mw.GRPC_ADDRESS, help="Middleware address")
+    parser.add_argument("--prompt", default="Write three sentences about local AI assistants.", help="Chat prompt")
+    parser.add_argument("--workflows", default="generic", help=f"Comma separated chat workflows: {', '.join(WORKFLOWS)}, or 'none'")
+    parser.add_argument("--rpcs", default=",".join(UNARY_RPCS), help="Comma separated unary RPCs to time, or 'none'")
+    parser.add_argument("--requests", type=int, default=10, help="Calls per benchmark")
+    parser.add_argument("--concurrency", type=int, default=1, help="Calls in flight at once")
+    parser.add_argument("--files", nargs="*", help="Files to upload for the AddFiles benchmark (removed afterwards)")
+    parser.add_argument("--attach", nargs="*", help="Files to attach to the chat requests")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="A previous JSON report to compare against")
+    parser.add_argument("--retries", action="store_true",
+                        help="Retry idempotent calls and apply the default deadlines, as the demos do (off by default, so failures and stalls show in the numbers)")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change counted as a regression (default 0.1)")
+    args = parser.parse_args()
+
+    workflows = [] if args.workflows == "none" else [w.strip() for w in args.workflows.split(",")]
+    rpcs = [] if args.rpcs == "none" else [r.strip() for r in args.rpcs.split(",")]
+    for name in workflows:
+        if name not in WORKFLOWS:
+            parser.error(f"unknown workflow '{name}'")
+    for name in rpcs:
+        if name not in UNARY_RPCS:
+            parser.error(f"unknown RPC '{name}'")
+
+    # A dedicated client: the shared one retries idempotent calls, which would hide failures and inflate latencies
+    stub = SuperBuilderClient(args.address, interceptors=[RetryInterceptor()] if args.retries else ())
+    if not stub.connect():
+        print("gRPC channel connection busy or missing")
+        sys.exit(1)
+    try:
+        report = run(stub, args.prompt, workflows, rpcs, args.requests, args.concurrency, args.files, args.attach)
+    finally:
+        stub.close()
+    report["meta"]["retries"] = args.retries
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = 0
+        for name, metric, statistic, old, new, change, regression in compare(baseline, report, args.threshold):
+            regressions += regression
+            print(f"{'REGRESSION' if regression else 'ok':<10} {name:<28} {metric} {statistic}: {old:.4f} -> {new:.4f} ({change:+.1%})")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
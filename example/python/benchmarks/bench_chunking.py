@@ -0,0 +1,67 @@
+import os
+import sys
+import tempfile
+import time
+SCRIPT_DIR=os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.abspath(os.path.join(SCRIPT_DIR,'..')))
+
+from helpers.chunking import chunk_text, chunk_file, estimate_tokens
+
+# Benchmark: split a synthetic multi-megabyte text (English and Chinese, short lines and very long
+# lines) with the translator's former newline splitter and with helpers.chunking.
+# Usage: python benchmarks/bench_chunking.py [size_mb]
+
+def legacy_split_text_batches(text, batch_size=200):
+    lines = text.splitlines(keepends=True)
+    batches = []
+    current = ''
+    for line in lines:
+        if len(current) + len(line) > batch_size and current:
+            batches.append(current)
+            current = ''
+        current += line
+    if current:
+        batches.append(current)
+    return batches
+
+def synthetic_text(size_mb):
+    paragraphs = [
+        "The quick brown fox jumps over the lazy dog. It was not amused!\n",
+        "Short line\n",
+        "人工智能助手可以在本地运行。它不需要网络连接！\n",
+        "A very long line without any newline that keeps going. " * 60 + "\n",
+    ]
+    block = "".join(paragraphs)
+    return block * max(1, int(size_mb * 1024 * 1024 / len(block.encode("utf-8"))))
+
+def report(name, chunks, elapsed, size):
+    tokens = [estimate_tokens(chunk) for chunk in chunks]
+    print(f"{name:<24} {elapsed * 1000:9.1f} ms {size / elapsed / 1e6:8.1f} MB/s "
+          f"{len(chunks):8,} chunks, tokens/chunk mean {sum(tokens) / len(tokens):6.1f} max {max(tokens):6,}")
+
+def main():
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 8
+    text = synthetic_text(size_mb)
+    size = len(text.encode("utf-8"))
+    print(f"input: {size / 1e6:.1f} MB, {len(text):,} chars")
+
+    start = time.perf_counter()
+    legacy = legacy_split_text_batches(text)
+    report("legacy (200 chars)", legacy, time.perf_counter() - start, size)
+
+    start = time.perf_counter()
+    chunks = list(chunk_text(text, max_tokens=200))
+    report("chunk_text (200 tokens)", chunks, time.perf_counter() - start, size)
+    assert "".join(chunks) == text
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "input.txt")
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        start = time.perf_counter()
+        file_chunks = list(chunk_file(path, max_tokens=200))
+        report("chunk_file (200 tokens)", file_chunks, time.perf_counter() - start, size)
+    assert file_chunks == chunks
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+import os
+import sys
+import time
+SCRIPT_DIR=os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.abspath(os.path.join(SCRIPT_DIR,'..')))
+
+import superbuilder_service_pb2 as sb
+from helpers.stream import stream_chat_response, PrintSink
+
+# Micro-benchmark: assemble a synthetic 100k-token chat stream the old way (string
+# concatenation + print(flush=True) per token) and with helpers.stream.
+# Usage: python benchmarks/bench_stream.py [num_tokens]
+
+def legacy_get_chat_response(response_iterator, out):
+    entireResponse = ""
+    for jsonResponse in response_iterator:
+        response = jsonResponse.message
+        print(response, end='', flush=True, file=out)
+        entireResponse += response
+    return entireResponse
+
+def synthetic_stream(num_tokens):
+    return [sb.ChatResponse(message=f"tok{i % 1000} ") for i in range(num_tokens)]
+
+def bench(name, func, responses):
+    start = time.perf_counter()
+    text = func(iter(responses))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed * 1000:9.1f} ms {len(responses) / elapsed:12,.0f} tokens/s ({len(text):,} chars)")
+    return text
+
+def main():
+    num_tokens = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    responses = synthetic_stream(num_tokens)
+    with open(os.devnull, "w") as devnull:
+        legacy = bench("legacy (+= and flush)", lambda it: legacy_get_chat_response(it, devnull), responses)
+        streamed = bench("stream_chat_response", lambda it: stream_chat_response(it).text, responses)
+        printed = bench("stream_chat_response+print", lambda it: stream_chat_response(it, [PrintSink(devnull)]).text, responses)
+    assert legacy == streamed == printed
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,6 @@
 import os
 import sys
-import time
 import signal
-import grpc
 
 import helpers.mw as mw
 import helpers.chat as chat
@@ -111,16 +109,11 @@ def main():
     # Connect to the AAB
     global successfulConnect, stub, channel
     grpc_address = 'localhost:5006'
-    channel = grpc.insecure_channel(grpc_address)
-    for attempt in range(5):
-        successfulConnect, stub = mw.connect(channel)
-        if successfulConnect:
-            print("Connected successfully!")
-            break
-        else:
-            print(f"Connection attempt {attempt + 1} failed. Retrying...\n")
-            time.sleep(5)
+    # Pooled client: long-lived channels with keepalive, retried with exponential backoff
+    successfulConnect, stub = mw.connect_pool(grpc_address)
+    channel = stub
     if successfulConnect:
+        print("Connected successfully!")
         llm_ready = mw.check_pybackend(stub)
         if llm_ready:
             print("LLM backend is ready.")
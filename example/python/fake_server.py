@@ -0,0 +1,284 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent import futures
+from datetime import datetime, timezone
+import grpc
+import superbuilder_service_pb2 as sb
+import superbuilder_service_pb2_grpc as sbg
+
+# A stand-in for the SuperBuilder middleware, for tests and benchmarks without the real backend.
+# Usage: python fake_server.py [--address localhost:5006] [--tokens-per-second 30] [--ttft 0.5] [--error-rate 0.1]
+
+DEFAULT_MODELS = [
+    {"model_type": "chat_model", "full_name": "Fake-LLM-7B-int4", "download_link": "https://example.invalid/fake-llm"},
+    {"model_type": "embedding_model", "full_name": "Fake-Embedder", "download_link": "https://example.invalid/fake-embedder"},
+    {"model_type": "ranker_model", "full_name": "Fake-Ranker", "download_link": "https://example.invalid/fake-ranker"},
+]
+DEFAULT_PARAMETERS = {"categories": [{"name": "LLM", "description": "Modify chat model settings", "fields": [
+    {"name": "max_token", "description": "Controls the LLM generation token limit.", "default_value": 1024, "user_value": 1024, "min": 100, "max": 1024}
+]}]}
+_WORDS = ("the", "assistant", "local", "model", "answer", "document", "runs", "on", "your", "device", "quickly", "and", "privately")
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+class FakeSuperBuilderServicer(sbg.SuperBuilderServicer):
+    """
+    Implements the RPCs the client helpers use, with tunable latency and injected errors.
+
+    Args:
+        tokens_per_second (float): The Chat streaming rate, 0 for no delay (default is 50).
+        ttft (float): Seconds before the first Chat token (default is 0.1).
+        response_tokens (int): Tokens per Chat response (default is 32).
+        history_sessions (int): Chat sessions GetChatHistory starts with (default is 0).
+        messages_per_session (int): Messages in each of those sessions (default is 4).
+        add_files_steps (int): Progress messages streamed per uploaded file (default is 4).
+        add_files_delay (float): Seconds between those messages (default is 0.01).
+        error_rate (float): Probability that a targeted call fails (default is 0).
+        fail_first (int): The first N calls of each targeted method fail (default is 0).
+        error_code: The status of injected failures (default is UNAVAILABLE).
+        error_methods: Method names that can fail, None for all (default is None).
+        slow_first (int): The first N calls of each targeted method wait slow_delay before answering (default is 0).
+        slow_delay (float): Seconds those calls wait (default is 1).
+        seed: Seed of the random generator, for reproducible failures (optional).
+    """
+    def __init__(self, tokens_per_second=50, ttft=0.1, response_tokens=32, history_sessions=0, messages_per_session=4,
+                 add_files_steps=4, add_files_delay=0.01, error_rate=0.0, fail_first=0,
+                 error_code=grpc.StatusCode.UNAVAILABLE, error_methods=None, slow_first=0, slow_delay=1.0, seed=None):
+        self.tokens_per_second = tokens_per_second
+        self.ttft = ttft
+        self.response_tokens = response_tokens
+        self.add_files_steps = add_files_steps
+        self.add_files_delay = add_files_delay
+        self.error_rate = error_rate
+        self.fail_first = fail_first
+        self.error_code = error_code
+        self.error_methods = set(error_methods) if error_methods else None
+        self.slow_first = slow_first
+        self.slow_delay = slow_delay
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        # StopChat/StopAddFiles stop every call started before them: calls remember the generation they started in
+        self._chat_generation = 0
+        self._add_files_generation = 0
+        self.calls = {}
+        # The last ChatRequest received, for tests checking what the client sent
+        self.last_chat_request = None
+        self.models = [dict(model) for model in DEFAULT_MODELS]
+        self.parameters = json.dumps(DEFAULT_PARAMETERS)
+        self.files = {}
+        self.sessions = {}
+        for index in range(history_sessions):
+            sid = 10_000_000 + index
+            self.sessions[sid] = {"sid": sid, "name": f"Session {index}", "date": _now(), "messages": [
+                {"timestamp": _now(), "text": f"message {i} of session {index}", "sender": "user" if i % 2 == 0 else "bot",
+                 "query_type": "", "attached_files": "[]", "references": []}
+                for i in range(messages_per_session)
+            ]}
+
+    def _enter(self, method, context):
+        # Counts the call, delays it and aborts it when a delay or an error is injected for this method
+        with self._lock:
+            count = self.calls[method] = self.calls.get(method, 0) + 1
+            targeted = self.error_methods is None or method in self.error_methods
+            fail = targeted and (count <= self.fail_first or (self.error_rate > 0 and self._random.random() < self.error_rate))
+            slow = targeted and count <= self.slow_first
+        if slow:
+            time.sleep(self.slow_delay)
+        if fail:
+            context.abort(self.error_code, f"Injected {self.error_code.name} in {method}")
+
+    def SayHello(self, request, context):
+        self._enter("SayHello", context)
+        return sb.SayHelloResponse(message=f"Hello {request.name}")
+
+    def SayHelloPyllm(self, request, context):
+        self._enter("SayHelloPyllm", context)
+        return sb.SayHelloResponse(message=f"Hello {request.name} from the fake backend")
+
+    def CheckHealth(self, request, context):
+        self._enter("CheckHealth", context)
+        return sb.CheckHealthResponse(status="healthy")
+
+    def DisconnectClient(self, request, context):
+        self._enter("DisconnectClient", context)
+        return sb.DisconnectClientResponse()
+
+    def LoadModels(self, request, context):
+        self._enter("LoadModels", context)
+        time.sleep(self.ttft)
+        return sb.LoadModelsResponse(status=True)
+
+    def SetModels(self, request, context):
+        self._enter("SetModels", context)
+        for model_type, path in (("chat_model", request.llm), ("embedding_model", request.embedder), ("ranker_model", request.ranker)):
+            for model in self.models:
+                if model["model_type"] == model_type and path:
+                    model["full_name"] = os.path.basename(os.path.normpath(path))
+        return sb.SetModelsResponse(modelsLoaded="True")
+
+    def GetClientConfig(self, request, context):
+        self._enter("GetClientConfig", context)
+        data = {
+            "ActiveAssistant": {"models": self.models, "all_models": DEFAULT_MODELS, "parameters": self.parameters},
+            "local_model_hub": os.path.join(os.path.expanduser("~"), "fake_model_hub"),
+        }
+        return sb.GetClientConfigResponse(data=json.dumps(data))
+
+    def SetParameters(self, request, context):
+        self._enter("SetParameters", context)
+        self.parameters = request.parameters_json
+        return sb.SetParametersResponse()
+
+    def _response_tokens(self, prompt):
+        # Deterministic for a given prompt, so cached and fresh responses can be compared
+        words = prompt.split() or list(_WORDS)
+        return [words[i % len(words)] + " " for i in range(self.response_tokens)]
+
+    def Chat(self, request, context):
+        self._enter("Chat", context)
+        self.last_chat_request = request
+        generation = self._chat_generation
+        tokens = self._response_tokens(request.prompt)
+        references = []
+        if request.HasField("attachedFiles"):
+            references = [sb.Reference(file=path) for path in json.loads(request.attachedFiles or "[]")]
+        elif self.files:
+            references = [sb.Reference(file=path) for path in list(self.files)[:3]]
+        deadline = time.perf_counter() + self.ttft
+        interval = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        sent = []
+        for index, token in enumerate(tokens):
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if generation != self._chat_generation or not context.is_active():
+                break
+            last = index == len(tokens) - 1
+            yield sb.ChatResponse(message=token, references=references if last else [])
+            sent.append(token)
+            deadline += interval
+        self._record_session(request, "".join(sent))
+
+    def _record_session(self, request, answer):
+        sid = request.sessionId if request.HasField("sessionId") else 0
+        with self._lock:
+            session = self.sessions.setdefault(sid, {"sid": sid, "name": request.prompt[:40], "date": _now(), "messages": []})
+            for text, sender in ((request.prompt, "user"), (answer, "bot")):
+                session["messages"].append({"timestamp": _now(), "text": text, "sender": sender,
+                                            "query_type": "", "attached_files": request.attachedFiles or "[]", "references": []})
+
+    def StopChat(self, request, context):
+        self._enter("StopChat", context)
+        with self._lock:
+            self._chat_generation += 1
+        return sb.StopChatResponse()
+
+    def GetChatHistory(self, request, context):
+        self._enter("GetChatHistory", context)
+        with self._lock:
+            data = json.dumps(list(self.sessions.values()))
+        return sb.GetChatHistoryResponse(data=data)
+
+    def RemoveSession(self, request, context):
+        self._enter("RemoveSession", context)
+        with self._lock:
+            removed = self.sessions.pop(request.sessionId, None) is not None
+        return sb.RemoveSessionResponse(success=removed)
+
+    def AddFiles(self, request, context):
+        self._enter("AddFiles", context)
+        generation = self._add_files_generation
+        uploaded = []
+        for path in json.loads(request.filesToUpload):
+            for step in range(1, self.add_files_steps + 1):
+                if generation != self._add_files_generation or not context.is_active():
+                    return
+                time.sleep(self.add_files_delay)
+                yield sb.AddFilesResponse(filesUploaded=json.dumps(uploaded), currentFileUploading=path,
+                                          currentFileProgress=str(100 * step // self.add_files_steps))
+            size = os.path.getsize(path) if os.path.isfile(path) else 0
+            with self._lock:
+                self.files[path] = {"size": str(size), "date_added": _now(), "modified": _now(), "embedded": True}
+            uploaded.append(path)
+            yield sb.AddFilesResponse(filesUploaded=json.dumps(uploaded))
+
+    def StopAddFiles(self, request, context):
+        self._enter("StopAddFiles", context)
+        with self._lock:
+            self._add_files_generation += 1
+        return sb.StopAddFilesResponse()
+
+    def GetFileList(self, request, context):
+        self._enter("GetFileList", context)
+        with self._lock:
+            data = json.dumps([[path, metadata] for path, metadata in self.files.items()])
+        return sb.GetFileListResponse(fileList=data)
+
+    def RemoveFiles(self, request, context):
+        self._enter("RemoveFiles", context)
+        with self._lock:
+            for path in json.loads(request.filesToRemove):
+                self.files.pop(path, None)
+        return sb.RemoveFilesResponse(filesRemoved=request.filesToRemove)
+
+    def DownloadFiles(self, request, context):
+        self._enter("DownloadFiles", context)
+        for progress in range(0, 101, 20):
+            time.sleep(self.add_files_delay)
+            yield sb.DownloadFilesResponse(progress=progress, FileDownloaded=request.FileUrl if progress == 100 else "")
+
+def serve(address="localhost:0", max_workers=32, **kwargs):
+    """
+    Starts a fake middleware server in the background.
+
+    Args:
+        address (str): The address to listen on; port 0 picks a free port (default is 'localhost:0').
+        max_workers (int): Threads serving calls; bounds the number of concurrent streams (default is 32).
+        **kwargs: Options of FakeSuperBuilderServicer.
+
+    Returns:
+        tuple: (server, servicer, address the server listens on).
+    """
+    servicer = FakeSuperBuilderServicer(**kwargs)
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
+    sbg.add_SuperBuilderServicer_to_server(servicer, server)
+    port = server.add_insecure_port(address)
+    server.start()
+    return server, servicer, f"{address.rsplit(':', 1)[0]}:{port}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake SuperBuilder middleware for tests and benchmarks.")
+    parser.add_argument("--address", default="localhost:5006", help="Address to listen on")
+    parser.add_argument("--workers", type=int, default=32, help="Maximum concurrent calls")
+    parser.add_argument("--tokens-per-second", type=float, default=50, help="Chat streaming rate, 0 for no delay")
+    parser.add_argument("--ttft", type=float, default=0.1, help="Seconds before the first Chat token")
+    parser.add_argument("--response-tokens", type=int, default=32, help="Tokens per Chat response")
+    parser.add_argument("--history-sessions", type=int, default=0, help="Chat sessions returned by GetChatHistory")
+    parser.add_argument("--add-files-delay", type=float, default=0.01, help="Seconds between AddFiles progress messages")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability that a call fails")
+    parser.add_argument("--fail-first", type=int, default=0, help="The first N calls of each method fail")
+    parser.add_argument("--error-code", default="UNAVAILABLE", help="gRPC status of injected failures")
+    parser.add_argument("--error-methods", help="Comma separated methods that can fail (default: all)")
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible failures")
+    args = parser.parse_args()
+
+    server, _servicer, address = serve(
+        args.address, args.workers, tokens_per_second=args.tokens_per_second, ttft=args.ttft,
+        response_tokens=args.response_tokens, history_sessions=args.history_sessions,
+        add_files_delay=args.add_files_delay, error_rate=args.error_rate, fail_first=args.fail_first,
+        error_code=grpc.StatusCode[args.error_code.upper()],
+        error_methods=args.error_methods.split(",") if args.error_methods else None, seed=args.seed
+    )
+    print(f"Fake SuperBuilder middleware listening on {address} (Ctrl+C to stop)")
+    try:
+        server.wait_for_termination()
+    except KeyboardInterrupt:
+        server.stop(1)
+
+if __name__ == '__main__':
+    main()
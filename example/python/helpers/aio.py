@@ -0,0 +1,168 @@
+import asyncio
+import json
+import weakref
+import grpc
+import superbuilder_service_pb2 as sb
+import superbuilder_service_pb2_grpc as sbg
+import helpers.chat as chat
+import helpers.session as session
+from helpers.attachments import resolve_attachments
+from helpers.pool import GRPC_ADDRESS, DEFAULT_CHANNEL_OPTIONS
+
+# asyncio counterparts of the blocking helpers. A single event loop can drive many streamed
+# conversations at once: every helper awaits the stub instead of blocking the calling thread.
+
+# Pending GetChatHistory requests seeding the session ID allocator, per stub
+_seeding = weakref.WeakKeyDictionary()
+
+async def connect(address=GRPC_ADDRESS, timeout=15, options=None):
+    """
+    Opens a grpc.aio channel to the middleware and waits until it is ready.
+
+    Args:
+        address: The middleware address (default is 'localhost:5006').
+        timeout: Seconds to wait for the channel (default is 15).
+        options: Channel options, defaults to the keepalive options of the pooled client.
+
+    Returns:
+        A tuple (success, stub, channel).
+    """
+    channel = grpc.aio.insecure_channel(address, options=DEFAULT_CHANNEL_OPTIONS if options is None else options)
+    try:
+        await asyncio.wait_for(channel.channel_ready(), timeout=timeout)
+    except asyncio.TimeoutError:
+        print("gRPC channel connection busy or missing")
+        return False, None, channel
+    return True, sbg.SuperBuilderStub(channel), channel
+
+async def disconnect(stub, channel):
+    if stub is not None:
+        await stub.DisconnectClient(sb.DisconnectClientRequest())
+    if channel is not None:
+        await channel.close()
+
+async def get_chat_history(stub):
+    """
+    Retrieves the chat history from the server.
+
+    Args:
+        stub: A SuperBuilderStub bound to a grpc.aio channel.
+
+    Returns:
+        A list of chat history entries.
+    """
+    if stub is not None:
+        response = await stub.GetChatHistory(sb.GetChatHistoryRequest())
+        return json.loads(response.data)
+
+async def _seed_allocator(stub, allocator):
+    history = await get_chat_history(stub)
+    allocator.add(session_info['sid'] for session_info in history)
+
+def _forget_failed_seeding(stub, task):
+    """Drops a cancelled or failed seeding task, so the next call seeds again."""
+    if (task.cancelled() or task.exception() is not None) and _seeding.get(stub) is task:
+        del _seeding[stub]
+
+async def init_chat_session(stub, fetch_history=True):
+    """
+    Initializes a new chat session and returns a session ID unused by the chat history.
+
+    The chat history is fetched once per stub (concurrent callers share the same request);
+    with fetch_history=False no request is sent at all.
+    """
+    allocator = session.get_allocator(stub, fetch_history=False)
+    if fetch_history:
+        seeding = _seeding.get(stub)
+        if seeding is None:
+            seeding = _seeding[stub] = asyncio.ensure_future(_seed_allocator(stub, allocator))
+            seeding.add_done_callback(lambda task: _forget_failed_seeding(stub, task))
+        # Shielded, so a cancelled caller does not cancel the seeding the other callers wait for
+        await asyncio.shield(seeding)
+    return allocator.next_id()
+
+async def set_chat_request(stub, prompt, session_id=None, name="Python Client Example", attachments=[], prompt_options=None, history=None):
+    """
+    Sends a chat request to the server with the given prompt and session details.
+
+    Args:
+        stub: A SuperBuilderStub bound to a grpc.aio channel.
+        prompt: The chat prompt to send.
+        session_id: The session ID for the chat (optional).
+        name: The name of the client (default is "Python Client Example").
+        attachments: A list of attachments to include in the request (default is an empty list).
+        prompt_options: Run the query on a specific workflow, defaults to generic chat if unset (optional).
+        history: Earlier turns to send with the prompt, see chat.set_chat_request() (optional).
+
+    Returns:
+        The streaming call; pass it to get_chat_response() or iterate it with 'async for'.
+    """
+    attachments_str = None if attachments is None else resolve_attachments(attachments).json
+
+    if session_id is None:
+        session_id = await init_chat_session(stub)
+    request = sb.ChatRequest(name=name, prompt=prompt, sessionId=session_id, attachedFiles=attachments_str, promptOptions=prompt_options,
+                             history=chat.conversation_history(history))
+    return stub.Chat(request)
+
+async def get_chat_response(response_iterator, verbose=False):
+    """
+    Yields the streamed chat response token by token.
+
+    Args:
+        response_iterator: The call returned by set_chat_request().
+        verbose: Whether to print the response as it streams (default is False).
+
+    Yields:
+        The text of each streamed ChatResponse.
+    """
+    async for response in response_iterator:
+        if verbose:
+            print(response.message, end='', flush=True)
+        yield response.message
+    if verbose:
+        print("\n")
+
+async def upload_file_to_knowledge_base(stub, file_paths):
+    """
+    Uploads files to the knowledge base.
+
+    Args:
+        stub: A SuperBuilderStub bound to a grpc.aio channel.
+        file_paths (list): List of file paths to upload.
+
+    Yields:
+        Each AddFilesResponse progress message.
+    """
+    resolved = resolve_attachments(file_paths)
+    if not resolved.valid:
+        print("No valid file paths to upload.")
+        return
+
+    request = sb.AddFilesRequest(filesToUpload=resolved.json)
+    async for response in stub.AddFiles(request):
+        if "Error" in response.filesUploaded:
+            raise Exception(f"File upload failed: {response.filesUploaded}")
+        yield response
+
+async def download(stub, url, local_path, token_id=None):
+    """
+    Downloads a file or model repository through the middleware.
+
+    Args:
+        stub: A SuperBuilderStub bound to a grpc.aio channel.
+        url: The URL to download from.
+        local_path: The local destination.
+        token_id: Optional access token for gated repositories.
+
+    Yields:
+        The download progress percentage (0-100). Negative progress updates are skipped.
+    """
+    async for response in stub.DownloadFiles(sb.DownloadFilesRequest(FileUrl=url, localPath=local_path, tokenId=token_id)):
+        if "ERROR" in response.FileDownloaded:
+            raise Exception(response.FileDownloaded)
+        if response.progress < 0:
+            continue
+        yield response.progress
+        if response.progress == 100:
+            break
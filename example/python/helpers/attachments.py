@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# A listing is only trusted when the folder was last modified longer ago than this: a change in
+# the same mtime tick (2 seconds on FAT drives) would otherwise go unnoticed
+_RACY_NS = 2_000_000_000
+
+# The outcome of resolving a list of attachments: tuples of the absolute paths of the existing
+# files, in input order, and of the paths that are not files, and 'valid' as the JSON string
+# ChatRequest.attachedFiles, AddFilesRequest and RemoveFilesRequest expect.
+ResolvedAttachments = namedtuple("ResolvedAttachments", ["valid", "invalid", "json"])
+
+class AttachmentResolver:
+    """
+    Resolves attachment paths to absolute paths of existing files, with as few file system calls as possible.
+
+    Instead of one stat per file, every folder is listed once with os.scandir() and the listing
+    is reused until the folder's modification time changes (files added, removed or renamed), so
+    checking a set of attachments costs one stat per folder. Resolved sets are cached too,
+    including their JSON string, so a set repeated turn after turn is only re-checked, not rebuilt.
+
+    Args:
+        max_folders (int): Folder listings kept (default is 1024).
+        max_sets (int): Resolved attachment sets kept (default is 256).
+    """
+    def __init__(self, max_folders=1024, max_sets=256):
+        self.max_folders = max_folders
+        self.max_sets = max_sets
+        self._lock = threading.Lock()
+        self._folders = OrderedDict()
+        self._sets = OrderedDict()
+
+    def _listing(self, folder):
+        # Returns (folder mtime, names of the files in it), (None, empty set) if it is not a folder,
+        # or (mtime, None) if it changed too recently to be listed reliably
+        try:
+            mtime_ns = os.stat(folder).st_mtime_ns
+        except OSError:
+            return None, frozenset()
+        with self._lock:
+            cached = self._folders.get(folder)
+            if cached is not None and cached[0] == mtime_ns:
+                self._folders.move_to_end(folder)
+                return cached
+        if time.time_ns() - mtime_ns <= _RACY_NS:
+            return mtime_ns, None
+        try:
+            with os.scandir(folder) as entries:
+                # DirEntry.is_file() needs no extra call on Windows and for most entries on Linux
+                names = frozenset(os.path.normcase(entry.name) for entry in entries if entry.is_file())
+        except OSError:
+            return None, frozenset()
+        listing = (mtime_ns, names)
+        with self._lock:
+            self._folders[folder] = listing
+            while len(self._folders) > self.max_folders:
+                self._folders.popitem(last=False)
+        return listing
+
+    def _absolute(self, path):
+        path = os.fspath(path)
+        return os.path.normpath(path) if os.path.isabs(path) else os.path.abspath(path)
+
+    def resolve(self, paths):
+        """
+        Resolves attachment paths.
+
+        Args:
+            paths: The file paths, relative to the working directory or absolute.
+
+        Returns:
+            ResolvedAttachments.
+        """
+        absolute = tuple(self._absolute(path) for path in paths)
+        with self._lock:
+            cached = self._sets.get(absolute)
+            if cached is not None:
+                self._sets.move_to_end(absolute)
+        if cached is not None:
+            resolved, stamps = cached
+            if all(self._listing(folder)[0] == mtime_ns for folder, mtime_ns in stamps):
+                return resolved
+
+        listings = {}
+        valid, invalid = [], []
+        for path in absolute:
+            folder, name = os.path.split(path)
+            if folder not in listings:
+                listings[folder] = self._listing(folder)
+            names = listings[folder][1]
+            # Folders changed in the last moments are checked file by file
+            exists = os.path.isfile(path) if names is None else os.path.normcase(name) in names
+            (valid if exists else invalid).append(path)
+        resolved = ResolvedAttachments(tuple(valid), tuple(invalid), json.dumps(valid))
+        stamps = tuple((folder, mtime_ns) for folder, (mtime_ns, _names) in listings.items())
+        if all(mtime_ns is not None and names is not None for mtime_ns, names in listings.values()):
+            with self._lock:
+                self._sets[absolute] = (resolved, stamps)
+                while len(self._sets) > self.max_sets:
+                    self._sets.popitem(last=False)
+        return resolved
+
+    def clear(self):
+        with self._lock:
+            self._folders.clear()
+            self._sets.clear()
+
+_default_resolver = AttachmentResolver()
+
+def resolve_attachments(paths, report_invalid=True):
+    """
+    Resolves attachment paths with the shared AttachmentResolver.
+
+    Args:
+        paths: The file paths, relative to the working directory or absolute.
+        report_invalid (bool): Print the paths that are not files (default is True).
+
+    Returns:
+        ResolvedAttachments.
+    """
+    resolved = _default_resolver.resolve(paths)
+    if report_invalid:
+        for path in resolved.invalid:
+            print(f"Invalid file path: {path}")
+    return resolved
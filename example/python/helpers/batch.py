@@ -0,0 +1,146 @@
+import functools
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import grpc
+import helpers.chat as chat
+import helpers.config as config
+import helpers.retry as retry
+import helpers.stream as stream
+
+# Status codes worth retrying: the middleware was restarting, busy or too slow to answer.
+TRANSIENT_STATUS_CODES = frozenset({
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.ABORTED,
+})
+
+# One prompt of a batch; attachments and prompt_options have the same meaning as in set_chat_request().
+BatchItem = namedtuple("BatchItem", ["prompt", "attachments", "prompt_options"], defaults=[[], None])
+
+# The outcome of one prompt. 'error' is None on success; 'latency' and 'first_token_latency' are in
+# seconds, 'tokens' counts the streamed messages of the last attempt.
+BatchResult = namedtuple("BatchResult", [
+    "index", "prompt", "text", "references", "error", "attempts",
+    "latency", "first_token_latency", "tokens", "tokens_per_second",
+])
+
+def _as_item(item):
+    if isinstance(item, str):
+        return BatchItem(item)
+    return BatchItem(*item)
+
+def _run_item(stub, index, item, session_id, name, retries, backoff, on_token, cache, model, stall_timeout):
+    attempts = 0
+    while True:
+        attempts += 1
+        start = time.perf_counter()
+        first_token = []
+
+        def record_token(token):
+            if not first_token:
+                first_token.append(time.perf_counter() - start)
+            if on_token is not None:
+                on_token(index, token)
+
+        try:
+            guard = None
+            if stall_timeout is not None:
+                guard = functools.partial(retry.guard_stream, stub, first_message_timeout=stall_timeout,
+                                          idle_timeout=stall_timeout, stops_before=retry.stops_sent(stub))
+            if cache is None:
+                response_iterator = chat.set_chat_request(
+                    stub, item.prompt, session_id=session_id, name=name,
+                    attachments=item.attachments, prompt_options=item.prompt_options, verbose=False
+                )
+                if guard is not None:
+                    response_iterator = guard(response_iterator)
+            else:
+                # The cache guards the gRPC call itself, so a stalled call can be cancelled and
+                # a stream cut short is not stored as a complete answer
+                response_iterator = cache.chat(
+                    stub, item.prompt, session_id=session_id, name=name, attachments=item.attachments,
+                    prompt_options=item.prompt_options, verbose=False, model=model, guard=guard
+                )
+            result = stream.stream_chat_response(response_iterator, [stream.CallbackSink(record_token)])
+        except grpc.RpcError as e:
+            if e.code() in TRANSIENT_STATUS_CODES and attempts <= retries:
+                time.sleep(backoff * 2 ** (attempts - 1))
+                continue
+            latency = time.perf_counter() - start
+            return BatchResult(index, item.prompt, "", [], e, attempts, latency, None, 0, 0.0)
+        except Exception as e:
+            # Stalls, foreign stops, cache or on_token failures: one bad prompt must not end the batch
+            latency = time.perf_counter() - start
+            return BatchResult(index, item.prompt, "", [], e, attempts, latency, None, 0, 0.0)
+        latency = time.perf_counter() - start
+        tokens_per_second = result.chunks / latency if latency > 0 else 0.0
+        first_token_latency = first_token[0] if first_token else None
+        return BatchResult(index, item.prompt, result.text, result.references, None, attempts,
+                           latency, first_token_latency, result.chunks, tokens_per_second)
+
+def run_batch(stub, items, concurrency=2, ordered=False, retries=2, backoff=0.5, session_id=None, name="Python Client Example", on_token=None, cache=None, stall_timeout=None):
+    """
+    Runs many chat prompts with bounded concurrency and yields a BatchResult per prompt.
+
+    Items are pulled lazily from the iterable, so at most 2 * concurrency prompts are in memory
+    at any time. Transient gRPC errors are retried with exponential backoff; any other exception
+    raised while running a prompt, or a gRPC error left after the last retry, is reported in its
+    BatchResult.error instead of being raised.
+
+    Args:
+        stub: The gRPC stub (or pooled client) for making requests to the server.
+        items: An iterable of prompts, or (prompt, attachments, prompt_options) tuples.
+        concurrency: The maximum number of chats streaming at once (default is 2).
+        ordered: Yield results in input order instead of completion order (default is False).
+        retries: How many times a transient failure is retried (default is 2).
+        backoff: The delay before the first retry in seconds, doubled for each retry (default is 0.5).
+        session_id: Send every prompt in this chat session, a new session per prompt if unset (optional).
+        name: The name of the client (default is "Python Client Example").
+        on_token: A function called as on_token(index, token) from the worker threads while
+            the prompts stream; a retried prompt streams its tokens again (optional).
+        cache: A ResponseCache answering repeated prompts without the LLM; not used with a
+            session_id, as the answers then depend on the earlier turns (optional).
+        stall_timeout: Seconds without a streamed message after which a prompt is stopped and
+            reported with a TimeoutError, so a stalled stream does not hold a worker. A prompt cut
+            short by the StopChat sent for another stalled prompt is reported with a
+            retry.StreamStoppedError (optional).
+
+    Yields:
+        BatchResult tuples.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    # The active model is part of the cache key; look it up once for the whole batch
+    model = config.get_active_model(stub) if cache is not None and session_id is None else None
+    items = iter(enumerate(items))
+    pending = {}
+    finished = {}
+    next_index = 0
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="chat-batch") as executor:
+        def submit_more():
+            while len(pending) + len(finished) < 2 * concurrency:
+                entry = next(items, None)
+                if entry is None:
+                    return
+                index, item = entry
+                future = executor.submit(_run_item, stub, index, _as_item(item), session_id, name, retries, backoff, on_token, cache, model, stall_timeout)
+                pending[future] = index
+
+        submit_more()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                del pending[future]
+                result = future.result()
+                if ordered:
+                    finished[result.index] = result
+                else:
+                    yield result
+            if ordered:
+                while next_index in finished:
+                    yield finished.pop(next_index)
+                    next_index += 1
+            submit_more()
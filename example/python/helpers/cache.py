@@ -0,0 +1,242 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+import superbuilder_service_pb2 as sb
+import helpers.chat as chat
+import helpers.config as config
+
+# Default location of the on-disk response cache and its size bound
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".superbuilder", "response_cache.sqlite3")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Content hashes of attachments, keyed by (path, size, mtime) so unchanged files are hashed once
+_file_digests = {}
+_file_digests_lock = threading.Lock()
+
+def normalize_prompt(prompt):
+    """
+    Normalizes a prompt for use in a cache key: Unicode NFC, '\\n' line endings, no trailing
+    whitespace on lines and no leading or trailing blank space.
+    """
+    prompt = unicodedata.normalize("NFC", prompt).replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in prompt.split("\n")).strip()
+
+def file_digest(file_path):
+    """
+    Returns the SHA-256 hex digest of a file's content, reusing the digest while its size and mtime are unchanged.
+    """
+    stat = os.stat(file_path)
+    signature = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _file_digests_lock:
+        digest = _file_digests.get(signature)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        digest = sha.hexdigest()
+        with _file_digests_lock:
+            _file_digests[signature] = digest
+    return digest
+
+def make_key(prompt, model, prompt_options=None, attachments=[]):
+    """
+    Builds the cache key of a chat request.
+
+    Args:
+        prompt: The chat prompt; it is normalized with normalize_prompt().
+        model: The name of the active chat model.
+        prompt_options: The PromptOptions of the request (optional).
+        attachments: The attached file paths, hashed by content; None stands for the whole
+            knowledge base, whose content is not tracked (default is an empty list).
+
+    Returns:
+        The key as a hex string.
+    """
+    if attachments is None:
+        attachment_digests = None
+    else:
+        attachment_digests = sorted(file_digest(path) for path in attachments if os.path.isfile(path))
+    options = prompt_options.SerializeToString(deterministic=True).hex() if prompt_options is not None else ""
+    material = json.dumps([normalize_prompt(prompt), model or "", options, attachment_digests], ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+def replay(chunks, references=()):
+    """
+    Replays a cached response as an iterator of ChatResponse messages, as returned by stub.Chat().
+
+    Args:
+        chunks: The streamed message texts.
+        references: Reference dicts (file, page, sheet) sent with the last message (optional).
+    """
+    chunks = list(chunks) or [""]
+    for chunk in chunks[:-1]:
+        yield sb.ChatResponse(message=chunk)
+    yield sb.ChatResponse(message=chunks[-1], references=[sb.Reference(**reference) for reference in references])
+
+def _reference_dict(reference):
+    entry = {"file": reference.file}
+    if reference.HasField("page"):
+        entry["page"] = reference.page
+    if reference.HasField("sheet"):
+        entry["sheet"] = reference.sheet
+    return entry
+
+class ResponseCache:
+    """
+    A persistent chat response cache backed by SQLite, bounded in size with LRU eviction.
+
+    Entries store the streamed chunks and references of a response, so a hit replays as the same
+    stream of ChatResponse messages. The cache can be shared between threads.
+
+    Args:
+        path: The SQLite database file, or ":memory:" (default is DEFAULT_CACHE_PATH).
+        max_bytes: The maximum total size of cached responses in bytes (default is 64 MB).
+    """
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, chunks TEXT NOT NULL, refs TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+        self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        """
+        Returns the cached (chunks, references) of a key and marks it as recently used, or None on a miss.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT chunks, refs FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        return json.loads(row[0]), json.loads(row[1])
+
+    def put(self, key, chunks, references=()):
+        """
+        Stores a response, evicting the least recently used entries beyond max_bytes.
+
+        Args:
+            key: The key from make_key().
+            chunks: The streamed message texts.
+            references: Reference messages or dicts (file, page, sheet) (optional).
+        """
+        references = [r if isinstance(r, dict) else _reference_dict(r) for r in references]
+        chunks_json = json.dumps(list(chunks), ensure_ascii=False)
+        refs_json = json.dumps(references, ensure_ascii=False)
+        size = len(chunks_json.encode("utf-8")) + len(refs_json.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                if old is not None:
+                    self._total -= old[0]
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, chunks, refs, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (key, chunks_json, refs_json, size, time.time())
+                )
+                self._total += size
+                while self._total > self.max_bytes:
+                    victim = self._db.execute(
+                        "SELECT key, size FROM responses WHERE key != ? ORDER BY last_used LIMIT 1", (key,)
+                    ).fetchone()
+                    if victim is None:
+                        break
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (victim[0],))
+                    self._total -= victim[1]
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                raise
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._total = 0
+
+    @property
+    def size(self):
+        """
+        The total size of the cached responses in bytes.
+        """
+        return self._total
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _record(self, key, response_iterator):
+        # Store the response only once it streamed to the end; an interrupted stream is not cached
+        chunks = []
+        references = []
+        for response in response_iterator:
+            chunks.append(response.message)
+            references.extend(response.references)
+            yield response
+        self.put(key, chunks, references)
+
+    def chat(self, stub, prompt, session_id=None, name="Python Client Example", attachments=[], prompt_options=None, verbose=True, model=None, guard=None):
+        """
+        Sends a chat request like chat.set_chat_request(), answering from the cache when possible.
+
+        Args:
+            stub: The gRPC stub for making requests to the server.
+            prompt: The chat prompt to send.
+            session_id: The session ID for the chat, a new session if unset. The answer in an existing
+                session depends on the earlier turns, so the cache is bypassed (optional).
+            name: The name of the client (default is "Python Client Example").
+            attachments: A list of attachments to include in the request (default is an empty list).
+            prompt_options: Run the query on a specific workflow, defaults to generic chat if unset (optional).
+            verbose: Whether to print the prompt (default is True).
+            model: The active chat model, fetched with GetClientConfig if unset (optional).
+            guard: A function wrapping the gRPC call before it is recorded, e.g. a partial of
+                retry.guard_stream(); a stream it cuts short raises and is not cached (optional).
+
+        Returns:
+            An iterator of ChatResponse messages, to pass to chat.get_chat_response().
+        """
+        key = None
+        if session_id is None:
+            if model is None:
+                model = config.get_active_model(stub)
+            key = make_key(prompt, model, prompt_options, attachments)
+            cached = self.get(key)
+            if cached is not None:
+                if verbose:
+                    print("\nPrompt (cached):\n", prompt)
+                return replay(*cached)
+        response_iterator = chat.set_chat_request(
+            stub, prompt, session_id=session_id, name=name, attachments=attachments,
+            prompt_options=prompt_options, verbose=verbose
+        )
+        if guard is not None:
+            response_iterator = guard(response_iterator)
+        return response_iterator if key is None else self._record(key, response_iterator)
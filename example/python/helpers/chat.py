@@ -1,8 +1,10 @@
 import json
 import random
 import string
-import os
 import superbuilder_service_pb2 as sb
+import helpers.stream as stream
+import helpers.session as session
+from helpers.attachments import resolve_attachments
 
 def warmup(stub):
     """
@@ -49,20 +51,23 @@ def generate_random_session_id(chatHistory):
         if int(new_session_id) not in existing_ids:
             return int(new_session_id)
 
-def init_chat_session(stub):
+def init_chat_session(stub, fetch_history=True):
     """
-    Initializes a new chat session by retrieving the chat history and generating a unique session ID.
+    Initializes a new chat session by allocating a unique session ID.
+
+    The chat history is fetched only once per stub to seed the allocator; with fetch_history=False
+    no request is sent at all.
     
     Args:
         stub: The gRPC stub for making requests to the server.
+        fetch_history: Whether to check the IDs against the server's chat history (default is True).
     
     Returns:
         A unique session ID as an integer.
     """
-    response = get_chat_history(stub)
-    return generate_random_session_id(response)
+    return session.get_allocator(stub, fetch_history=fetch_history).next_id()
 
-def set_chat_request(stub, prompt, session_id=None, name="Python Client Example", attachments=[], prompt_options=None):
+def set_chat_request(stub, prompt, session_id=None, name="Python Client Example", attachments=[], prompt_options=None, verbose=True, history=None):
     """
     Sends a chat request to the server with the given prompt and session details.
     
@@ -73,50 +78,81 @@ def set_chat_request(stub, prompt, session_id=None, name="Python Client Example"
         name: The name of the client (default is "Python Client Example").
         attachments: A list of attachments to include in the request (default is an empty list).
         prompt_options: Run the query on a specific workflow, defaults to generic chat if unset (optional).
+        verbose: Whether to print the prompt (default is True).
+        history: Earlier turns to send with the prompt, as ConversationHistory messages or
+            (role, content) pairs, e.g. ConversationContext.window() (optional).
     
     Returns:
         The server's response to the chat request.
     """
-    if attachments is None:
-        attachments_str = None
-    else:
-        absolute_file_paths = []
-        for file_path in attachments:
-            abs_path = os.path.abspath(file_path)
-            if not os.path.isfile(abs_path):
-                print(f"Invalid file path: {abs_path}")
-                continue
-            absolute_file_paths.append(abs_path)
-        attachments_str = json.dumps(absolute_file_paths)
+    attachments_str = None if attachments is None else resolve_attachments(attachments).json
 
     if session_id is None:
         session_id = init_chat_session(stub)
-    request = sb.ChatRequest(name=name, prompt=prompt, sessionId=session_id, attachedFiles=attachments_str, promptOptions=prompt_options)
-    print("\nPrompt:\n", prompt)
+    request = sb.ChatRequest(name=name, prompt=prompt, sessionId=session_id, attachedFiles=attachments_str, promptOptions=prompt_options,
+                             history=conversation_history(history))
+    if verbose:
+        print("\nPrompt:\n", prompt)
     return stub.Chat(request)
 
-def get_chat_response(response_iterator, verbose=True):
+def conversation_history(history):
+    """
+    Converts (role, content) pairs to ConversationHistory messages; messages are kept as they are.
+    """
+    if not history:
+        return []
+    return [turn if isinstance(turn, sb.ConversationHistory) else sb.ConversationHistory(role=turn[0], content=turn[1])
+            for turn in history]
+
+def get_chat_response(response_iterator, verbose=True, on_token=None):
     """
     Iterates over the chat response from the server and optionally prints the output.
     
     Args:
         response_iterator: An iterator for the server's chat response.
         verbose: Whether to print the response as it streams (default is True).
+        on_token: A function called with each streamed token (optional).
     
     Returns:
         The entire chat response as a string.
     """
-    entireResponse = ""
+    return get_chat_result(response_iterator, verbose=verbose, on_token=on_token).text
+
+def get_chat_result(response_iterator, verbose=True, on_token=None, sinks=()):
+    """
+    Iterates over the chat response from the server, like get_chat_response(), but also returns
+    the file references sent with the response.
+    
+    Args:
+        response_iterator: An iterator for the server's chat response.
+        verbose: Whether to print the response as it streams (default is True).
+        on_token: A function called with each streamed token (optional).
+        sinks: Additional TokenSink instances, e.g. a QueueSink or AsyncIteratorSink (optional).
+    
+    Returns:
+        A ChatResult with the text, references and number of streamed chunks.
+    """
+    sinks = list(sinks)
+    if on_token is not None:
+        sinks.append(stream.CallbackSink(on_token))
     if verbose:
         print("Response:")
-    for jsonResponse in response_iterator:
-        response = jsonResponse.message
-        if verbose:
-            print(response, end='', flush=True)
-        entireResponse += response
+        sinks.append(stream.PrintSink())
+    result = stream.stream_chat_response(response_iterator, sinks)
     if verbose: 
         print("\n")
-    return entireResponse
+    return result
+
+def stop_chat(stub, timeout=5):
+    """
+    Asks the server to stop generating the current chat response. The response stream then ends early.
+    
+    Args:
+        stub: The gRPC stub for making requests to the server.
+        timeout: Seconds to wait for the server (default is 5).
+    """
+    if stub is not None:
+        return stub.StopChat(sb.StopChatRequest(), timeout=timeout)
 
 def remove_session(stub, session_id):
     """
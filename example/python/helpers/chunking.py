@@ -0,0 +1,209 @@
+import math
+import re
+
+# Default token budget of one chunk, small enough for a quick LLM round trip on a local model
+DEFAULT_MAX_TOKENS = 200
+
+# CJK ideographs, kana and hangul: roughly one token per character for common tokenizers
+_CJK = re.compile(r'[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]')
+
+# A sentence with its trailing whitespace: ends at . ! ? (not inside e.g. "3.14"), at CJK sentence
+# punctuation, or at a run of newlines. Concatenating all matches gives back the original text.
+# The body uses negated character classes instead of a lazy '.*?', which is ~5x faster on large inputs.
+_SENTENCE = re.compile(
+    r'(?:[^.!?。！？；\n]+|[.!?]+(?![.!?\s"\')\]]|$))*'
+    r'(?:[.!?]+["\')\]]*(?:[ \t]+|(?=\n)|$)|[.!?]+["\')\]]*|[。！？；]+[”」』）]*[ \t]*|\n+|$)'
+)
+_WORD = re.compile(r'\s*\S+\s*')
+
+def estimate_tokens(text):
+    """
+    Estimates the number of LLM tokens of a text without loading a tokenizer.
+
+    CJK characters count as one token each, everything else as one token per 4 characters.
+
+    Args:
+        text (str): The text to measure.
+
+    Returns:
+        int: The estimated token count.
+    """
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+def split_sentences(text):
+    """
+    Splits text into sentences, keeping punctuation and whitespace so that ''.join() restores the text.
+
+    Args:
+        text (str): The text to split.
+
+    Yields:
+        str: Each sentence, or run of newlines.
+    """
+    for match in _SENTENCE.finditer(text):
+        sentence = match.group()
+        if sentence:
+            yield sentence
+
+def _cut_word(word, max_tokens, count_tokens):
+    # Cuts at the longest prefix within the budget, found by doubling then bisecting on count_tokens();
+    # a fixed character step would overshoot on words mixing CJK and latin characters
+    start = 0
+    while start < len(word):
+        remaining = len(word) - start
+        low = 1
+        while low < remaining and count_tokens(word[start:start + min(2 * low, remaining)]) <= max_tokens:
+            low = min(2 * low, remaining)
+        high = min(2 * low - 1, remaining)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if count_tokens(word[start:start + middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        yield word[start:start + low]
+        start += low
+
+def _split_long(sentence, max_tokens, count_tokens):
+    # First try word boundaries, then cut words that are still too long (e.g. CJK text without spaces)
+    current = []
+    current_tokens = 0
+    for word in _WORD.findall(sentence) or [sentence]:
+        tokens = count_tokens(word)
+        if tokens > max_tokens:
+            if current:
+                yield ''.join(current)
+                current, current_tokens = [], 0
+            yield from _cut_word(word, max_tokens, count_tokens)
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            yield ''.join(current)
+            current, current_tokens = [], 0
+        current.append(word)
+        current_tokens += tokens
+    if current:
+        yield ''.join(current)
+
+class TextChunker:
+    """
+    Incrementally groups sentences into chunks of at most max_tokens tokens.
+
+    Text can be fed in pieces of any size (e.g. blocks of a large file); complete lines are chunked
+    as they arrive, and text without a newline is held back only until it exceeds twice the budget,
+    then cut after its last complete sentence (or whitespace), so memory stays bounded. Sentences longer than the budget are split at word
+    boundaries, or cut if a single word is still too long. Joining all chunks gives back the input.
+
+    Args:
+        max_tokens (int): The token budget of a chunk (default is DEFAULT_MAX_TOKENS).
+        count_tokens: A function returning the token count of a string (default is estimate_tokens).
+    """
+    def __init__(self, max_tokens=DEFAULT_MAX_TOKENS, count_tokens=estimate_tokens):
+        if max_tokens < 1:
+            raise ValueError("max_tokens must be at least 1")
+        self.max_tokens = max_tokens
+        self._count_tokens = count_tokens
+        self._pending = []
+        self._pending_tokens = 0
+        self._current = []
+        self._current_tokens = 0
+
+    def _emit_current(self):
+        chunk = ''.join(self._current)
+        self._current, self._current_tokens = [], 0
+        return chunk
+
+    def _add(self, text):
+        for sentence in split_sentences(text):
+            tokens = self._count_tokens(sentence)
+            if tokens > self.max_tokens:
+                if self._current:
+                    yield self._emit_current()
+                yield from _split_long(sentence, self.max_tokens, self._count_tokens)
+                continue
+            if self._current and self._current_tokens + tokens > self.max_tokens:
+                yield self._emit_current()
+            self._current.append(sentence)
+            self._current_tokens += tokens
+
+    def _cut(self, pending):
+        # Where held-back text can be chunked: after the last complete sentence, unless the sentence
+        # after it is already over the budget; then after the last whitespace, or all of it if none
+        sentences = list(split_sentences(pending))
+        if len(sentences) > 1 and self._count_tokens(sentences[-1]) <= self.max_tokens:
+            return len(pending) - len(sentences[-1])
+        space = max(pending.rfind(' '), pending.rfind('\t'))
+        return space + 1 if space >= 0 else len(pending)
+
+    def feed(self, text):
+        """
+        Adds text and yields the chunks that are complete.
+        """
+        # Only the new text is searched for a line end; held-back text has none
+        cut = text.rfind('\n')
+        if cut >= 0:
+            complete = ''.join(self._pending) + text[:cut + 1]
+            text = text[cut + 1:]
+            self._pending, self._pending_tokens = [], 0
+            yield from self._add(complete)
+        if not text:
+            return
+        self._pending.append(text)
+        self._pending_tokens += self._count_tokens(text)
+        # Twice the budget, so the held-back text is scanned again only after as much new text
+        if self._pending_tokens > 2 * self.max_tokens:
+            pending = ''.join(self._pending)
+            cut = self._cut(pending)
+            rest = pending[cut:]
+            self._pending = [rest] if rest else []
+            self._pending_tokens = self._count_tokens(rest)
+            yield from self._add(pending[:cut])
+
+    def flush(self):
+        """
+        Yields the remaining chunks once all text has been fed.
+        """
+        pending = ''.join(self._pending)
+        self._pending, self._pending_tokens = [], 0
+        yield from self._add(pending)
+        if self._current:
+            yield self._emit_current()
+
+def chunk_text(text, max_tokens=DEFAULT_MAX_TOKENS, count_tokens=estimate_tokens):
+    """
+    Splits text into chunks of at most max_tokens tokens, preferably at sentence boundaries.
+
+    Args:
+        text (str): The text to split.
+        max_tokens (int): The token budget of a chunk (default is DEFAULT_MAX_TOKENS).
+        count_tokens: A function returning the token count of a string (default is estimate_tokens).
+
+    Yields:
+        str: Each chunk; ''.join() of all chunks equals the input text.
+    """
+    chunker = TextChunker(max_tokens, count_tokens)
+    yield from chunker._add(text)
+    yield from chunker.flush()
+
+def chunk_file(file_path, max_tokens=DEFAULT_MAX_TOKENS, count_tokens=estimate_tokens, encoding='utf-8', block_size=1 << 20):
+    """
+    Splits a text file into chunks without reading it into memory at once.
+
+    Args:
+        file_path (str): The file to split.
+        max_tokens (int): The token budget of a chunk (default is DEFAULT_MAX_TOKENS).
+        count_tokens: A function returning the token count of a string (default is estimate_tokens).
+        encoding (str): The file encoding (default is 'utf-8').
+        block_size (int): The number of characters read at a time (default is 1M).
+
+    Yields:
+        str: Each chunk, in file order.
+    """
+    chunker = TextChunker(max_tokens, count_tokens)
+    with open(file_path, 'r', encoding=encoding, newline='') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            yield from chunker.feed(block)
+    yield from chunker.flush()
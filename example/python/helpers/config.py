@@ -8,4 +8,17 @@ def get_config(stub):
 
 def set_config(stub, assistant, config_data):
     response = stub.SetActiveAssistant(sb.SetActiveAssistantRequest(assistant=assistant, models_json=config_data))
-    return response.message
\ No newline at end of file
+    return response.message
+
+def get_active_model(stub, model_type="chat_model"):
+    """
+    Returns the full name of the active model of the given type, or None if none is set.
+
+    Args:
+        stub: The gRPC stub for making requests to the server.
+        model_type: The model type in ActiveAssistant.models (default is "chat_model").
+    """
+    for model in get_config(stub)["ActiveAssistant"]["models"]:
+        if model.get("model_type") == model_type:
+            return model.get("full_name")
+    return None
@@ -0,0 +1,180 @@
+import threading
+from collections import namedtuple
+import superbuilder_service_pb2 as sb
+import helpers.chat as chat
+import helpers.chunking as chunking
+
+# Tokens of earlier turns sent with each prompt; small enough to keep a local LLM's prefill short
+DEFAULT_MAX_TOKENS = 1024
+# Tokens the summary of older turns may take when summarize=True
+DEFAULT_SUMMARY_TOKENS = 256
+
+ROLE_USER = "user"
+ROLE_ASSISTANT = "assistant"
+ROLE_SYSTEM = "system"
+
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+SUMMARIZE_PROMPT = "Summarize the following conversation in at most {words} words, keeping names, numbers and decisions:\n\n{text}"
+
+# One message of the rolling history, with its estimated token count
+Turn = namedtuple("Turn", ["role", "content", "tokens"])
+
+class ConversationContext:
+    """
+    A rolling conversation history for one chat session, sent in ChatRequest.history.
+
+    The turns sent with each prompt are limited to max_tokens: once the history grows past it,
+    the oldest turns are dropped, or with summarize=True folded into a summary written by the
+    LLM (a SummarizePrompt request in a throwaway session). Only the compacted window is kept,
+    so the prompt size, and with it the per-turn latency, stays flat however long the
+    conversation runs.
+
+    The middleware also keeps the history of the session a request is sent in and adds it to
+    the prompt. So by default (isolate_turns=True) every turn is sent in a session of its own,
+    which ask() removes afterwards, and the LLM only sees the window sent from here. With
+    isolate_turns=False all turns go to one session and the middleware's history comes on top.
+
+    Args:
+        session_id (int): The session the turns are sent in with isolate_turns=False, allocated on first use if unset (optional).
+        max_tokens (int): Token budget of the history sent with a prompt (default is 1024).
+        summarize (bool): Summarize dropped turns instead of forgetting them (default is False).
+        summary_tokens (int): The target size of the summary (default is 256).
+        isolate_turns (bool): Send every turn in its own session (default is True).
+        count_tokens: A function returning the token count of a text (default is chunking.estimate_tokens).
+    """
+    def __init__(self, session_id=None, max_tokens=DEFAULT_MAX_TOKENS, summarize=False, summary_tokens=DEFAULT_SUMMARY_TOKENS,
+                 isolate_turns=True, count_tokens=chunking.estimate_tokens):
+        if max_tokens < 1:
+            raise ValueError("max_tokens must be at least 1")
+        self.session_id = session_id
+        self.max_tokens = max_tokens
+        self.summarize = summarize
+        self.summary_tokens = summary_tokens
+        self.isolate_turns = isolate_turns
+        self._count_tokens = count_tokens
+        self._lock = threading.Lock()
+        self.turns = []
+        self.summary = None
+        # The session of the last send()
+        self.last_session_id = None
+
+    def add(self, role, content):
+        """
+        Appends one message to the history.
+        """
+        with self._lock:
+            self.turns.append(Turn(role, content, self._count_tokens(content)))
+
+    def add_exchange(self, prompt, answer):
+        """
+        Appends a prompt and the answer it got.
+        """
+        with self._lock:
+            self.turns.append(Turn(ROLE_USER, prompt, self._count_tokens(prompt)))
+            self.turns.append(Turn(ROLE_ASSISTANT, answer, self._count_tokens(answer)))
+
+    def tokens(self):
+        """
+        Returns the estimated token count of the summary and all recorded turns.
+        """
+        with self._lock:
+            summary = self._count_tokens(self.summary) if self.summary else 0
+            return summary + sum(turn.tokens for turn in self.turns)
+
+    def _split(self):
+        # Returns (turns that no longer fit, turns that do), walking back from the newest turn
+        budget = self.max_tokens - (self._count_tokens(self.summary) if self.summary else 0)
+        used = 0
+        start = len(self.turns)
+        while start > 0 and used + self.turns[start - 1].tokens <= budget:
+            start -= 1
+            used += self.turns[start].tokens
+        return self.turns[:start], self.turns[start:]
+
+    def compact(self, stub=None):
+        """
+        Brings the history within max_tokens, by summarizing (summarize=True and a stub) or dropping the oldest turns.
+
+        Returns:
+            int: The number of turns removed from the window.
+        """
+        with self._lock:
+            count = len(self.turns)
+            overflow, kept = self._split()
+            if not (self.summarize and stub is not None):
+                self.turns = kept
+                return count - len(kept)
+            while overflow:
+                self.summary = self._summarize(stub, overflow)
+                self.turns = kept
+                # The new summary may be longer than the old one: the turns it pushes out of the
+                # budget are folded into it too
+                overflow, kept = self._split()
+            return count - len(self.turns)
+
+    def _summarize(self, stub, turns):
+        lines = [self.summary] if self.summary else []
+        lines.extend(f"{turn.role}: {turn.content}" for turn in turns)
+        prompt = SUMMARIZE_PROMPT.format(words=max(1, self.summary_tokens * 3 // 4), text="\n".join(lines))
+        session_id = chat.init_chat_session(stub)
+        try:
+            response_iterator = chat.set_chat_request(stub, prompt, session_id=session_id, verbose=False,
+                                                      prompt_options=chat.get_prompt_options({"name": "SummarizePrompt"}))
+            summary = chat.get_chat_response(response_iterator, verbose=False).strip()
+        finally:
+            chat.remove_session(stub, session_id)
+        # A summary longer than its budget is cut at a sentence boundary
+        first = next(chunking.chunk_text(summary, max_tokens=self.summary_tokens, count_tokens=self._count_tokens), summary)
+        return first.strip()
+
+    def window(self):
+        """
+        Returns the compacted history as ConversationHistory messages, the summary first.
+        """
+        with self._lock:
+            _overflow, kept = self._split()
+            history = []
+            if self.summary:
+                history.append(sb.ConversationHistory(role=ROLE_SYSTEM, content=SUMMARY_PREFIX + self.summary))
+            history.extend(sb.ConversationHistory(role=turn.role, content=turn.content) for turn in kept)
+            return history
+
+    def send(self, stub, prompt, session_id=None, **kwargs):
+        """
+        Compacts the history and sends a prompt with it, like chat.set_chat_request().
+        Pass the answer to add_exchange() once it has been read, or use ask(). With isolate_turns,
+        remove the session in last_session_id once done with it.
+
+        Args:
+            session_id (int): Send in this session instead of the context's session (optional).
+
+        Returns:
+            The streaming call.
+        """
+        self.compact(stub)
+        if session_id is None:
+            if self.isolate_turns:
+                session_id = chat.init_chat_session(stub)
+            else:
+                if self.session_id is None:
+                    self.session_id = chat.init_chat_session(stub)
+                session_id = self.session_id
+        self.last_session_id = session_id
+        return chat.set_chat_request(stub, prompt, session_id=session_id, history=self.window(), **kwargs)
+
+    def ask(self, stub, prompt, verbose=False, **kwargs):
+        """
+        Sends a prompt with the compacted history, reads the answer and records the exchange.
+
+        Returns:
+            str: The answer.
+        """
+        session_id = chat.init_chat_session(stub) if self.isolate_turns else None
+        try:
+            response_iterator = self.send(stub, prompt, session_id=session_id, verbose=verbose, **kwargs)
+            answer = chat.get_chat_response(response_iterator, verbose=verbose)
+        finally:
+            if session_id is not None:
+                chat.remove_session(stub, session_id)
+        self.add_exchange(prompt, answer)
+        return answer
@@ -0,0 +1,364 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import helpers.sync as sync
+
+# Usage, from example/python:
+#   python -m helpers.downloads OpenVINO/Qwen3-8B-int4-ov OpenVINO/bge-base-en-v1.5-int8-ov --dest C:\ProgramData\IntelAIA\local_models
+
+HF_ENDPOINT = "https://huggingface.co"
+DEFAULT_CONCURRENCY = 4
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_TIMEOUT = 30
+PART_SUFFIX = ".part"
+
+# One file to download; the file is verified against sha256 and size when they are set.
+DownloadItem = namedtuple("DownloadItem", ["url", "path", "sha256", "size"], defaults=[None, None])
+
+# Progress of one file plus the aggregate of the whole run; bytes_per_second is the aggregate rate
+# of the bytes transferred in this run (resumed bytes are not counted as transferred).
+DownloadProgress = namedtuple("DownloadProgress", [
+    "path", "bytes_done", "bytes_total", "transferred", "elapsed", "bytes_per_second",
+])
+
+# The outcome of one file: status is 'downloaded', 'skipped' (already complete), 'stopped' or 'failed'.
+DownloadResult = namedtuple("DownloadResult", ["item", "status", "transferred", "error"])
+
+class ChecksumError(ValueError):
+    pass
+
+class TokenBucket:
+    """
+    A thread-safe token bucket limiting the combined rate of all downloads.
+
+    consume() reserves the tokens right away (the balance may go negative) and sleeps outside
+    the lock until the reservation is covered, so concurrent downloads are served in turn.
+
+    Args:
+        rate (float): Bytes per second.
+        burst (float): The most bytes that can be taken at once after an idle period (default is one second's worth).
+    """
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+def hash_file(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Returns the sha256 hex digest of a file.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def repository_items(repo_id, local_dir, revision="main", endpoint=HF_ENDPOINT, headers=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Lists the files of a model repository on a Hugging Face compatible hub as DownloadItems.
+
+    The repository tree is the manifest: every file gets its size, and files stored in LFS
+    (the model weights) also get their sha256.
+
+    Args:
+        repo_id (str): The repository, e.g. 'OpenVINO/Qwen3-8B-int4-ov'.
+        local_dir (str): The folder the repository is downloaded to.
+        revision (str): The branch, tag or commit (default is 'main').
+        endpoint (str): The hub URL (default is HF_ENDPOINT).
+        headers (dict): Extra request headers, e.g. an Authorization token (optional).
+
+    Returns:
+        list: DownloadItem tuples.
+    """
+    quoted_repo = urllib.parse.quote(repo_id)
+    quoted_revision = urllib.parse.quote(revision, safe="")
+    url = f"{endpoint}/api/models/{quoted_repo}/tree/{quoted_revision}?recursive=true"
+    with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {}), timeout=timeout) as response:
+        tree = json.load(response)
+    items = []
+    for entry in tree:
+        if entry.get("type") != "file":
+            continue
+        path = entry["path"]
+        lfs = entry.get("lfs") or {}
+        items.append(DownloadItem(
+            f"{endpoint}/{quoted_repo}/resolve/{quoted_revision}/{urllib.parse.quote(path)}",
+            os.path.join(local_dir, *path.split("/")),
+            lfs.get("oid"),
+            lfs.get("size", entry.get("size")),
+        ))
+    return items
+
+class DownloadManager:
+    """
+    Downloads many files concurrently, resumably and verified, under one bandwidth cap.
+
+    Each file is written to '<path>.part' and renamed once complete and verified. The state file
+    records the URL and validator (ETag or Last-Modified) of every partial file, so the next run
+    continues it with a Range request; If-Range makes the server send the whole file again if it
+    changed in between. Files whose size or sha256 do not match are deleted and reported as failed.
+
+    Args:
+        state_path (str): The JSON state file; run again with the same file to resume.
+        concurrency (int): Files downloaded at once (default is 4).
+        max_bytes_per_second (float): The combined bandwidth cap, None for no cap (optional).
+        headers (dict): Extra request headers, e.g. an Authorization token (optional).
+        chunk_size (int): Bytes read per step (default is 1 MiB).
+        timeout (float): Socket timeout in seconds (default is 30).
+    """
+    def __init__(self, state_path, concurrency=DEFAULT_CONCURRENCY, max_bytes_per_second=None, headers=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, timeout=DEFAULT_TIMEOUT):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.state_path = state_path
+        self.concurrency = concurrency
+        self.headers = dict(headers or {})
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self._bucket = TokenBucket(max_bytes_per_second, max(chunk_size, max_bytes_per_second)) if max_bytes_per_second else None
+        self._state = sync.load_manifest(state_path)
+        self._state_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._items = []
+        self.transferred = 0
+        self._started = None
+        self._finished = None
+
+    def add(self, url, path, sha256=None, size=None):
+        """
+        Queues one file.
+        """
+        self._items.append(DownloadItem(url, path, sha256.lower() if sha256 else None, size))
+
+    def add_repository(self, repo_id, local_dir, revision="main", endpoint=HF_ENDPOINT):
+        """
+        Queues every file of a model repository, see repository_items().
+        """
+        for item in repository_items(repo_id, local_dir, revision, endpoint, self.headers, self.timeout):
+            self.add(*item)
+
+    def stop(self):
+        """
+        Stops the running downloads after their current chunk; partial files are kept for resuming.
+        """
+        self._stop.set()
+
+    def throughput(self):
+        """
+        Returns the aggregate rate in bytes per second of the current or last run.
+        """
+        with self._stats_lock:
+            if self._started is None:
+                return 0.0
+            elapsed = (self._finished or time.perf_counter()) - self._started
+            return self.transferred / elapsed if elapsed > 0 else 0.0
+
+    def run(self, on_progress=None):
+        """
+        Downloads the queued files.
+
+        Args:
+            on_progress: A function called with DownloadProgress tuples from the worker threads (optional).
+
+        Returns:
+            list: A DownloadResult per queued file, in queue order.
+        """
+        self._stop.clear()
+        self.transferred = 0
+        self._started = time.perf_counter()
+        self._finished = None
+        items, self._items = self._items, []
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="download") as executor:
+            futures = [executor.submit(self._download, item, on_progress) for item in items]
+            try:
+                return [future.result() for future in futures]
+            except KeyboardInterrupt:
+                # Let the workers finish their current chunk and keep the partial files
+                self._stop.set()
+                raise
+            finally:
+                self._finished = time.perf_counter()
+
+    def _update_state(self, path, entry):
+        with self._state_lock:
+            if entry is None:
+                self._state.pop(path, None)
+            else:
+                self._state[path] = entry
+            sync.save_manifest(self.state_path, self._state)
+
+    def _is_complete(self, item):
+        if not os.path.exists(item.path):
+            return False
+        entry = self._state.get(item.path) or {}
+        size = os.path.getsize(item.path)
+        if item.size is not None and size != item.size:
+            return False
+        if entry.get("verified") and entry.get("url") == item.url and entry.get("size") == size:
+            return True
+        if item.sha256 is not None:
+            return hash_file(item.path, self.chunk_size) == item.sha256
+        return item.size is not None
+
+    def _download(self, item, on_progress):
+        try:
+            if self._is_complete(item):
+                return DownloadResult(item, "skipped", 0, None)
+            return self._transfer(item, on_progress)
+        except (OSError, ChecksumError) as e:
+            # Network and disk errors keep the partial file, so the next run resumes it
+            return DownloadResult(item, "failed", 0, e)
+
+    def _transfer(self, item, on_progress):
+        part_path = item.path + PART_SUFFIX
+        entry = self._state.get(item.path) or {}
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        validator = entry.get("etag") or entry.get("last_modified")
+        if entry.get("url") != item.url or validator is None:
+            # Without a validator the server cannot tell us whether the partial file is still current
+            offset = 0
+        digest = hashlib.sha256()
+        if offset:
+            with open(part_path, "rb") as f:
+                for chunk in iter(lambda: f.read(self.chunk_size), b""):
+                    digest.update(chunk)
+
+        headers = dict(self.headers)
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = validator
+        try:
+            response = urllib.request.urlopen(urllib.request.Request(item.url, headers=headers), timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            if e.code != 416 or not offset:
+                raise
+            # The range starts at the end: the partial file may be complete already
+            response = None
+        transferred = 0
+        try:
+            if response is not None and response.status != 206:
+                offset = 0
+                digest = hashlib.sha256()
+            length = response.headers.get("Content-Length") if response is not None else None
+            total = offset + int(length) if length is not None else item.size
+            if response is not None:
+                self._update_state(item.path, {
+                    "url": item.url, "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"), "size": total,
+                })
+                os.makedirs(os.path.dirname(os.path.abspath(item.path)), exist_ok=True)
+                done = offset
+                with open(part_path, "r+b" if offset else "wb") as f:
+                    f.seek(offset)
+                    f.truncate()
+                    while True:
+                        if self._stop.is_set():
+                            return DownloadResult(item, "stopped", transferred, None)
+                        chunk = response.read(self.chunk_size)
+                        if not chunk:
+                            break
+                        if self._bucket is not None:
+                            self._bucket.consume(len(chunk))
+                        f.write(chunk)
+                        digest.update(chunk)
+                        done += len(chunk)
+                        transferred += len(chunk)
+                        self._count(item.path, done, total, len(chunk), on_progress)
+        finally:
+            if response is not None:
+                response.close()
+
+        self._verify(item, part_path, digest.hexdigest())
+        os.replace(part_path, item.path)
+        self._update_state(item.path, {"url": item.url, "size": os.path.getsize(item.path), "verified": True})
+        return DownloadResult(item, "downloaded", transferred, None)
+
+    def _verify(self, item, part_path, sha256):
+        size = os.path.getsize(part_path)
+        problem = None
+        if item.size is not None and size != item.size:
+            problem = f"expected {item.size} bytes, got {size}"
+        elif item.sha256 is not None and sha256 != item.sha256:
+            problem = f"sha256 {sha256} does not match {item.sha256}"
+        if problem is not None:
+            os.remove(part_path)
+            self._update_state(item.path, None)
+            raise ChecksumError(f"{item.path}: {problem}")
+
+    def _count(self, path, done, total, amount, on_progress):
+        with self._stats_lock:
+            self.transferred += amount
+            transferred = self.transferred
+        if on_progress is not None:
+            elapsed = time.perf_counter() - self._started
+            on_progress(DownloadProgress(path, done, total, transferred, elapsed,
+                                         transferred / elapsed if elapsed > 0 else 0.0))
+
+def _format_bytes(count):
+    for unit in ("B", "KB", "MB", "GB"):
+        if count < 1024:
+            return f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.1f} TB"
+
+def main():
+    parser = argparse.ArgumentParser(description="Download model repositories concurrently, resumably and verified.")
+    parser.add_argument("repos", nargs="+", help="Repositories to download, e.g. OpenVINO/Qwen3-8B-int4-ov")
+    parser.add_argument("--dest", required=True, help="Folder the repositories are downloaded to, one subfolder each")
+    parser.add_argument("--state", help="State file; run again with the same file to resume (default is <dest>/.downloads.json)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Files downloaded at once")
+    parser.add_argument("--max-mbps", type=float, help="Bandwidth cap in megabytes per second")
+    parser.add_argument("--endpoint", default=HF_ENDPOINT, help="Model hub URL")
+    parser.add_argument("--token", help="Access token for gated repositories")
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else None
+    manager = DownloadManager(args.state or os.path.join(args.dest, ".downloads.json"), args.concurrency,
+                              args.max_mbps * 1024 * 1024 if args.max_mbps else None, headers)
+    for repo_id in args.repos:
+        manager.add_repository(repo_id, os.path.join(args.dest, repo_id.rsplit("/", 1)[-1]), endpoint=args.endpoint)
+
+    last_print = [0.0]
+    def print_progress(progress):
+        now = time.perf_counter()
+        if now - last_print[0] < 0.5:
+            return
+        last_print[0] = now
+        print(f"\r{_format_bytes(progress.transferred)} in {progress.elapsed:.0f}s, "
+              f"{_format_bytes(progress.bytes_per_second)}/s", end="", flush=True)
+
+    results = manager.run(print_progress)
+    counts = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+        if result.error is not None:
+            print(f"\n{result.item.path}: {result.error}")
+    print(f"\n{counts.get('downloaded', 0)} downloaded, {counts.get('skipped', 0)} already complete, "
+          f"{counts.get('failed', 0)} failed, {_format_bytes(manager.throughput())}/s")
+    if counts.get("failed"):
+        sys.exit(2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+import bisect
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+import helpers.rag as rag
+from helpers.sync import normalize_path
+
+# JavaScript Date.toString(), e.g. "Tue Mar 04 2025 10:12:33 GMT-0800 (Pacific Standard Time)"
+_JS_DATE = re.compile(r'^\w{3} (\w{3} \d{1,2} \d{4} \d{2}:\d{2}:\d{2}) GMT([+-]\d{4})')
+
+def parse_timestamp(value):
+    """
+    Converts a metadata time (epoch seconds or milliseconds, ISO 8601 or JavaScript date string)
+    to epoch seconds.
+
+    Returns:
+        float: The timestamp, or None if the value is missing or not understood.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        text = str(value).strip()
+        try:
+            number = float(text)
+        except ValueError:
+            match = _JS_DATE.match(text)
+            try:
+                if match:
+                    parsed = datetime.strptime(f"{match.group(1)} {match.group(2)}", "%b %d %Y %H:%M:%S %z")
+                else:
+                    parsed = datetime.fromisoformat(text)
+            except ValueError:
+                return None
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return parsed.timestamp()
+    # Values this large are milliseconds (epoch seconds reach 1e11 only in the year 5138)
+    return number / 1000 if number > 1e11 else number
+
+class FileStoreIndex:
+    """
+    A client-side index of the knowledge base, built from one GetFileList call.
+
+    Paths and metadata are kept in a dict keyed by normalized path, next to a sorted path list
+    for folder queries and a list sorted by modification time for "changed since" queries.
+    The index is loaded on first use, reloaded once older than max_age seconds, and invalidated
+    by upload() and remove(); queries in between need no RPC.
+
+    Args:
+        stub: The gRPC stub for making requests.
+        max_age: Seconds after which the index is reloaded, None to only reload after invalidate() (default is None).
+    """
+    def __init__(self, stub, max_age=None):
+        self._stub = stub
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._files = {}
+        self._sorted_paths = []
+        self._by_time = []
+
+    def invalidate(self):
+        """
+        Marks the index as stale; the next query reloads it.
+        """
+        with self._lock:
+            self._loaded_at = None
+
+    def refresh(self):
+        """
+        Reloads the index from GetFileList now.
+        """
+        file_list = rag.get_file_list(self._stub)
+        files = {}
+        for path, metadata in file_list:
+            files[normalize_path(path)] = (path, metadata or {})
+        by_time = []
+        for normalized, (_path, metadata) in files.items():
+            modified = parse_timestamp(metadata.get("modified"))
+            if modified is None:
+                modified = parse_timestamp(metadata.get("date_added"))
+            if modified is not None:
+                by_time.append((modified, normalized))
+        by_time.sort()
+        with self._lock:
+            self._files = files
+            self._sorted_paths = sorted(files)
+            self._by_time = by_time
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        with self._lock:
+            loaded_at = self._loaded_at
+        if loaded_at is None or (self._max_age is not None and time.monotonic() - loaded_at > self._max_age):
+            self.refresh()
+
+    def _snapshot(self):
+        # refresh() swaps in new structures under the lock; a query reads one consistent set of them
+        self._ensure_loaded()
+        with self._lock:
+            return self._files, self._sorted_paths, self._by_time
+
+    def __contains__(self, file_path):
+        files, _sorted_paths, _by_time = self._snapshot()
+        return normalize_path(file_path) in files
+
+    def __len__(self):
+        files, _sorted_paths, _by_time = self._snapshot()
+        return len(files)
+
+    def get(self, file_path):
+        """
+        Returns the stored metadata of a file, or None if it is not in the knowledge base.
+        """
+        files, _sorted_paths, _by_time = self._snapshot()
+        entry = files.get(normalize_path(file_path))
+        return entry[1] if entry is not None else None
+
+    def paths(self):
+        """
+        Returns all stored paths, as reported by the middleware.
+        """
+        files, sorted_paths, _by_time = self._snapshot()
+        return [files[normalized][0] for normalized in sorted_paths]
+
+    def under(self, folder):
+        """
+        Returns the stored paths inside a folder, including its subfolders.
+        """
+        files, sorted_paths, _by_time = self._snapshot()
+        prefix = os.path.join(normalize_path(folder), "")
+        start = bisect.bisect_left(sorted_paths, prefix)
+        result = []
+        for normalized in sorted_paths[start:]:
+            if not normalized.startswith(prefix):
+                break
+            result.append(files[normalized][0])
+        return result
+
+    def changed_since(self, timestamp):
+        """
+        Returns the stored paths modified after a time, oldest first. Files without a parsable
+        'modified' (or 'date_added') time are never included.
+
+        Args:
+            timestamp: Epoch seconds or a datetime.
+        """
+        files, _sorted_paths, by_time = self._snapshot()
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.timestamp()
+        start = bisect.bisect_right(by_time, (timestamp, "\U0010ffff"))
+        return [files[normalized][0] for _modified, normalized in by_time[start:]]
+
+    def upload(self, file_paths, **kwargs):
+        """
+        Uploads files with rag.upload_file_to_knowledge_base() and invalidates the index.
+        """
+        try:
+            return rag.upload_file_to_knowledge_base(self._stub, file_paths, **kwargs)
+        finally:
+            self.invalidate()
+
+    def remove(self, file_paths):
+        """
+        Removes files with rag.remove_uploaded_file() and invalidates the index.
+        """
+        try:
+            return rag.remove_uploaded_file(self._stub, file_paths)
+        finally:
+            self.invalidate()
@@ -0,0 +1,259 @@
+import bisect
+import json
+import os
+import re
+import tempfile
+import threading
+from array import array
+from collections import namedtuple
+import superbuilder_service_pb2 as sb
+
+# Where indexes without an explicit path keep their temporary message file
+HISTORY_DIR = os.path.join(os.path.expanduser("~"), ".superbuilder")
+
+# Words, or single CJK characters (CJK text has no spaces to split words on)
+_TERM = re.compile(r'[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]|[^\W぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]+')
+_SEPARATOR = re.compile(r'[\s,]*')
+_decoder = json.JSONDecoder()
+
+# A chat session of the index; 'messages' is the number of indexed messages.
+SessionInfo = namedtuple("SessionInfo", ["sid", "name", "date", "messages"])
+
+def iter_sessions(data):
+    """
+    Parses the GetChatHistory JSON one session at a time, so only one session is ever decoded
+    into Python objects instead of the whole history.
+
+    Args:
+        data (str): GetChatHistoryResponse.data, a JSON list of sessions.
+
+    Yields:
+        dict: The sessions, as {'sid', 'name', 'date', 'messages'}.
+    """
+    index = _SEPARATOR.match(data, 0).end()
+    if data[index:index + 1] != "[":
+        raise ValueError("Chat history is not a JSON list")
+    index += 1
+    while True:
+        index = _SEPARATOR.match(data, index).end()
+        if index >= len(data) or data[index] == "]":
+            return
+        session, index = _decoder.raw_decode(data, index)
+        yield session
+
+def _fingerprint(message):
+    # Detects edited messages without keeping their text in memory
+    return hash(json.dumps(message, sort_keys=True, ensure_ascii=False))
+
+def _contains(postings, number):
+    position = bisect.bisect_left(postings, number)
+    return position < len(postings) and postings[position] == number
+
+def tokenize(text):
+    """
+    Splits text into lower-case search terms.
+    """
+    return _TERM.findall(text.lower())
+
+class HistoryIndex:
+    """
+    A local, searchable copy of the chat history.
+
+    Messages are appended to a JSONL file as they are parsed; memory holds only the byte offset
+    of every message, its session and an inverted index of term -> message numbers. Reading a
+    page of a session, searching and exporting therefore cost the size of the result, not of the
+    whole history. update() appends only the messages that are new or changed since the last
+    update (a fingerprint per message detects edits), so refreshing a long history does not
+    rewrite it; replaced and removed messages are only marked as gone.
+
+    The file is a cache of the middleware's history: it is cleared when the index is created.
+    Without a path, every index gets its own temporary file, deleted on close(), so several
+    indexes never write to the same file.
+
+    Args:
+        path (str): The JSONL file the messages are stored in (default is a temporary file in ~/.superbuilder).
+    """
+    def __init__(self, path=None):
+        if path is None:
+            os.makedirs(HISTORY_DIR, exist_ok=True)
+            self._file = tempfile.NamedTemporaryFile("w+b", prefix="history-", suffix=".jsonl", dir=HISTORY_DIR)
+            self.path = self._file.name
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.path = path
+            self._file = open(path, "w+b")
+        self._lock = threading.Lock()
+        self._offsets = array("Q")
+        self._fingerprints = array("q")
+        self._message_sids = array("q")
+        # 0 for messages of sessions that were removed since
+        self._live = bytearray()
+        self._postings = {}
+        # sid -> [name, date, message numbers]
+        self._sessions = {}
+
+    def refresh(self, stub):
+        """
+        Fetches the chat history and indexes the new messages.
+
+        Returns:
+            int: The number of messages added.
+        """
+        return self.update(stub.GetChatHistory(sb.GetChatHistoryRequest()).data)
+
+    def update(self, data):
+        """
+        Indexes the new and changed messages of a GetChatHistory response; messages and sessions
+        missing from it are dropped.
+
+        Returns:
+            int: The number of messages added or replaced.
+        """
+        added = 0
+        seen = set()
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            for session in iter_sessions(data):
+                sid = session["sid"]
+                seen.add(sid)
+                entry = self._sessions.get(sid)
+                if entry is None:
+                    entry = self._sessions[sid] = [session.get("name", ""), session.get("date", ""), []]
+                else:
+                    entry[0], entry[1] = session.get("name", entry[0]), session.get("date", entry[1])
+                numbers = entry[2]
+                messages = session.get("messages") or []
+                # Messages deleted from the end of the session
+                for number in numbers[len(messages):]:
+                    self._live[number] = 0
+                del numbers[len(messages):]
+                for position, message in enumerate(messages):
+                    fingerprint = _fingerprint(message)
+                    if position < len(numbers):
+                        if self._fingerprints[numbers[position]] == fingerprint:
+                            continue
+                        # Edited, or shifted by a deletion: the old copy stays on disk but is gone
+                        self._live[numbers[position]] = 0
+                    number = len(self._offsets)
+                    self._offsets.append(self._file.tell())
+                    self._fingerprints.append(fingerprint)
+                    self._message_sids.append(sid)
+                    self._live.append(1)
+                    record = dict(message, sid=sid, index=position)
+                    self._file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                    for term in set(tokenize(message.get("text") or "")):
+                        postings = self._postings.get(term)
+                        if postings is None:
+                            postings = self._postings[term] = array("I")
+                        postings.append(number)
+                    if position < len(numbers):
+                        numbers[position] = number
+                    else:
+                        numbers.append(number)
+                    added += 1
+            for sid in list(self._sessions):
+                if sid not in seen:
+                    for number in self._sessions.pop(sid)[2]:
+                        self._live[number] = 0
+            self._file.flush()
+        return added
+
+    def _read(self, number):
+        self._file.seek(self._offsets[number])
+        return json.loads(self._file.readline())
+
+    def sessions(self):
+        """
+        Returns a SessionInfo per session, in the order the middleware reported them.
+        """
+        with self._lock:
+            return [SessionInfo(sid, name, date, len(numbers)) for sid, (name, date, numbers) in self._sessions.items()]
+
+    def messages(self, session_id, start=0, limit=50):
+        """
+        Returns one page of a session's messages, read from disk.
+
+        Args:
+            session_id (int): The session.
+            start (int): The index of the first message (default is 0).
+            limit (int): The maximum number of messages (default is 50).
+        """
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return []
+            return [self._read(number) for number in entry[2][start:start + limit]]
+
+    def search(self, query, limit=20, session_id=None):
+        """
+        Finds the messages containing every term of the query, newest first.
+
+        Args:
+            query (str): The words to look for.
+            limit (int): The maximum number of messages (default is 20).
+            session_id (int): Only search this session (optional).
+
+        Returns:
+            list: The matching messages, each with its 'sid' and 'index' in the session.
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            postings = [self._postings.get(term) for term in terms]
+            if any(p is None for p in postings):
+                return []
+            # Walk the rarest term; the other posting lists are sorted, so membership is a bisect
+            postings.sort(key=len)
+            others = postings[1:]
+            results = []
+            for number in reversed(postings[0]):
+                if session_id is not None and self._message_sids[number] != session_id:
+                    continue
+                if not self._live[number] or not all(_contains(other, number) for other in others):
+                    continue
+                results.append(self._read(number))
+                if len(results) >= limit:
+                    break
+            return results
+
+    def export_jsonl(self, output, session_id=None, start=0, limit=None):
+        """
+        Writes messages as JSON lines, one page at a time.
+
+        Args:
+            output: A path, or a file opened for writing text.
+            session_id (int): Only export this session (optional).
+            start (int): The cursor returned by the previous page, 0 for the first page (default is 0).
+            limit (int): The maximum number of messages in this page, None for all (optional).
+
+        Returns:
+            int: The cursor of the next page, or None when everything was exported.
+        """
+        if isinstance(output, (str, os.PathLike)):
+            with open(output, "w", encoding="utf-8") as f:
+                return self.export_jsonl(f, session_id, start, limit)
+        with self._lock:
+            if session_id is not None:
+                entry = self._sessions.get(session_id)
+                numbers = entry[2] if entry is not None else []
+            else:
+                numbers = range(len(self._offsets))
+            end = len(numbers) if limit is None else min(len(numbers), start + limit)
+            for position in range(start, end):
+                number = numbers[position]
+                if not self._live[number]:
+                    continue
+                self._file.seek(self._offsets[number])
+                output.write(self._file.readline().decode("utf-8"))
+            return end if end < len(numbers) else None
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,219 @@
+import argparse
+import os
+import sys
+import time
+from collections import namedtuple
+import superbuilder_service_pb2 as sb
+import helpers.mw as mw
+import helpers.rag as rag
+import helpers.sync as sync
+
+# Usage, from example/python: python -m helpers.ingest <folder or files...> --checkpoint ingest.log
+
+DEFAULT_BATCH_FILES = 50
+DEFAULT_BATCH_BYTES = 256 * 1024 * 1024
+
+# Aggregate progress of a whole ingestion job, advancing per file: files_done and bytes_done include
+# the files of the current batch already uploaded (checkpointed once the batch ends), and bytes_done
+# the in-flight share of the current file. Rates are averaged over the time spent uploading in this run.
+IngestProgress = namedtuple("IngestProgress", [
+    "files_done", "files_total", "bytes_done", "bytes_total", "elapsed",
+    "files_per_second", "bytes_per_second", "current_file", "current_file_progress",
+])
+
+# The outcome of ingest(): 'stopped' is True when a batch ended before all its files were
+# uploaded (StopAddFiles or an error); the files in 'remaining' are picked up by the next run.
+IngestResult = namedtuple("IngestResult", [
+    "uploaded", "skipped", "remaining", "stopped", "elapsed", "files_per_second", "bytes_per_second",
+])
+
+class Checkpoint:
+    """
+    An append-only log of the files that finished uploading, one path per line.
+
+    Appends are flushed and fsynced per batch, so after a crash at most the batch in flight is
+    uploaded again. A torn last line is ignored on load. Paths are compared normalized, as in
+    helpers.sync, so another spelling of a finished file is still recognized.
+
+    Args:
+        path (str): The checkpoint file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self._torn = False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.endswith("\n"):
+                        self.done.add(sync.normalize_path(line[:-1]))
+                    else:
+                        self._torn = True
+        except FileNotFoundError:
+            pass
+
+    def __contains__(self, file_path):
+        return sync.normalize_path(file_path) in self.done
+
+    def add(self, file_paths):
+        new_paths = [path for path in file_paths if path not in self]
+        if not new_paths:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            # Terminate a torn line first so it cannot merge with the next path
+            f.write(("\n" if self._torn else "") + "".join(path + "\n" for path in new_paths))
+            self._torn = False
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update(sync.normalize_path(path) for path in new_paths)
+
+def make_batches(file_sizes, max_files=DEFAULT_BATCH_FILES, max_bytes=DEFAULT_BATCH_BYTES):
+    """
+    Groups (path, size) pairs into batches of at most max_files files and max_bytes bytes.
+    A single file larger than max_bytes gets a batch of its own.
+    """
+    batch, batch_bytes = [], 0
+    for path, size in file_sizes:
+        if batch and (len(batch) >= max_files or batch_bytes + size > max_bytes):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(path)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+def ingest(stub, file_paths, checkpoint_path, max_files=DEFAULT_BATCH_FILES, max_bytes=DEFAULT_BATCH_BYTES, on_progress=None):
+    """
+    Uploads many files to the knowledge base in bounded AddFiles batches, resuming from a checkpoint.
+
+    Files listed in the checkpoint are skipped. After each batch, the files the middleware reported
+    as uploaded are appended to the checkpoint; if a batch ends short (StopAddFiles, a middleware
+    restart, an error) the job stops and running it again continues with the remaining files.
+    An "Error" status from the middleware is raised once the files finished before it are checkpointed.
+
+    Args:
+        stub: The gRPC stub for making requests.
+        file_paths (list): The files to upload.
+        checkpoint_path (str): The checkpoint file of this job.
+        max_files (int): The maximum number of files per AddFiles request (default is 50).
+        max_bytes (int): The maximum total size of a request in bytes (default is 256 MB).
+        on_progress: A function called with an IngestProgress on every progress update (optional).
+
+    Returns:
+        IngestResult
+    """
+    checkpoint = Checkpoint(checkpoint_path)
+    pending, skipped = [], []
+    for file_path in file_paths:
+        abs_path = os.path.abspath(file_path)
+        if abs_path in checkpoint:
+            skipped.append(abs_path)
+        elif rag.is_valid_file_path(abs_path):
+            pending.append((abs_path, os.path.getsize(abs_path)))
+        else:
+            print(f"Invalid file path: {abs_path}")
+    sizes = dict(pending)
+    normalized_sizes = {sync.normalize_path(path): size for path, size in pending}
+    bytes_total = sum(sizes.values())
+    uploaded = []
+    bytes_done = 0
+    start = time.perf_counter()
+
+    def rates(extra_files=0, extra_bytes=0):
+        elapsed = time.perf_counter() - start
+        if elapsed <= 0:
+            return elapsed, 0.0, 0.0
+        return elapsed, (len(uploaded) + extra_files) / elapsed, (bytes_done + extra_bytes) / elapsed
+
+    reported = set()
+
+    def report(response):
+        # Tracks the batch's finished files here too, since the upload raises on an "Error" status
+        reported.update(sync.normalize_path(path) for path in rag.parse_uploaded(response.filesUploaded))
+        if on_progress is None:
+            return
+        batch_done = [normalized for normalized in reported if normalized in normalized_sizes]
+        batch_bytes = sum(normalized_sizes[normalized] for normalized in batch_done)
+        current = response.currentFileUploading
+        percent = float(response.currentFileProgress) if response.currentFileProgress else 0.0
+        in_flight = 0
+        if current and sync.normalize_path(current) not in reported:
+            in_flight = normalized_sizes.get(sync.normalize_path(current), 0) * percent / 100
+        elapsed, files_per_second, bytes_per_second = rates(len(batch_done), batch_bytes + in_flight)
+        on_progress(IngestProgress(len(uploaded) + len(batch_done), len(pending), bytes_done + batch_bytes + in_flight,
+                                   bytes_total, elapsed, files_per_second, bytes_per_second, current, percent))
+
+    stopped = False
+    for batch in make_batches(pending, max_files, max_bytes):
+        reported.clear()
+        try:
+            rag.upload_file_to_knowledge_base(stub, batch, on_progress=report, verbose=False)
+        finally:
+            # Saved before an error propagates, so the next run does not upload these files again
+            completed = [path for path in batch if sync.normalize_path(path) in reported]
+            checkpoint.add(completed)
+            uploaded.extend(completed)
+            bytes_done += sum(sizes[path] for path in completed)
+        if len(completed) < len(batch):
+            stopped = True
+            break
+
+    remaining = [path for path, _size in pending if path not in checkpoint]
+    elapsed, files_per_second, bytes_per_second = rates()
+    return IngestResult(uploaded, skipped, remaining, stopped, elapsed, files_per_second, bytes_per_second)
+
+def stop(stub):
+    """
+    Asks the middleware to stop the upload in progress; ingest() then returns with stopped=True.
+    """
+    return stub.StopAddFiles(sb.StopAddFilesRequest())
+
+def _format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload many files to the knowledge base in resumable batches.")
+    parser.add_argument("paths", nargs="+", help="Files or folders to upload")
+    parser.add_argument("--checkpoint", required=True, help="Checkpoint file; run again with the same file to resume")
+    parser.add_argument("--ext", help="Comma separated extensions to include from folders, e.g. .pdf,.docx")
+    parser.add_argument("--batch-files", type=int, default=DEFAULT_BATCH_FILES, help="Files per AddFiles request")
+    parser.add_argument("--batch-mb", type=int, default=DEFAULT_BATCH_BYTES // (1024 * 1024), help="Megabytes per AddFiles request")
+    parser.add_argument("--address", default=mw.GRPC_ADDRESS, help="Middleware address")
+    args = parser.parse_args()
+
+    extensions = {ext.strip().lower() for ext in args.ext.split(",")} if args.ext else None
+    file_paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            file_paths.extend(sorted(p for p, _size, _mtime in sync.scan_tree(path, extensions)))
+        else:
+            file_paths.append(path)
+
+    success, stub = mw.connect_pool(args.address)
+    if not success:
+        sys.exit(1)
+
+    last_print = [0.0]
+    def print_progress(progress):
+        now = time.perf_counter()
+        if now - last_print[0] < 0.5:
+            return
+        last_print[0] = now
+        print(f"\r{progress.files_done}/{progress.files_total} files, "
+              f"{_format_bytes(progress.bytes_done)}/{_format_bytes(progress.bytes_total)}, "
+              f"{progress.files_per_second:.2f} files/s, {_format_bytes(progress.bytes_per_second)}/s", end="", flush=True)
+
+    result = ingest(stub, file_paths, args.checkpoint, args.batch_files, args.batch_mb * 1024 * 1024, print_progress)
+    print(f"\nUploaded {len(result.uploaded)} files in {result.elapsed:.1f}s "
+          f"({result.files_per_second:.2f} files/s, {_format_bytes(result.bytes_per_second)}/s), "
+          f"{len(result.skipped)} already done, {len(result.remaining)} remaining")
+    if result.stopped:
+        print("Upload stopped before the end; run the same command again to resume.")
+        sys.exit(2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+import bisect
+import random
+import threading
+import time
+import grpc
+
+# Latency buckets in seconds; the upper ones cover long chats, model loads and downloads
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+class Histogram:
+    """
+    A fixed-bucket histogram; observe() is a bisect and two additions.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        Returns (upper bound, cumulative count) pairs, ending with ('+Inf', count).
+        """
+        result, total = [], 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+class MethodStats:
+    """
+    The metrics recorded for one RPC method.
+    """
+    def __init__(self, buckets):
+        self.calls = 0
+        self.errors = {}
+        self.latency = Histogram(buckets)
+        # Time until the first message of a streaming response
+        self.first_message = Histogram(buckets)
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.response_messages = 0
+
+def _split_method(full_method):
+    # '/SuperBuilder.SuperBuilder/Chat' -> ('SuperBuilder.SuperBuilder', 'Chat')
+    service, _, method = full_method.lstrip("/").rpartition("/")
+    return service, method
+
+class _StreamObserver:
+    """
+    Wraps a streaming response: counts messages and bytes while the caller iterates, and records
+    the call once the stream ends. Every other attribute is the underlying call's.
+    """
+    def __init__(self, interceptor, call, method, request_bytes, start, start_ns):
+        self._interceptor = interceptor
+        self._call = call
+        self._method = method
+        self._request_bytes = request_bytes
+        self._start = start
+        self._start_ns = start_ns
+        self._first_message = None
+        self._messages = 0
+        self._bytes = 0
+        self._done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            response = next(self._call)
+        except StopIteration:
+            self._finish(grpc.StatusCode.OK)
+            raise
+        except grpc.RpcError as e:
+            self._finish(e.code() if hasattr(e, "code") else grpc.StatusCode.UNKNOWN)
+            raise
+        if self._first_message is None:
+            self._first_message = time.perf_counter() - self._start
+        self._messages += 1
+        self._bytes += response.ByteSize()
+        return response
+
+    def _finish(self, code):
+        if not self._done:
+            self._done = True
+            self._interceptor._record(self._method, self._start, self._start_ns, code, self._request_bytes,
+                                      self._bytes, self._messages, self._first_message)
+
+    def cancel(self):
+        self._finish(grpc.StatusCode.CANCELLED)
+        return self._call.cancel()
+
+    def __getattr__(self, name):
+        return getattr(self._call, name)
+
+class MetricsInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor):
+    """
+    A client interceptor recording, per RPC method, the call count, errors by status code, a
+    latency histogram, the time to the first streamed message, request and response sizes in
+    bytes and the number of streamed messages.
+
+    Recording costs a few dict and list updates under a lock per call; message sizes come from
+    ByteSize() on messages the client already holds. Spans are only built when on_span or tracer
+    is set. Streams are recorded when the caller has read them to the end, they failed or were
+    cancelled; a stream abandoned half-way without cancel() is not recorded.
+
+    Attach it with grpc.intercept_channel(), or pass it to SuperBuilderClient(interceptors=[...]).
+
+    Args:
+        buckets: The latency histogram buckets in seconds (default is DEFAULT_BUCKETS).
+        on_span: A function called with an OpenTelemetry (OTLP JSON) style span dict per call (optional).
+        tracer: An opentelemetry.trace.Tracer to create real client spans with (optional).
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS, on_span=None, tracer=None):
+        self._buckets = tuple(buckets)
+        self._on_span = on_span
+        self._tracer = tracer
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _stats_for(self, method):
+        stats = self._stats.get(method)
+        if stats is None:
+            stats = self._stats[method] = MethodStats(self._buckets)
+        return stats
+
+    def _record(self, full_method, start, start_ns, code, request_bytes, response_bytes, messages, first_message=None):
+        latency = time.perf_counter() - start
+        _service, method = _split_method(full_method)
+        with self._lock:
+            stats = self._stats_for(method)
+            stats.calls += 1
+            if code != grpc.StatusCode.OK:
+                stats.errors[code.name] = stats.errors.get(code.name, 0) + 1
+            stats.latency.observe(latency)
+            if first_message is not None:
+                stats.first_message.observe(first_message)
+            stats.request_bytes += request_bytes
+            stats.response_bytes += response_bytes
+            stats.response_messages += messages
+        if start_ns is not None:
+            self._emit_span(full_method, start_ns, start_ns + int(latency * 1e9), code,
+                            request_bytes, response_bytes, messages, first_message)
+
+    def _emit_span(self, full_method, start_ns, end_ns, code, request_bytes, response_bytes, messages, first_message):
+        service, method = _split_method(full_method)
+        # Attribute names follow the OpenTelemetry RPC semantic conventions
+        attributes = {
+            "rpc.system": "grpc", "rpc.service": service, "rpc.method": method,
+            "rpc.grpc.status_code": code.value[0],
+            "rpc.request.size": request_bytes, "rpc.response.size": response_bytes,
+            "rpc.response.messages": messages,
+        }
+        if first_message is not None:
+            attributes["rpc.response.first_message_seconds"] = first_message
+        name = f"{service}/{method}"
+        if self._tracer is not None:
+            # Optional dependency, only needed when a tracer is passed in
+            from opentelemetry.trace import SpanKind, Status, StatusCode
+            span = self._tracer.start_span(name, kind=SpanKind.CLIENT, start_time=start_ns, attributes=attributes)
+            if code != grpc.StatusCode.OK:
+                span.set_status(Status(StatusCode.ERROR, code.name))
+            span.end(end_time=end_ns)
+        if self._on_span is not None:
+            self._on_span({
+                "traceId": f"{random.getrandbits(128):032x}", "spanId": f"{random.getrandbits(64):016x}",
+                "name": name, "kind": "SPAN_KIND_CLIENT",
+                "startTimeUnixNano": start_ns, "endTimeUnixNano": end_ns, "attributes": attributes,
+                "status": {"code": "STATUS_CODE_OK"} if code == grpc.StatusCode.OK else {"code": "STATUS_CODE_ERROR", "message": code.name},
+            })
+
+    def _start_ns(self):
+        return time.time_ns() if self._on_span is not None or self._tracer is not None else None
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        start_ns = self._start_ns()
+        start = time.perf_counter()
+        request_bytes = request.ByteSize()
+        outcome = continuation(client_call_details, request)
+
+        def done(future):
+            if future.cancelled():
+                self._record(client_call_details.method, start, start_ns, grpc.StatusCode.CANCELLED, request_bytes, 0, 0)
+                return
+            error = future.exception()
+            if error is None:
+                self._record(client_call_details.method, start, start_ns, grpc.StatusCode.OK, request_bytes, future.result().ByteSize(), 1)
+            else:
+                code = error.code() if hasattr(error, "code") else grpc.StatusCode.UNKNOWN
+                self._record(client_call_details.method, start, start_ns, code, request_bytes, 0, 0)
+
+        outcome.add_done_callback(done)
+        return outcome
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        start_ns = self._start_ns()
+        start = time.perf_counter()
+        call = continuation(client_call_details, request)
+        return _StreamObserver(self, call, client_call_details.method, request.ByteSize(), start, start_ns)
+
+    def snapshot(self):
+        """
+        Returns the recorded metrics as a dict of method name -> plain values.
+        """
+        with self._lock:
+            return {
+                method: {
+                    "calls": stats.calls, "errors": dict(stats.errors),
+                    "latency_sum": stats.latency.sum, "latency_buckets": stats.latency.cumulative(),
+                    "first_message_count": stats.first_message.count, "first_message_sum": stats.first_message.sum,
+                    "request_bytes": stats.request_bytes, "response_bytes": stats.response_bytes,
+                    "response_messages": stats.response_messages,
+                }
+                for method, stats in self._stats.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def prometheus_text(self, prefix="superbuilder_client"):
+        """
+        Renders the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+
+        def histogram(name, help_text, attribute):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} histogram")
+            for method, stats in sorted(self._stats.items()):
+                values = getattr(stats, attribute)
+                if not values.count:
+                    continue
+                for bound, count in values.cumulative():
+                    lines.append(f'{prefix}_{name}_bucket{{method="{method}",le="{bound}"}} {count}')
+                lines.append(f'{prefix}_{name}_sum{{method="{method}"}} {values.sum}')
+                lines.append(f'{prefix}_{name}_count{{method="{method}"}} {values.count}')
+
+        def counter(name, help_text, attribute):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for method, stats in sorted(self._stats.items()):
+                lines.append(f'{prefix}_{name}{{method="{method}"}} {getattr(stats, attribute)}')
+
+        with self._lock:
+            histogram("rpc_duration_seconds", "Duration of client RPCs, until the last streamed message.", "latency")
+            histogram("rpc_first_message_seconds", "Time until the first message of streaming RPCs.", "first_message")
+            counter("rpc_calls_total", "Completed client RPCs.", "calls")
+            lines.append(f"# HELP {prefix}_rpc_errors_total Failed client RPCs by status code.")
+            lines.append(f"# TYPE {prefix}_rpc_errors_total counter")
+            for method, stats in sorted(self._stats.items()):
+                for code, count in sorted(stats.errors.items()):
+                    lines.append(f'{prefix}_rpc_errors_total{{method="{method}",code="{code}"}} {count}')
+            counter("rpc_request_bytes_total", "Serialized request bytes.", "request_bytes")
+            counter("rpc_response_bytes_total", "Serialized response bytes.", "response_bytes")
+            counter("rpc_response_messages_total", "Response messages, one per unary call or streamed message.", "response_messages")
+        return "\n".join(lines) + "\n"
@@ -3,6 +3,7 @@ import grpc
 from tqdm import tqdm
 import superbuilder_service_pb2 as sb
 import helpers.config as config
+import helpers.model_manager as model_manager
 
 def download(stub, url, local_path):
     progress_bar = tqdm(desc="Downloading", unit="%")
@@ -22,12 +23,18 @@ def download(stub, url, local_path):
         print(f"Model download failed: {e.details()}")
 
 def set_model(stub, local_model_path, llm, embedder, ranker):
+    """
+    Loads the given models through the shared ModelManager, which skips SetModels when they are already resident.
+
+    Returns:
+        SetModelsResponse: The middleware's response (modelsLoaded "True" when the switch was skipped); the exception if loading failed.
+    """
     llm = os.path.join(local_model_path, llm)
     embedder = os.path.join(local_model_path, embedder)
     ranker = os.path.join(local_model_path, ranker)
 
     try:
         print("Loading Models...")
-        return stub.SetModels(sb.SetModelsRequest(llm=llm, embedder=embedder, ranker=ranker))
+        return model_manager.get_shared_manager(stub, local_model_path).set_models(model_manager.ModelSet(llm, embedder, ranker))
     except Exception as e:
         return e
\ No newline at end of file
@@ -0,0 +1,286 @@
+import os
+import threading
+import time
+from collections import Counter, deque, namedtuple
+from contextlib import contextmanager
+from concurrent.futures import Future
+import superbuilder_service_pb2 as sb
+import helpers.config as config
+
+# The models the middleware has loaded; names as in GetClientConfig (e.g. 'Qwen3-8B-int4-ov')
+ModelSet = namedtuple("ModelSet", ["llm", "embedder", "ranker"], defaults=[None, None])
+
+_MODEL_TYPES = (("llm", "chat_model"), ("embedder", "embedding_model"), ("ranker", "ranker_model"))
+
+_shared_managers = {}
+_shared_managers_lock = threading.Lock()
+
+def _model_name(model):
+    # SetModels takes paths, GetClientConfig reports names: compare the last path component
+    return os.path.basename(os.path.normpath(model)) if model else model
+
+def _as_model_set(models):
+    return ModelSet(models) if isinstance(models, str) else ModelSet(*models)
+
+class ModelManager:
+    """
+    Tracks which llm, embedder and ranker the middleware has loaded and switches them only when needed.
+
+    ensure() compares the requested models with the resident ones and sends SetModels only if they
+    differ; before skipping a switch it reads GetClientConfig again, since another client may have
+    changed the models. Switches are serialized with a lock, so concurrent callers asking for the
+    same models load them once. use() holds the models for a block of work (e.g. a translation
+    running on its own thread): switches to other models, including prewarms, wait until it ends.
+
+    submit() queues work that needs specific models. One worker thread runs the queue grouped by
+    model: it keeps draining work for the resident models (up to max_batch items in a row while
+    other models wait) before switching, so alternating requests do not reload the models each time.
+    prewarm() loads models once the queue has been idle for idle_delay seconds.
+
+    Args:
+        stub: The gRPC stub (or pooled client) for making requests to the server.
+        local_model_path: The folder model names are resolved in (default is '', names are paths).
+        warmup: Send LoadModels after each switch, so the first chat does not pay for it (default is True).
+        max_batch: Work items run in a row for one model while other models have work queued (default is 8).
+        idle_delay: Seconds the queue must be idle before prewarming (default is 2).
+    """
+    def __init__(self, stub, local_model_path="", warmup=True, max_batch=8, idle_delay=2.0):
+        self._stub = stub
+        self.local_model_path = local_model_path
+        self.warmup = warmup
+        self.max_batch = max_batch
+        self.idle_delay = idle_delay
+        self._switch_lock = threading.Lock()
+        self._resident = None
+        self._warm = False
+        self._condition = threading.Condition()
+        self._queues = {}
+        self._leases = Counter()
+        self._prewarm = None
+        self._worker = None
+        self._closed = False
+        self._ran_in_a_row = 0
+        self.switches = 0
+        self.skipped = 0
+
+    def resident(self, refresh=False):
+        """
+        Returns the loaded models as a ModelSet, read from GetClientConfig on first use or when refresh is set.
+        """
+        if self._resident is None or refresh:
+            models = {model.get("model_type"): model.get("full_name") for model in config.get_config(self._stub)["ActiveAssistant"]["models"]}
+            self._resident = ModelSet(*(models.get(model_type) for _field, model_type in _MODEL_TYPES))
+        return self._resident
+
+    def _resolve(self, models):
+        # Fills unset models from the resident ones and reduces paths to names
+        models = _as_model_set(models)
+        resident = self.resident()
+        return ModelSet(*(_model_name(getattr(models, field)) or getattr(resident, field) for field, _model_type in _MODEL_TYPES))
+
+    def _paths(self, requested, wanted):
+        # Paths given by the caller are sent as they are, names are looked up in local_model_path
+        paths = []
+        for field, _model_type in _MODEL_TYPES:
+            given, name = getattr(requested, field), getattr(wanted, field)
+            paths.append(given if given and os.path.dirname(given) else os.path.join(self.local_model_path, name) if name else "")
+        return paths
+
+    def is_resident(self, models):
+        """
+        Returns True if the given models (a ModelSet or an llm name) are loaded, without any RPC once the resident models are known.
+        """
+        return self._resolve(models) == self.resident()
+
+    def ensure(self, models):
+        """
+        Makes the given models resident, sending SetModels (and LoadModels) only if they are not already.
+        Waits while other models are held with use().
+
+        Args:
+            models: A ModelSet of names or paths, or an llm name; unset embedder and ranker keep the resident ones.
+
+        Returns:
+            bool: True if the models were switched, False if they were already loaded.
+        """
+        return self._switch(models) is not None
+
+    def set_models(self, models):
+        """
+        Like ensure(), but returns the SetModels response; a skipped switch reports modelsLoaded "True".
+        """
+        response = self._switch(models)
+        return sb.SetModelsResponse(modelsLoaded="True") if response is None else response
+
+    @contextmanager
+    def use(self, models):
+        """
+        Makes the given models resident and keeps them loaded until the block ends.
+
+        Other models are switched to (by ensure(), queued work or a prewarm) only once no block holds
+        different models; blocks holding the same models run side by side.
+        """
+        key = self._resolve(models)
+        with self._condition:
+            self._condition.wait_for(lambda: self._closed or not self._held_except(key))
+            self._leases[key] += 1
+        try:
+            self.ensure(models)
+            yield self
+        finally:
+            with self._condition:
+                self._leases[key] -= 1
+                if not self._leases[key]:
+                    del self._leases[key]
+                self._condition.notify_all()
+
+    def _held_except(self, key):
+        # Called with the condition held: True if a use() block holds models other than key
+        return any(held != key for held in self._leases)
+
+    def _switch(self, models):
+        # Returns the SetModels response, or None if the models were already loaded
+        wanted = self._resolve(models)
+        with self._condition:
+            self._condition.wait_for(lambda: self._closed or not self._held_except(wanted))
+        with self._switch_lock:
+            # Another client may have switched models since the last read: check before skipping
+            if wanted == self.resident() and wanted == self.resident(refresh=True):
+                self.skipped += 1
+                if self.warmup and not self._warm:
+                    self._load()
+                return None
+            # The middleware state is unknown if the switch fails half-way: read it again next time
+            self._resident = None
+            llm, embedder, ranker = self._paths(_as_model_set(models), wanted)
+            response = self._stub.SetModels(sb.SetModelsRequest(llm=llm, embedder=embedder, ranker=ranker))
+            self._resident = wanted
+            self._warm = False
+            self.switches += 1
+            if self.warmup:
+                self._load()
+            return response
+
+    def _load(self):
+        response = self._stub.LoadModels(sb.LoadModelsRequest())
+        self._warm = bool(response.status)
+
+    def submit(self, models, function, *args, **kwargs):
+        """
+        Queues function(*args, **kwargs) to run once the given models are resident.
+
+        Args:
+            models: A ModelSet or an llm name.
+            function: The work, e.g. a function sending a chat request and reading the response.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the function's result or exception.
+        """
+        future = Future()
+        key = self._resolve(models)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("ModelManager is closed")
+            self._queues.setdefault(key, deque()).append((future, function, args, kwargs))
+            self._start_worker()
+            self._condition.notify()
+        return future
+
+    def prewarm(self, models):
+        """
+        Loads the given models the next time the queue has been idle for idle_delay seconds.
+        A later call replaces the pending prewarm.
+        """
+        key = self._resolve(models)
+        with self._condition:
+            self._prewarm = key
+            self._start_worker()
+            self._condition.notify()
+
+    def pending(self):
+        """
+        Returns the number of queued work items per ModelSet.
+        """
+        with self._condition:
+            return {key: len(queue) for key, queue in self._queues.items() if queue}
+
+    def _start_worker(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, daemon=True, name="model-manager")
+            self._worker.start()
+
+    def _next_batch(self):
+        # Called with the condition held: the resident models go first, then the models with the most work
+        queued = {key: queue for key, queue in self._queues.items() if queue}
+        if not queued:
+            return None, []
+        resident = self._resident
+        if resident in queued and (len(queued) == 1 or self._ran_in_a_row < self.max_batch):
+            key = resident
+        else:
+            key = max((k for k in queued if k != resident), key=lambda k: len(queued[k]))
+        queue = queued[key]
+        batch = [queue.popleft() for _ in range(min(len(queue), self.max_batch))]
+        return key, batch
+
+    def _run(self):
+        idle_since = time.monotonic()
+        while True:
+            with self._condition:
+                while True:
+                    if self._closed:
+                        return
+                    key, batch = self._next_batch()
+                    if batch:
+                        break
+                    if self._prewarm is not None and not self._held_except(self._prewarm):
+                        remaining = idle_since + self.idle_delay - time.monotonic()
+                        if remaining <= 0:
+                            key, self._prewarm = self._prewarm, None
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+            try:
+                switched = self.ensure(key)
+            except Exception as e:
+                for future, _function, _args, _kwargs in batch:
+                    future.set_exception(e)
+                idle_since = time.monotonic()
+                continue
+            self._ran_in_a_row = len(batch) if switched else self._ran_in_a_row + len(batch)
+            for future, function, args, kwargs in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(function(*args, **kwargs))
+                except Exception as e:
+                    future.set_exception(e)
+            idle_since = time.monotonic()
+
+    def close(self):
+        """
+        Stops the worker; queued work that has not started is cancelled.
+        """
+        with self._condition:
+            self._closed = True
+            for queue in self._queues.values():
+                for future, _function, _args, _kwargs in queue:
+                    future.cancel()
+            self._queues.clear()
+            self._condition.notify_all()
+
+def get_shared_manager(stub, local_model_path=""):
+    """
+    Returns the process-wide ModelManager of a client, so Streamlit pages and sessions share one
+    view of the resident models.
+
+    Args:
+        stub: The gRPC stub (or pooled client) for making requests to the server.
+        local_model_path: The folder model names are resolved in, used when the manager is created (default is '').
+    """
+    with _shared_managers_lock:
+        manager = _shared_managers.get(id(stub))
+        if manager is None or manager._stub is not stub:
+            manager = _shared_managers[id(stub)] = ModelManager(stub, local_model_path)
+        return manager
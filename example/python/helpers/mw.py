@@ -1,6 +1,8 @@
 import grpc
 import superbuilder_service_pb2 as sb
 import superbuilder_service_pb2_grpc as sbg
+from helpers.pool import GRPC_ADDRESS, get_shared_client
+from helpers.retry import RetryInterceptor
 
 def check_pybackend(stub):
     try:
@@ -31,6 +33,19 @@ def connect(channel):
     
     return success, stub
 
+def connect_pool(address=GRPC_ADDRESS, pool_size=2, attempts=5):
+    """
+    Connects through the process-wide pooled client instead of a dedicated channel.
+
+    The returned client can be used everywhere a stub is expected and can be shared across threads.
+    Its calls get the default deadlines of helpers.retry, and idempotent calls are retried.
+    """
+    client = get_shared_client(address, pool_size=pool_size, interceptors=[RetryInterceptor()])
+    if not client.connect(attempts=attempts):
+        print("gRPC channel connection busy or missing")
+        return False, None
+    return True, client
+
 
 def disconnect(stub, channel):
     if stub is not None:
@@ -0,0 +1,213 @@
+import itertools
+import threading
+import time
+import warnings
+import grpc
+import superbuilder_service_pb2_grpc as sbg
+
+GRPC_ADDRESS = 'localhost:5006'
+
+# Long-lived channels: keep the HTTP/2 connection alive between chats and let gRPC
+# reconnect on its own (with backoff) if the middleware restarts.
+DEFAULT_CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.initial_reconnect_backoff_ms", 500),
+    ("grpc.max_reconnect_backoff_ms", 10000),
+    ("grpc.enable_http_proxy", 0),
+    # Each pooled channel gets its own TCP connection instead of sharing the global subchannel
+    ("grpc.use_local_subchannel_pool", 1),
+]
+
+_shared_clients = {}
+_shared_clients_lock = threading.Lock()
+
+
+class _PooledChannel:
+    """
+    A single channel of the pool together with its stub and last known connectivity state.
+    """
+    def __init__(self, address, options, interceptors=()):
+        self.channel = grpc.insecure_channel(address, options=options)
+        # Interceptors wrap the stub only; connectivity is watched on the raw channel
+        stub_channel = grpc.intercept_channel(self.channel, *interceptors) if interceptors else self.channel
+        self.stub = sbg.SuperBuilderStub(stub_channel)
+        self.state = grpc.ChannelConnectivity.IDLE
+        self.channel.subscribe(self._on_state_change, try_to_connect=False)
+
+    def _on_state_change(self, state):
+        self.state = state
+
+    def close(self):
+        self.channel.unsubscribe(self._on_state_change)
+        self.channel.close()
+
+
+class _PooledMethod:
+    """
+    Callable standing in for a stub method; picks a channel from the pool on every call.
+    """
+    def __init__(self, client, name):
+        self._client = client
+        self._name = name
+
+    def __call__(self, *args, **kwargs):
+        return getattr(self._client.stub, self._name)(*args, **kwargs)
+
+    def future(self, *args, **kwargs):
+        return getattr(self._client.stub, self._name).future(*args, **kwargs)
+
+    def with_call(self, *args, **kwargs):
+        return getattr(self._client.stub, self._name).with_call(*args, **kwargs)
+
+
+class SuperBuilderClient:
+    """
+    Thread-safe SuperBuilder client owning a small pool of long-lived channels.
+
+    The client can be passed anywhere a SuperBuilderStub is expected (e.g. to the helpers in
+    this package): every RPC attribute picks the next channel of the pool, preferring channels
+    that are currently connected.
+
+    Args:
+        address: The middleware address (default is 'localhost:5006').
+        pool_size: The number of channels to keep open (default is 2).
+        options: Channel options, defaults to DEFAULT_CHANNEL_OPTIONS (keepalive + reconnect backoff).
+        interceptors: gRPC client interceptors applied to every channel, e.g. a MetricsInterceptor (optional).
+    """
+    def __init__(self, address=GRPC_ADDRESS, pool_size=2, options=None, interceptors=()):
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+        self.address = address
+        self.pool_size = pool_size
+        self._options = list(DEFAULT_CHANNEL_OPTIONS if options is None else options)
+        self._interceptors = tuple(interceptors)
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._methods = {}
+        self._closed = False
+        self._channels = [_PooledChannel(address, self._options, self._interceptors) for _ in range(pool_size)]
+
+    def connect(self, timeout=15, attempts=5, backoff=1.0, max_backoff=16.0):
+        """
+        Waits until at least one channel of the pool is ready, retrying with exponential backoff.
+
+        Args:
+            timeout: Seconds to wait for a channel on each attempt (default is 15).
+            attempts: The number of attempts before giving up (default is 5).
+            backoff: The delay before the second attempt, doubled after every failure (default is 1.0).
+            max_backoff: Upper bound for the delay between attempts (default is 16.0).
+
+        Returns:
+            True if the middleware is reachable, False otherwise.
+        """
+        delay = backoff
+        for attempt in range(attempts):
+            channel = self._next_channel().channel
+            try:
+                grpc.channel_ready_future(channel).result(timeout=timeout)
+                return True
+            except grpc.FutureTimeoutError:
+                print(f"Connection attempt {attempt + 1} failed.")
+            if attempt + 1 < attempts:
+                time.sleep(delay)
+                delay = min(delay * 2, max_backoff)
+        return False
+
+    def _next_channel(self):
+        with self._lock:
+            if self._closed:
+                raise ValueError("Cannot use a closed SuperBuilderClient")
+            channels = self._channels
+        start = next(self._counter)
+        # Round-robin, but skip channels that are reconnecting as long as a healthier one exists
+        for offset in range(len(channels)):
+            pooled = channels[(start + offset) % len(channels)]
+            if pooled.state not in (grpc.ChannelConnectivity.TRANSIENT_FAILURE, grpc.ChannelConnectivity.SHUTDOWN):
+                return pooled
+        return channels[start % len(channels)]
+
+    @property
+    def stub(self):
+        """
+        A SuperBuilderStub bound to the next channel of the pool.
+        """
+        return self._next_channel().stub
+
+    @property
+    def channel(self):
+        """
+        The next channel of the pool, for callers that need a raw grpc.Channel.
+        """
+        return self._next_channel().channel
+
+    def reset(self):
+        """
+        Replaces every channel of the pool with a fresh one, e.g. after the middleware was reinstalled.
+        """
+        with self._lock:
+            old_channels, self._channels = self._channels, [
+                _PooledChannel(self.address, self._options, self._interceptors) for _ in range(self.pool_size)
+            ]
+        for pooled in old_channels:
+            pooled.close()
+
+    def close(self):
+        """
+        Closes all channels of the pool. In-flight RPCs are cancelled.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            channels = self._channels
+        for pooled in channels:
+            pooled.close()
+        with _shared_clients_lock:
+            if _shared_clients.get(self.address) is self:
+                del _shared_clients[self.address]
+
+    def __getattr__(self, name):
+        # Only called for attributes not found normally, i.e. the RPC methods of the stub
+        if name.startswith('_') or not hasattr(self._channels[0].stub, name):
+            raise AttributeError(name)
+        method = self._methods.get(name)
+        if method is None:
+            method = self._methods.setdefault(name, _PooledMethod(self, name))
+        return method
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def get_shared_client(address=GRPC_ADDRESS, pool_size=2, interceptors=()):
+    """
+    Returns the process-wide SuperBuilderClient for the given address, creating it on first use.
+
+    Args:
+        address: The middleware address (default is 'localhost:5006').
+        pool_size: The number of channels if the client has to be created (default is 2).
+        interceptors: Client interceptors if the client has to be created (optional).
+
+    Returns:
+        A SuperBuilderClient shared by every caller in this process. If it already exists with another
+        pool_size or other interceptor types, a RuntimeWarning is issued and the existing client is returned.
+    """
+    with _shared_clients_lock:
+        client = _shared_clients.get(address)
+        if client is None:
+            client = _shared_clients[address] = SuperBuilderClient(address, pool_size=pool_size, interceptors=interceptors)
+            return client
+    # Interceptors are compared by type: every caller creates its own instances
+    wanted = [type(interceptor).__name__ for interceptor in interceptors]
+    existing = [type(interceptor).__name__ for interceptor in client._interceptors]
+    if client.pool_size != pool_size or wanted != existing:
+        warnings.warn(f"The shared client for {address} already exists with pool_size={client.pool_size} and "
+                      f"interceptors {existing}; pool_size={pool_size} and interceptors {wanted} are ignored",
+                      RuntimeWarning, stacklevel=2)
+    return client
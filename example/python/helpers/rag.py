@@ -3,6 +3,7 @@ import os
 import json
 from tqdm import tqdm
 import superbuilder_service_pb2 as sb
+from helpers.attachments import resolve_attachments
 
 def is_valid_file_path(file_path):
     """
@@ -16,42 +17,58 @@ def is_valid_file_path(file_path):
     """
     return os.path.isfile(file_path)
 
-def upload_file_to_knowledge_base(stub, file_paths):
+def parse_uploaded(files_uploaded):
+    """
+    Returns the files listed in AddFilesResponse.filesUploaded, the JSON list of the files stored so
+    far; empty or non-JSON status text gives an empty list.
+    """
+    try:
+        uploaded = json.loads(files_uploaded)
+    except ValueError:
+        return []
+    return uploaded if isinstance(uploaded, list) else []
+
+def upload_file_to_knowledge_base(stub, file_paths, on_progress=None, verbose=True):
     """
     Upload files to the knowledge base.
     
     Args:
         stub: The gRPC stub for making requests.
         file_paths (list): List of file paths to upload.
+        on_progress: A function called with every AddFilesResponse as it streams (optional).
+        verbose (bool): Whether to print the files and a progress bar (default is True).
+
+    Returns:
+        list: The files the middleware reported as uploaded; fewer than requested if the upload
+            was stopped with StopAddFiles or failed.
     """
-    absolute_file_paths = []
-    for file_path in file_paths:
-        abs_path = os.path.abspath(file_path)
-        if not is_valid_file_path(abs_path):
-            print(f"Invalid file path: {abs_path}")
-            continue
-        absolute_file_paths.append(abs_path)
-    
-    if not absolute_file_paths:
+    resolved = resolve_attachments(file_paths)
+    if not resolved.valid:
         print("No valid file paths to upload.")
-        return
+        return []
     
-    print("Files to Upload: ", absolute_file_paths)
-    file_paths_str = json.dumps(absolute_file_paths)
-    request = sb.AddFilesRequest(filesToUpload=file_paths_str)
+    if verbose:
+        print("Files to Upload: ", list(resolved.valid))
+    request = sb.AddFilesRequest(filesToUpload=resolved.json)
 
-    progress_bar = tqdm(desc="Uploading", unit="%")
+    uploaded = {}
+    progress_bar = tqdm(desc="Uploading", unit="%") if verbose else None
     try:
         for response in stub.AddFiles(request):
             if "Error" in response.filesUploaded:
                 raise Exception(f"File upload failed: {response.filesUploaded}")
-            
-            progress_bar.n = int(response.currentFileProgress)
-            progress_bar.refresh()
+            uploaded.update(dict.fromkeys(parse_uploaded(response.filesUploaded)))
+            if on_progress is not None:
+                on_progress(response)
+            if progress_bar is not None and response.currentFileProgress:
+                progress_bar.n = int(response.currentFileProgress)
+                progress_bar.refresh()
     except grpc.RpcError as e:
         print(f"File upload failed: {e.details()}")
     finally:
-        progress_bar.close()
+        if progress_bar is not None:
+            progress_bar.close()
+    return list(uploaded)
 
 def remove_uploaded_file(stub, file_paths):
     """
@@ -61,21 +78,13 @@ def remove_uploaded_file(stub, file_paths):
         stub: The gRPC stub for making requests.
         file_paths (list): List of file paths to remove.
     """
-    absolute_file_paths = []
-    for file_path in file_paths:
-        abs_path = os.path.abspath(file_path)
-        if not is_valid_file_path(abs_path):
-            print(f"Invalid file path: {abs_path}")
-            continue
-        absolute_file_paths.append(abs_path)
-    
-    if not absolute_file_paths:
+    resolved = resolve_attachments(file_paths)
+    if not resolved.valid:
         print("No valid file paths to upload.")
         return
     
-    print("Files to Remove: ", absolute_file_paths)
-    file_paths_str = json.dumps(absolute_file_paths)
-    request = sb.RemoveFilesRequest(filesToRemove=file_paths_str)
+    print("Files to Remove: ", list(resolved.valid))
+    request = sb.RemoveFilesRequest(filesToRemove=resolved.json)
     try:
         response = stub.RemoveFiles(request)
         if "Error" in response.filesRemoved:
@@ -84,6 +93,19 @@ def remove_uploaded_file(stub, file_paths):
     except grpc.RpcError as e:
         print(f"File removal failed: {e.details()}")
 
+def get_file_list(stub):
+    """
+    Retrieves the files stored in the knowledge base with their metadata.
+
+    Args:
+        stub: The gRPC stub for making requests.
+
+    Returns:
+        list: [path, metadata] pairs as returned by GetFileList.
+    """
+    response = stub.GetFileList(sb.GetFileListRequest(fileType=""))
+    return json.loads(response.fileList)
+
 def list_uploaded_files(stub):
     """
     List all uploaded files in the knowledge base.
@@ -94,12 +116,10 @@ def list_uploaded_files(stub):
     Returns:
         list: A list of uploaded files if successful
     """
-    request = sb.GetFileListRequest(fileType="")
     try:
-        response = stub.GetFileList(request)
         uploaded_filepaths = []
         print("Uploaded Files:")
-        for file in json.loads(response.fileList):
+        for file in get_file_list(stub):
             uploaded_filepaths.append(file[0])
             print(file)
         return uploaded_filepaths
@@ -0,0 +1,471 @@
+import collections
+import queue
+import random
+import threading
+import time
+import grpc
+import superbuilder_service_pb2 as sb
+
+# Default deadlines in seconds for calls made without timeout=. Model loads and file removal can
+# legitimately take minutes; streaming calls (Chat, AddFiles, DownloadFiles) have no deadline and
+# are guarded by guard_stream() instead.
+DEFAULT_DEADLINES = {
+    "SayHello": 5,
+    "SayHelloPyllm": 10,
+    "CheckHealth": 5,
+    "GetClientConfig": 10,
+    "GetFileList": 15,
+    "GetChatHistory": 15,
+    "StopChat": 5,
+    "StopAddFiles": 5,
+    "DisconnectClient": 5,
+    "RemoveSession": 15,
+    "SetParameters": 15,
+    "RemoveFiles": 120,
+    "LoadModels": 600,
+    "SetModels": 600,
+}
+
+# Calls that only read state, so sending them twice is harmless
+IDEMPOTENT_METHODS = frozenset({"GetFileList", "GetChatHistory", "GetClientConfig", "CheckHealth", "SayHello", "SayHelloPyllm"})
+
+RETRYABLE_STATUS_CODES = frozenset({
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+})
+
+class _ClientCallDetails(
+        collections.namedtuple("_ClientCallDetails", ("method", "timeout", "metadata", "credentials", "wait_for_ready", "compression")),
+        grpc.ClientCallDetails):
+    pass
+
+def _method_name(full_method):
+    return full_method.rpartition("/")[2]
+
+class RetryInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor):
+    """
+    Applies a default deadline per method and retries idempotent unary calls with exponential
+    backoff and jitter.
+
+    A call with an explicit timeout= keeps it. Only methods in 'idempotent' are retried, and only
+    on RETRYABLE_STATUS_CODES; every attempt gets the full deadline. Retries are sent from the
+    completion callback of the failed attempt, so .future() still returns right away.
+
+    Args:
+        deadlines: Method name -> seconds, merged over DEFAULT_DEADLINES (optional).
+        idempotent: Method names that may be retried (default is IDEMPOTENT_METHODS).
+        max_attempts: Attempts per call, including the first (default is 4).
+        backoff: The delay before the first retry in seconds, doubled for each retry (default is 0.25).
+        max_backoff: Upper bound of the delay between attempts (default is 4).
+    """
+    def __init__(self, deadlines=None, idempotent=IDEMPOTENT_METHODS, max_attempts=4, backoff=0.25, max_backoff=4.0):
+        self.deadlines = dict(DEFAULT_DEADLINES)
+        self.deadlines.update(deadlines or {})
+        self.idempotent = frozenset(idempotent)
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def _with_deadline(self, details):
+        if details.timeout is not None:
+            return details
+        timeout = self.deadlines.get(_method_name(details.method))
+        if timeout is None:
+            return details
+        return _ClientCallDetails(details.method, timeout, details.metadata, details.credentials,
+                                  getattr(details, "wait_for_ready", None), getattr(details, "compression", None))
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        details = self._with_deadline(client_call_details)
+        if _method_name(details.method) not in self.idempotent:
+            return continuation(details, request)
+        return _RetryingCall(self, continuation, details, request)
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        return continuation(self._with_deadline(client_call_details), request)
+
+class _RetryingCall(grpc.Call, grpc.Future):
+    """
+    The call returned for an idempotent method: a future over a sequence of attempts, where a
+    failed attempt schedules the next one from its done-callback instead of blocking the caller.
+    """
+    def __init__(self, interceptor, continuation, details, request):
+        self._interceptor = interceptor
+        self._continuation = continuation
+        self._details = details
+        self._request = request
+        self._condition = threading.Condition()
+        self._attempt = 0
+        self._delay = interceptor.backoff
+        self._current = None
+        self._timer = None
+        self._outcome = None
+        self._cancelled = False
+        self._callbacks = []
+        self._start()
+
+    def _start(self):
+        with self._condition:
+            if self._cancelled:
+                return
+            self._attempt += 1
+        # Synchronous calls (stub.Method()) get a completed outcome here, .future() calls a pending one
+        try:
+            current = self._continuation(self._details, self._request)
+        except Exception as e:
+            self._finish(_LocalOutcome(e))
+            return
+        with self._condition:
+            self._current = current
+            cancelled = self._cancelled
+        if cancelled:
+            current.cancel()
+        current.add_done_callback(self._attempt_done)
+
+    def _attempt_done(self, current):
+        if current.cancelled():
+            self._finish(current)
+            return
+        error = current.exception()
+        retry = (error is not None and self._attempt < self._interceptor.max_attempts
+                 and hasattr(error, "code") and error.code() in RETRYABLE_STATUS_CODES)
+        with self._condition:
+            if retry and not self._cancelled:
+                # Full jitter keeps many clients from retrying in lockstep after a middleware restart
+                self._timer = threading.Timer(random.uniform(0, self._delay), self._start)
+                self._timer.daemon = True
+                self._delay = min(self._delay * 2, self._interceptor.max_backoff)
+                self._timer.start()
+                return
+        self._finish(current)
+
+    def _finish(self, current):
+        with self._condition:
+            if self._outcome is not None:
+                return
+            self._outcome = current
+            callbacks, self._callbacks = self._callbacks, []
+            self._condition.notify_all()
+        for callback in callbacks:
+            callback(self)
+
+    def _wait(self, timeout):
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._outcome is not None, timeout):
+                raise grpc.FutureTimeoutError()
+            return self._outcome
+
+    # grpc.Future
+    def cancel(self):
+        with self._condition:
+            if self._outcome is not None:
+                return False
+            self._cancelled = True
+            current, timer = self._current, self._timer
+        if timer is not None:
+            timer.cancel()
+        if current is None or not current.cancel():
+            # Waiting between attempts: there is no call left to cancel
+            self._finish(_LocalOutcome())
+        return True
+
+    def cancelled(self):
+        with self._condition:
+            return self._outcome is not None and self._outcome.cancelled()
+
+    def running(self):
+        return not self.done()
+
+    def done(self):
+        with self._condition:
+            return self._outcome is not None
+
+    def result(self, timeout=None):
+        return self._wait(timeout).result()
+
+    def exception(self, timeout=None):
+        return self._wait(timeout).exception()
+
+    def traceback(self, timeout=None):
+        return self._wait(timeout).traceback()
+
+    def add_done_callback(self, fn):
+        with self._condition:
+            if self._outcome is None:
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    # grpc.Call, answered by the attempt in progress or the last one
+    def _call(self):
+        with self._condition:
+            return self._outcome or self._current
+
+    def is_active(self):
+        return not self.done()
+
+    def time_remaining(self):
+        return self._call().time_remaining()
+
+    def add_callback(self, callback):
+        return self._call().add_callback(callback)
+
+    def initial_metadata(self):
+        return self._call().initial_metadata()
+
+    def trailing_metadata(self):
+        return self._call().trailing_metadata()
+
+    def code(self):
+        return self._call().code()
+
+    def details(self):
+        return self._call().details()
+
+class _LocalOutcome(grpc.Call, grpc.Future):
+    # The outcome of a call that ended without an attempt to report: cancelled between two
+    # attempts, or failed to start with an exception
+    def __init__(self, exception=None):
+        self._exception = exception
+
+    def cancel(self):
+        return False
+
+    def cancelled(self):
+        return self._exception is None
+
+    def running(self):
+        return False
+
+    def done(self):
+        return True
+
+    def result(self, timeout=None):
+        raise self.exception()
+
+    def exception(self, timeout=None):
+        if self._exception is None:
+            raise grpc.FutureCancelledError()
+        return self._exception
+
+    def traceback(self, timeout=None):
+        self.exception()
+        return self._exception.__traceback__
+
+    def add_done_callback(self, fn):
+        fn(self)
+
+    def is_active(self):
+        return False
+
+    def time_remaining(self):
+        return None
+
+    def add_callback(self, callback):
+        return False
+
+    def initial_metadata(self):
+        return None
+
+    def trailing_metadata(self):
+        return None
+
+    def code(self):
+        return grpc.StatusCode.CANCELLED if self._exception is None else grpc.StatusCode.UNKNOWN
+
+    def details(self):
+        return "Cancelled between attempts" if self._exception is None else str(self._exception)
+
+def hedged_call(method, request, hedge_after=0.5, max_hedges=1, timeout=None):
+    """
+    Calls an idempotent unary method and, if no answer came within hedge_after seconds, sends the
+    same request again; the first successful response wins and the other calls are cancelled.
+
+    Args:
+        method: A stub method, e.g. stub.GetFileList (it must support .future()).
+        request: The request message.
+        hedge_after (float): Seconds to wait before each additional request (default is 0.5).
+        max_hedges (int): The maximum number of additional requests (default is 1).
+        timeout (float): The deadline of each request in seconds (optional).
+
+    Returns:
+        The response of the fastest successful call; the error of the last call if all failed.
+    """
+    # gRPC futures are not concurrent.futures, so completions are collected through callbacks
+    completed = queue.SimpleQueue()
+    futures = []
+
+    def send():
+        future = method.future(request, timeout=timeout)
+        futures.append(future)
+        future.add_done_callback(completed.put)
+
+    send()
+    outstanding = 1
+    last_failed = None
+    try:
+        while outstanding:
+            can_hedge = len(futures) <= max_hedges
+            try:
+                future = completed.get(timeout=hedge_after if can_hedge else None)
+            except queue.Empty:
+                # No answer in time: send the request again
+                send()
+                outstanding += 1
+                continue
+            outstanding -= 1
+            if future.exception() is None:
+                return future.result()
+            last_failed = future
+            if can_hedge and not outstanding:
+                # Every call so far failed: try again right away
+                send()
+                outstanding += 1
+        return last_failed.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+class StreamStoppedError(RuntimeError):
+    """Raised when a guarded stream ended early because StopChat was sent for another stream."""
+
+# StopChatRequest carries no session, so the middleware stops every chat it is generating. Guards
+# therefore only send StopChat when theirs is the only guarded stream on the stub, and count the
+# StopChat requests they send, so a stream ended by one can be reported instead of returning a
+# cut-off answer.
+_guards_lock = threading.Lock()
+_active_guards = {}  # id(stub) -> guards iterating a stream of that stub
+_stops_sent = {}  # id(stub) -> StopChat requests sent by guards, only ever growing
+
+def stops_sent(stub):
+    """
+    Returns the number of StopChat requests guards have sent through a stub, for guard_stream(stops_before=).
+    """
+    with _guards_lock:
+        return _stops_sent.get(id(stub), 0)
+
+class _StreamGuard:
+    """
+    Iterates a streaming call while one watchdog thread stops the generation if the stream stalls.
+    Each message only updates two attributes, so guarding costs no extra work per token.
+    """
+    def __init__(self, stub, call, first_message_timeout, idle_timeout, total_timeout, stops_before):
+        self._stub = stub
+        self._call = call
+        self._key = id(stub)
+        with _guards_lock:
+            _active_guards.setdefault(self._key, set()).add(self)
+            self._stops_before = _stops_sent.get(self._key, 0) if stops_before is None else stops_before
+        self._idle_timeout = idle_timeout
+        self._total_deadline = time.monotonic() + total_timeout if total_timeout is not None else None
+        self._last_message = time.monotonic()
+        self._limit = first_message_timeout
+        self._got_message = False
+        self._finished = threading.Event()
+        self._expired = None
+        self._sent_stop = False
+        if first_message_timeout is not None or idle_timeout is not None or total_timeout is not None:
+            threading.Thread(target=self._watch, daemon=True, name="stream-guard").start()
+
+    def _next_deadline(self):
+        deadline, what = self._total_deadline, "end of stream"
+        if self._limit is not None:
+            message_deadline = self._last_message + self._limit
+            if deadline is None or message_deadline < deadline:
+                deadline, what = message_deadline, "message" if self._got_message else "first message"
+        return deadline, what
+
+    def _watch(self):
+        while True:
+            deadline, what = self._next_deadline()
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                break
+            if self._finished.wait(remaining):
+                return
+        self._expired = f"No {what} in time"
+        with _guards_lock:
+            alone = self._stub is not None and _active_guards.get(self._key) == {self}
+            if alone:
+                _stops_sent[self._key] = _stops_sent.get(self._key, 0) + 1
+                self._sent_stop = True
+        # Stop the generation on the middleware first, unless that would stop other streams too,
+        # then drop the call locally
+        try:
+            if alone:
+                self._stub.StopChat(sb.StopChatRequest(), timeout=DEFAULT_DEADLINES["StopChat"])
+        except grpc.RpcError:
+            pass
+        # Guard the gRPC call itself (ResponseCache.chat() takes a guard for this): generators
+        # wrapping it cannot be cancelled, only ended by StopChat
+        cancel = getattr(self._call, "cancel", None)
+        if cancel is not None:
+            cancel()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            response = next(self._call)
+        except StopIteration:
+            stopped = self._end()
+            if self._expired is not None:
+                raise TimeoutError(self._expired) from None
+            if stopped:
+                raise StreamStoppedError("The stream was ended by StopChat sent for another stream") from None
+            raise
+        except grpc.RpcError as e:
+            self._end()
+            if self._expired is not None:
+                raise TimeoutError(self._expired) from e
+            raise
+        self._last_message = time.monotonic()
+        self._limit = self._idle_timeout
+        self._got_message = True
+        return response
+
+    def _end(self):
+        # Unregisters the guard; returns whether a guard sent StopChat while this stream was active
+        self._finished.set()
+        with _guards_lock:
+            guards = _active_guards.get(self._key)
+            if guards is not None:
+                guards.discard(self)
+            stopped = _stops_sent.get(self._key, 0) - self._stops_before - (1 if self._sent_stop else 0) > 0
+            if not guards:
+                _active_guards.pop(self._key, None)
+        return stopped
+
+    def cancel(self):
+        self._end()
+        return self._call.cancel()
+
+    def __getattr__(self, name):
+        return getattr(self._call, name)
+
+def guard_stream(stub, call, first_message_timeout=None, idle_timeout=None, total_timeout=None, stops_before=None):
+    """
+    Bounds how long a streaming call (e.g. the iterator returned by chat.set_chat_request()) may
+    stall. When a limit is hit, the call is cancelled and iterating raises TimeoutError; the thread
+    reading the stream is never pinned.
+
+    StopChatRequest carries no session, so the middleware stops whatever it is generating. StopChat
+    is therefore only sent when no other guarded stream of the stub is active; otherwise the call
+    is only cancelled locally. A guarded stream cut short by StopChat sent for another stream
+    raises StreamStoppedError instead of ending with a partial answer.
+
+    Args:
+        stub: The gRPC stub used to send StopChat, None to only cancel the call.
+        call: The streaming call.
+        first_message_timeout (float): Seconds to wait for the first message (optional).
+        idle_timeout (float): Seconds to wait for each following message (optional).
+        total_timeout (float): Seconds for the whole stream (optional).
+        stops_before (int): stops_sent(stub) taken before the call was sent, so StopChat sent
+            between sending the call and guarding it is noticed too (optional).
+
+    Returns:
+        An iterator over the call's messages.
+    """
+    return _StreamGuard(stub, call, first_message_timeout, idle_timeout, total_timeout, stops_before)
@@ -0,0 +1,123 @@
+import random
+import threading
+import time
+import weakref
+import superbuilder_service_pb2 as sb
+import helpers.history as history
+
+# Legacy clients pick random 8-digit session IDs (< 100,000,000). Allocated IDs live above that
+# range and below the int32 limit of ChatRequest.sessionId, so they never collide with them.
+SESSION_ID_BASE = 100_000_000
+SESSION_ID_MAX = 2**31 - 1
+# Seconds after which the cached session IDs are fetched again
+DEFAULT_MAX_AGE = 300
+
+_allocators = weakref.WeakKeyDictionary()
+_allocators_lock = threading.Lock()
+
+class SessionIdAllocator:
+    """
+    Hands out chat session IDs locally, without fetching the chat history for every new chat.
+
+    IDs are drawn at random above the legacy 8-digit range, like the legacy clients do below it,
+    so clients and processes allocating at the same time do not pick the same IDs. Every ID is
+    checked against a cached set of IDs in use: the ones allocated here, the ones passed to
+    add() and, when fetch_history is set, the session IDs of the chat history, fetched on first
+    use and again every max_age seconds. With fetch_history=False no RPC is made at all.
+
+    Args:
+        stub: The gRPC stub used to fetch the chat history (optional when fetch_history is False).
+        fetch_history: Whether to check the IDs against GetChatHistory (default is True).
+        max_age: Seconds after which the cached IDs are refreshed, None to never refresh (default is 300).
+    """
+    def __init__(self, stub=None, fetch_history=True, max_age=DEFAULT_MAX_AGE):
+        if fetch_history and stub is None:
+            raise ValueError("A stub is required to fetch the chat history")
+        self._stub = stub
+        self._fetch_history = fetch_history
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._known_ids = set()
+        # Seeded from the OS, so every process draws a different sequence
+        self._random = random.Random()
+        self._refreshed_at = None
+
+    def _is_stale(self):
+        if not self._fetch_history:
+            return False
+        if self._refreshed_at is None:
+            return True
+        return self._max_age is not None and time.monotonic() - self._refreshed_at > self._max_age
+
+    @property
+    def fetch_history(self):
+        return self._fetch_history
+
+    def enable_history(self, stub=None):
+        """
+        Starts checking the IDs against the chat history, fetched on the next allocation.
+        """
+        with self._lock:
+            if stub is not None:
+                self._stub = stub
+            if self._stub is None:
+                raise ValueError("A stub is required to fetch the chat history")
+            self._fetch_history = True
+
+    def _merge(self, session_ids):
+        self._known_ids.update(session_ids)
+
+    def refresh(self):
+        """
+        Fetches the chat history and merges its session IDs into the cached set.
+        """
+        data = self._stub.GetChatHistory(sb.GetChatHistoryRequest()).data
+        # Decode one session at a time: only the IDs are kept, not the whole history
+        session_ids = [session['sid'] for session in history.iter_sessions(data)]
+        with self._lock:
+            self._merge(session_ids)
+            self._refreshed_at = time.monotonic()
+
+    def add(self, session_ids):
+        """
+        Marks session IDs as used, e.g. when they were created by another client.
+        """
+        with self._lock:
+            self._merge(session_ids)
+
+    def next_id(self):
+        """
+        Returns a session ID that is not used by the cached history nor by earlier allocations.
+        """
+        if self._is_stale():
+            with self._refresh_lock:
+                # Concurrent callers wait for a single refresh instead of each fetching the history
+                if self._is_stale():
+                    self.refresh()
+        with self._lock:
+            while True:
+                session_id = self._random.randint(SESSION_ID_BASE, SESSION_ID_MAX)
+                if session_id not in self._known_ids:
+                    self._known_ids.add(session_id)
+                    return session_id
+
+def get_allocator(stub, fetch_history=True):
+    """
+    Returns the SessionIdAllocator cached for the given stub, creating it on first use. A caller
+    asking for fetch_history turns it on for an allocator created without it.
+
+    Args:
+        stub: The gRPC stub (or pooled client) the allocator belongs to.
+        fetch_history: Whether the IDs are checked against GetChatHistory (default is True).
+
+    Returns:
+        A SessionIdAllocator shared by all callers using the same stub.
+    """
+    with _allocators_lock:
+        allocator = _allocators.get(stub)
+        if allocator is None:
+            allocator = _allocators[stub] = SessionIdAllocator(stub, fetch_history=fetch_history)
+    if fetch_history and not allocator.fetch_history:
+        allocator.enable_history(stub)
+    return allocator
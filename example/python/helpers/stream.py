@@ -0,0 +1,128 @@
+import asyncio
+import queue
+import sys
+import time
+from collections import namedtuple
+
+# The assembled result of a streamed chat: the full text, the file references returned with the
+# last message, and the number of streamed messages.
+ChatResult = namedtuple("ChatResult", ["text", "references", "chunks"])
+
+class TokenSink:
+    """
+    Receives streamed tokens as they arrive. Subclasses override write() and optionally close().
+    """
+    def write(self, token):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class CallbackSink(TokenSink):
+    """
+    Calls the given function with every token.
+    """
+    def __init__(self, callback):
+        self._callback = callback
+
+    def write(self, token):
+        self._callback(token)
+
+class QueueSink(TokenSink):
+    """
+    Puts every token on a queue.Queue; QueueSink.END is put once the stream is finished.
+    """
+    END = None
+
+    def __init__(self, token_queue=None):
+        self.queue = queue.Queue() if token_queue is None else token_queue
+
+    def write(self, token):
+        self.queue.put(token)
+
+    def close(self):
+        self.queue.put(self.END)
+
+    def __iter__(self):
+        while True:
+            token = self.queue.get()
+            if token is self.END:
+                return
+            yield token
+
+class AsyncIteratorSink(TokenSink):
+    """
+    Bridges a stream consumed in a worker thread to an event loop: iterate the sink with 'async for'.
+
+    Args:
+        loop: The event loop that iterates the sink (default is the running loop).
+    """
+    _END = object()
+
+    def __init__(self, loop=None):
+        self._loop = loop or asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+
+    def write(self, token):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, token)
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, self._END)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        token = await self._queue.get()
+        if token is self._END:
+            raise StopAsyncIteration
+        return token
+
+class PrintSink(TokenSink):
+    """
+    Prints tokens to a text stream, flushing on newlines or at most every flush_interval seconds
+    instead of once per token.
+    """
+    def __init__(self, stream=None, flush_interval=0.05):
+        self._stream = sys.stdout if stream is None else stream
+        self._flush_interval = flush_interval
+        self._last_flush = time.perf_counter()
+
+    def write(self, token):
+        self._stream.write(token)
+        now = time.perf_counter()
+        if "\n" in token or now - self._last_flush >= self._flush_interval:
+            self._stream.flush()
+            self._last_flush = now
+
+    def close(self):
+        self._stream.flush()
+
+def stream_chat_response(response_iterator, sinks=()):
+    """
+    Consumes a streamed chat response, forwarding every token to the given sinks.
+
+    The text is collected in a list and joined once at the end, so assembling the response
+    stays linear in its length.
+
+    Args:
+        response_iterator: An iterator of ChatResponse messages.
+        sinks: TokenSink instances receiving each token as it arrives (optional).
+
+    Returns:
+        A ChatResult with the full text, the references of the response and the number of chunks.
+    """
+    chunks = []
+    references = []
+    try:
+        for chat_response in response_iterator:
+            token = chat_response.message
+            chunks.append(token)
+            for sink in sinks:
+                sink.write(token)
+            if chat_response.references:
+                references.extend(chat_response.references)
+    finally:
+        for sink in sinks:
+            sink.close()
+    return ChatResult("".join(chunks), references, len(chunks))
@@ -0,0 +1,245 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+from collections import namedtuple
+import superbuilder_service_pb2 as sb
+import helpers.mw as mw
+import helpers.rag as rag
+
+# Usage, from example/python: python -m helpers.sync <folder> [--ext .pdf,.docx] [--dry-run]
+
+# Manifests live outside the synced folder, one per root directory
+MANIFEST_DIR = os.path.join(os.path.expanduser("~"), ".superbuilder", "sync")
+
+# What a sync has to do: files new to the knowledge base, files whose content changed since the
+# last sync (removed and uploaded again), files deleted locally, and files left as they are.
+SyncPlan = namedtuple("SyncPlan", ["added", "modified", "removed", "unchanged"])
+
+def normalize_path(path):
+    """
+    Normalizes a path for comparisons with the paths stored by the middleware.
+    """
+    return os.path.normcase(os.path.normpath(os.path.abspath(path)))
+
+def default_manifest_path(root):
+    digest = hashlib.sha1(normalize_path(root).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(MANIFEST_DIR, f"{digest}.json")
+
+def scan_tree(root, extensions=None, skipped=None):
+    """
+    Walks a directory tree with os.scandir, reusing the stat data of each directory entry.
+
+    Args:
+        root (str): The directory to scan.
+        extensions: Only include files with these lowercase extensions, e.g. {'.pdf', '.docx'} (optional).
+        skipped (list): Receives the absolute paths of subfolders and files that could not be read (optional).
+
+    Yields:
+        tuple: (absolute path, size, mtime in nanoseconds) for every file.
+
+    Raises:
+        OSError: If root is missing or is not a readable directory.
+    """
+    root = os.path.abspath(root)
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file():
+                            if extensions and os.path.splitext(entry.name)[1].lower() not in extensions:
+                                continue
+                            stat = entry.stat()
+                            yield entry.path, stat.st_size, stat.st_mtime_ns
+                    except OSError as e:
+                        print(f"Skipping {entry.path}: {e}")
+                        if skipped is not None:
+                            skipped.append(entry.path)
+        except OSError as e:
+            if directory == root:
+                raise
+            print(f"Skipping {directory}: {e}")
+            if skipped is not None:
+                skipped.append(directory)
+
+def is_under(normalized, prefixes):
+    """
+    Whether a normalized path is one of the normalized prefixes or lies below one of them.
+    """
+    return any(normalized == prefix or normalized.startswith(os.path.join(prefix, "")) for prefix in prefixes)
+
+def hash_file(file_path):
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+def load_manifest(manifest_path):
+    """
+    Loads a manifest: a dict of absolute path -> {'size', 'mtime_ns', 'sha256'}. Missing files give an empty manifest.
+    """
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_manifest(manifest_path, manifest):
+    """
+    Writes a manifest atomically, so an interrupted sync never leaves a truncated file.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+def update_manifest(manifest, scanned):
+    """
+    Builds the manifest of the scanned files. Files whose size and mtime match the previous manifest
+    keep their hash; only new or touched files are read.
+
+    Args:
+        manifest (dict): The previous manifest.
+        scanned: (path, size, mtime_ns) tuples from scan_tree().
+
+    Returns:
+        tuple: (new manifest, set of paths whose content differs from the previous manifest).
+    """
+    new_manifest = {}
+    changed = set()
+    for path, size, mtime_ns in scanned:
+        previous = manifest.get(path)
+        if previous is not None and previous["size"] == size and previous["mtime_ns"] == mtime_ns:
+            new_manifest[path] = previous
+            continue
+        digest = hash_file(path)
+        new_manifest[path] = {"size": size, "mtime_ns": mtime_ns, "sha256": digest}
+        if previous is not None and previous["sha256"] != digest:
+            changed.add(path)
+    return new_manifest, changed
+
+def stored_paths(root, file_list):
+    """
+    Maps the normalized path of every knowledge base file under root to the path as stored by the
+    middleware, which is what RemoveFiles expects.
+    """
+    root_prefix = os.path.join(normalize_path(root), "")
+    stored = {}
+    for path, _metadata in file_list:
+        normalized = normalize_path(path)
+        if normalized.startswith(root_prefix):
+            stored[normalized] = path
+    return stored
+
+def plan_sync(root, manifest, file_list, extensions=None):
+    """
+    Compares a directory tree with its manifest and the knowledge base.
+
+    Args:
+        root (str): The synced directory.
+        manifest (dict): The manifest of the previous sync.
+        file_list (list): [path, metadata] pairs from rag.get_file_list().
+        extensions: Only sync files with these lowercase extensions (optional).
+
+    Returns:
+        tuple: (SyncPlan, new manifest).
+    """
+    stored = stored_paths(root, file_list)
+    skipped = []
+    new_manifest, changed = update_manifest(manifest, scan_tree(root, extensions, skipped))
+    added, modified, unchanged = [], [], []
+    local = set()
+    for path in new_manifest:
+        normalized = normalize_path(path)
+        local.add(normalized)
+        if normalized not in stored:
+            added.append(path)
+        elif path in changed:
+            modified.append(path)
+        else:
+            unchanged.append(path)
+    # Files under folders that could not be read are unknown, not deleted: they are never removed
+    # and keep their manifest entries
+    skipped = [normalize_path(path) for path in skipped]
+    for path, entry in manifest.items():
+        if path not in new_manifest and is_under(normalize_path(path), skipped):
+            new_manifest[path] = entry
+    removed = sorted(path for normalized, path in stored.items()
+                     if normalized not in local and not is_under(normalized, skipped))
+    if extensions:
+        removed = [path for path in removed if os.path.splitext(path)[1].lower() in extensions]
+    return SyncPlan(sorted(added), sorted(modified), removed, sorted(unchanged)), new_manifest
+
+def sync(stub, root, manifest_path=None, extensions=None, dry_run=False):
+    """
+    Brings the knowledge base in line with a directory tree, uploading only new or changed files
+    and removing files deleted locally.
+
+    Args:
+        stub: The gRPC stub for making requests.
+        root (str): The directory to sync.
+        manifest_path (str): Where the manifest is kept (default is one file per root in MANIFEST_DIR).
+        extensions: Only sync files with these lowercase extensions (optional).
+        dry_run (bool): Only compute the plan (default is False).
+
+    Returns:
+        SyncPlan: What was (or, with dry_run, would be) done.
+    """
+    if manifest_path is None:
+        manifest_path = default_manifest_path(root)
+    file_list = rag.get_file_list(stub)
+    plan, new_manifest = plan_sync(root, load_manifest(manifest_path), file_list, extensions)
+    if dry_run:
+        return plan
+
+    # Removed files no longer exist locally, so they are sent as-is instead of through
+    # rag.remove_uploaded_file(), which drops paths that are not files. Modified files are
+    # removed under the path the middleware stored, which may be spelled differently.
+    stored = stored_paths(root, file_list)
+    to_remove = plan.removed + [stored[normalize_path(path)] for path in plan.modified]
+    if to_remove:
+        response = stub.RemoveFiles(sb.RemoveFilesRequest(filesToRemove=json.dumps(to_remove)))
+        if "Error" in response.filesRemoved:
+            raise Exception(response.filesRemoved)
+    to_add = plan.added + plan.modified
+    uploaded = []
+    try:
+        if to_add:
+            uploaded = rag.upload_file_to_knowledge_base(stub, to_add)
+    finally:
+        # Only files the middleware reported as uploaded are recorded (none if the upload raised); the
+        # others are left out of the manifest and hashed again next time, and sent again if still missing
+        done = {normalize_path(path) for path in uploaded}
+        failed = {path for path in to_add if normalize_path(path) not in done}
+        save_manifest(manifest_path, {path: entry for path, entry in new_manifest.items() if path not in failed})
+    return plan
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload new or changed files of a folder to the knowledge base and remove deleted ones.")
+    parser.add_argument("root", help="The folder to sync")
+    parser.add_argument("--manifest", help="Manifest file (default: ~/.superbuilder/sync/<root hash>.json)")
+    parser.add_argument("--ext", help="Comma separated extensions to sync, e.g. .pdf,.docx")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the changes")
+    parser.add_argument("--address", default=mw.GRPC_ADDRESS, help="Middleware address")
+    args = parser.parse_args()
+
+    extensions = {ext.strip().lower() for ext in args.ext.split(",")} if args.ext else None
+    success, stub = mw.connect_pool(args.address)
+    if not success:
+        sys.exit(1)
+    plan = sync(stub, args.root, args.manifest, extensions, args.dry_run)
+    print(f"added: {len(plan.added)}, modified: {len(plan.modified)}, removed: {len(plan.removed)}, unchanged: {len(plan.unchanged)}")
+    for label, paths in (("+", plan.added), ("~", plan.modified), ("-", plan.removed)):
+        for path in paths:
+            print(f"{label} {path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import os
+import unittest
+import grpc
+import superbuilder_service_pb2 as sb
+import superbuilder_service_pb2_grpc as sb_grpc
+import helpers.aio as aio
+
+class _AsyncServicer(sb_grpc.SuperBuilderServicer):
+    history_delay = 0
+
+    async def GetChatHistory(self, request, context):
+        await asyncio.sleep(self.history_delay)
+        return sb.GetChatHistoryResponse(data=json.dumps([{"sid": 1}, {"sid": 2}]))
+
+    async def Chat(self, request, context):
+        for token in request.prompt.split():
+            await asyncio.sleep(0.01)
+            yield sb.ChatResponse(message=token + " ")
+
+    async def AddFiles(self, request, context):
+        files = json.loads(request.filesToUpload)
+        for progress in (0, 50, 100):
+            yield sb.AddFilesResponse(filesUploaded="[]", currentFileUploading=files[0], currentFileProgress=str(progress))
+        yield sb.AddFilesResponse(filesUploaded=json.dumps(files))
+
+    async def DownloadFiles(self, request, context):
+        for progress in (-1, 10, 100, 100):
+            yield sb.DownloadFilesResponse(progress=progress, FileDownloaded=request.FileUrl)
+
+class TestAioHelpers(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        # In-process grpc.aio stand-in for the middleware
+        self.server = grpc.aio.server()
+        self.servicer = _AsyncServicer()
+        sb_grpc.add_SuperBuilderServicer_to_server(self.servicer, self.server)
+        port = self.server.add_insecure_port('localhost:0')
+        await self.server.start()
+        success, self.stub, self.channel = await aio.connect(f'localhost:{port}', timeout=5)
+        self.assertTrue(success)
+
+    async def asyncTearDown(self):
+        await self.channel.close()
+        await self.server.stop(None)
+
+    async def test_init_chat_session(self):
+        session_id = await aio.init_chat_session(self.stub)
+        self.assertNotIn(session_id, (1, 2))
+
+    async def test_cancelled_caller_keeps_seeding(self):
+        self.servicer.history_delay = 0.2
+        cancelled = asyncio.ensure_future(aio.init_chat_session(self.stub))
+        waiting = asyncio.ensure_future(aio.init_chat_session(self.stub))
+        await asyncio.sleep(0.05)
+        cancelled.cancel()
+        self.assertNotIn(await waiting, (1, 2))
+        self.assertTrue(cancelled.cancelled())
+
+    async def test_cancelled_seeding_is_retried(self):
+        self.servicer.history_delay = 0.2
+        caller = asyncio.ensure_future(aio.init_chat_session(self.stub))
+        await asyncio.sleep(0.05)
+        aio._seeding[self.stub].cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await caller
+        self.servicer.history_delay = 0
+        self.assertNotIn(await aio.init_chat_session(self.stub), (1, 2))
+
+    async def test_get_chat_response(self):
+        call = await aio.set_chat_request(self.stub, "one two three", session_id=5)
+        tokens = [token async for token in aio.get_chat_response(call)]
+        self.assertEqual(tokens, ["one ", "two ", "three "])
+
+    async def test_concurrent_chats(self):
+        async def run_chat(i):
+            call = await aio.set_chat_request(self.stub, f"chat {i} " * 10, session_id=i)
+            return "".join([token async for token in aio.get_chat_response(call)])
+
+        results = await asyncio.gather(*(run_chat(i) for i in range(100)))
+        self.assertEqual(results, [f"chat {i} " * 10 for i in range(100)])
+
+    async def test_upload_file_to_knowledge_base(self):
+        file_path = os.path.abspath(__file__)
+        responses = [r async for r in aio.upload_file_to_knowledge_base(self.stub, [file_path, "missing.pdf"])]
+        self.assertEqual([r.currentFileProgress for r in responses[:3]], ["0", "50", "100"])
+        self.assertEqual(json.loads(responses[-1].filesUploaded), [file_path])
+
+    async def test_download(self):
+        progress = [p async for p in aio.download(self.stub, "https://example.com/model", "models")]
+        self.assertEqual(progress, [10, 100])
+
+
+if __name__ == '__main__':
+    unittest.main()
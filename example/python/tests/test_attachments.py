@@ -0,0 +1,65 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+from helpers.attachments import AttachmentResolver
+
+class TestAttachmentResolver(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.files = []
+        for name in ("a.txt", "b.pdf"):
+            path = os.path.join(self.folder, name)
+            with open(path, "w") as f:
+                f.write(name)
+            self.files.append(path)
+        os.mkdir(os.path.join(self.folder, "sub"))
+        self._age_folder()
+        self.resolver = AttachmentResolver()
+
+    def _age_folder(self):
+        # Listings of folders changed in the last 2 seconds are not trusted; pretend it changed a minute ago
+        old = time.time() - 60
+        os.utime(self.folder, (old, old))
+
+    def test_resolve(self):
+        missing = os.path.join(self.folder, "missing.txt")
+        folder = os.path.join(self.folder, "sub")
+        resolved = self.resolver.resolve(self.files + [missing, folder])
+        self.assertEqual(resolved.valid, tuple(self.files))
+        self.assertEqual(resolved.invalid, (missing, folder))
+        self.assertEqual(json.loads(resolved.json), self.files)
+
+    def test_relative_paths(self):
+        cwd = os.getcwd()
+        os.chdir(self.folder)
+        self.addCleanup(os.chdir, cwd)
+        self.assertEqual(self.resolver.resolve(["a.txt"]).valid, (os.path.join(os.getcwd(), "a.txt"),))
+
+    def test_repeated_set_scans_once(self):
+        with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+            first = self.resolver.resolve(self.files)
+            second = self.resolver.resolve(list(self.files))
+        self.assertIs(first, second)
+        self.assertEqual(scandir.call_count, 1)
+
+    def test_folder_change_invalidates(self):
+        self.assertEqual(len(self.resolver.resolve(self.files).valid), 2)
+        os.remove(self.files[1])
+        self._age_folder()
+        resolved = self.resolver.resolve(self.files)
+        self.assertEqual(resolved.valid, (self.files[0],))
+        self.assertEqual(resolved.invalid, (self.files[1],))
+
+    def test_recently_changed_folder(self):
+        os.utime(self.folder)
+        with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+            self.assertEqual(len(self.resolver.resolve(self.files).valid), 2)
+            os.remove(self.files[0])
+            self.assertEqual(self.resolver.resolve(self.files).valid, (self.files[1],))
+        self.assertEqual(scandir.call_count, 0)
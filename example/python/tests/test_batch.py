@@ -0,0 +1,103 @@
+import threading
+import time
+import unittest
+import grpc
+import superbuilder_service_pb2 as sb
+from helpers.batch import run_batch, BatchItem
+
+class _RpcError(grpc.RpcError):
+    def __init__(self, code):
+        self._code = code
+
+    def code(self):
+        return self._code
+
+    def details(self):
+        return self._code.name
+
+class _ChatStub:
+    """Echoes the prompt word by word; prompts listed in 'failures' fail with the given codes first."""
+    def __init__(self, failures=None, delays=None):
+        self.failures = dict(failures or {})
+        self.delays = delays or {}
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.requests = []
+
+    def Chat(self, request):
+        with self.lock:
+            self.requests.append(request)
+            codes = self.failures.get(request.prompt)
+            if codes:
+                raise _RpcError(codes.pop(0))
+        return self._stream(request)
+
+    def _stream(self, request):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delays.get(request.prompt, 0.01))
+            for word in request.prompt.split():
+                yield sb.ChatResponse(message=word)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+class TestRunBatch(unittest.TestCase):
+
+    def test_input_order(self):
+        stub = _ChatStub(delays={"slow first": 0.2})
+        prompts = ["slow first", "b", "c d", "e"]
+        results = list(run_batch(stub, prompts, concurrency=3, ordered=True, session_id=1))
+        self.assertEqual([r.index for r in results], [0, 1, 2, 3])
+        self.assertEqual([r.text for r in results], ["slowfirst", "b", "cd", "e"])
+
+    def test_completion_order(self):
+        stub = _ChatStub(delays={"slow": 0.3})
+        results = list(run_batch(stub, ["slow", "fast"], concurrency=2, session_id=1))
+        self.assertEqual([r.prompt for r in results], ["fast", "slow"])
+
+    def test_concurrency_limit(self):
+        stub = _ChatStub()
+        results = list(run_batch(stub, [f"p {i}" for i in range(20)], concurrency=3, session_id=1))
+        self.assertEqual(len(results), 20)
+        self.assertLessEqual(stub.max_active, 3)
+
+    def test_retry_transient_errors(self):
+        stub = _ChatStub(failures={"flaky": [grpc.StatusCode.UNAVAILABLE]})
+        result, = run_batch(stub, ["flaky"], backoff=0.01, session_id=1)
+        self.assertIsNone(result.error)
+        self.assertEqual(result.attempts, 2)
+        self.assertEqual(result.text, "flaky")
+
+    def test_permanent_error_reported(self):
+        stub = _ChatStub(failures={"bad": [grpc.StatusCode.INVALID_ARGUMENT]})
+        result, = run_batch(stub, ["bad"], backoff=0.01, session_id=1)
+        self.assertEqual(result.error.code(), grpc.StatusCode.INVALID_ARGUMENT)
+        self.assertEqual(result.attempts, 1)
+
+    def test_unexpected_error_reported(self):
+        def on_token(index, token):
+            if token == "boom":
+                raise ValueError(token)
+        stub = _ChatStub()
+        results = sorted(run_batch(stub, ["boom", "fine"], on_token=on_token, session_id=1), key=lambda r: r.index)
+        self.assertIsInstance(results[0].error, ValueError)
+        self.assertIsNone(results[1].error)
+        self.assertEqual(results[1].text, "fine")
+
+    def test_metrics_and_options(self):
+        stub = _ChatStub()
+        options = sb.PromptOptions(summarizePrompt=sb.PromptOptions.SummarizePrompt())
+        result, = run_batch(stub, [BatchItem("one two three", None, options)], session_id=7)
+        self.assertEqual(result.tokens, 3)
+        self.assertGreater(result.tokens_per_second, 0)
+        self.assertLessEqual(result.first_token_latency, result.latency)
+        self.assertTrue(stub.requests[0].HasField("promptOptions"))
+        self.assertEqual(stub.requests[0].sessionId, 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
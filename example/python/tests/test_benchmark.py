@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+from fake_server import serve
+from helpers.pool import SuperBuilderClient
+import benchmark
+
+class TestBenchmark(unittest.TestCase):
+
+    def setUp(self):
+        self.server, self.servicer, address = serve(tokens_per_second=500, ttft=0.05, response_tokens=10, add_files_delay=0)
+        self.client = SuperBuilderClient(address)
+        self.addCleanup(self.server.stop, None)
+        self.addCleanup(self.client.close)
+
+    def test_percentile(self):
+        self.assertEqual(benchmark.percentile([3, 1, 2, 4], 50), 2.5)
+        self.assertEqual(benchmark.percentile([5], 99), 5)
+        self.assertIsNone(benchmark.percentile([], 50))
+        self.assertEqual(benchmark.summarize([]), {"count": 0})
+
+    def test_run(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "doc.txt")
+            with open(path, "w") as f:
+                f.write("content")
+            report = benchmark.run(self.client, "a b c", workflows=("generic", "summarize"), requests=4, concurrency=2, files=[path])
+        chat = report["results"]["Chat[GenericPrompt]"]
+        self.assertEqual(report["meta"]["model"], "Fake-LLM-7B-int4")
+        self.assertEqual(chat["tokens"]["p50"], 10)
+        self.assertGreaterEqual(chat["ttft"]["p50"], 0.05)
+        self.assertEqual(chat["inter_token_latency"]["count"], 4 * 9)
+        self.assertIn("Chat[SummarizePrompt]", report["results"])
+        self.assertEqual(report["results"]["GetFileList"]["latency"]["count"], 4)
+        self.assertEqual(report["results"]["AddFiles"]["files"], 1)
+        self.assertEqual(self.servicer.files, {})
+
+    def test_errors_are_counted(self):
+        self.servicer.fail_first = 2
+        self.servicer.error_methods = {"GetChatHistory"}
+        result = benchmark.bench_unary(self.client, "GetChatHistory", requests=5)
+        self.assertEqual(result["errors"], {"UNAVAILABLE": 2})
+        self.assertEqual(result["latency"]["count"], 3)
+
+    def test_compare(self):
+        baseline = {"results": {"Chat[GenericPrompt]": {"ttft": {"p50": 0.1, "p95": 0.2}, "tokens_per_second": {"p50": 20, "p95": 25}}}}
+        current = {"results": {"Chat[GenericPrompt]": {"ttft": {"p50": 0.2, "p95": 0.21}, "tokens_per_second": {"p50": 10, "p95": 26}}}}
+        regressions = {(row[1], row[2]) for row in benchmark.compare(baseline, current) if row[6]}
+        self.assertEqual(regressions, {("ttft", "p50"), ("tokens_per_second", "p50")})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import json
+import os
+import tempfile
+import unittest
+import superbuilder_service_pb2 as sb
+from helpers.cache import ResponseCache, make_key, normalize_prompt, replay
+from helpers.chat import get_chat_result, get_prompt_options
+from helpers.batch import run_batch
+
+class _ChatStub:
+    """Echoes the prompt word by word and reports a configurable active model."""
+    def __init__(self, model="Qwen3-8B"):
+        self.model = model
+        self.chat_requests = []
+        self.config_requests = 0
+
+    def GetClientConfig(self, request):
+        self.config_requests += 1
+        models = [{"model_type": "embedding_model", "full_name": "bge"}, {"model_type": "chat_model", "full_name": self.model}]
+        return sb.GetClientConfigResponse(data=json.dumps({"ActiveAssistant": {"models": models}}))
+
+    def GetChatHistory(self, request):
+        return sb.GetChatHistoryResponse(data="[]")
+
+    def Chat(self, request):
+        self.chat_requests.append(request)
+        words = request.prompt.split()
+        for word in words[:-1]:
+            yield sb.ChatResponse(message=word + " ")
+        yield sb.ChatResponse(message=words[-1], references=[sb.Reference(file="a.pdf", page=2)])
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(os.path.join(self.tmp.name, "cache.sqlite3"))
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_normalize_prompt(self):
+        self.assertEqual(normalize_prompt("  Hello  \r\nworld \n\n"), "Hello\nworld")
+
+    def test_key_depends_on_model_options_and_attachments(self):
+        base = make_key("Hi", "model-a")
+        self.assertEqual(base, make_key("Hi \n", "model-a"))
+        self.assertNotEqual(base, make_key("Hi", "model-b"))
+        self.assertNotEqual(base, make_key("Hi", "model-a", get_prompt_options({"name": "SummarizePrompt"})))
+        self.assertNotEqual(base, make_key("Hi", "model-a", attachments=None))
+
+        path = os.path.join(self.tmp.name, "doc.txt")
+        with open(path, "w") as f:
+            f.write("one")
+        first = make_key("Hi", "model-a", attachments=[path])
+        with open(path, "w") as f:
+            f.write("two!")
+        self.assertNotEqual(first, make_key("Hi", "model-a", attachments=[path]))
+
+    def test_hit_replays_stream(self):
+        stub = _ChatStub()
+        first = get_chat_result(self.cache.chat(stub, "one two three", verbose=False), verbose=False)
+        second = get_chat_result(self.cache.chat(stub, "one two three", verbose=False), verbose=False)
+        self.assertEqual(len(stub.chat_requests), 1)
+        self.assertEqual(second.text, first.text)
+        self.assertEqual(second.chunks, 3)
+        self.assertEqual((second.references[0].file, second.references[0].page), ("a.pdf", 2))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+        stub.model = "other-model"
+        get_chat_result(self.cache.chat(stub, "one two three", verbose=False), verbose=False)
+        self.assertEqual(len(stub.chat_requests), 2)
+
+    def test_session_bypasses_cache(self):
+        stub = _ChatStub()
+        for _ in range(2):
+            text = get_chat_result(self.cache.chat(stub, "one two three", session_id=1, verbose=False), verbose=False).text
+            self.assertEqual(text, "one two three")
+        self.assertEqual(len(stub.chat_requests), 2)
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(stub.config_requests, 0)
+        list(run_batch(stub, ["a b", "a b"], concurrency=1, session_id=1, cache=self.cache))
+        self.assertEqual(len(stub.chat_requests), 4)
+
+    def test_interrupted_stream_is_not_cached(self):
+        stub = _ChatStub()
+        response_iterator = self.cache.chat(stub, "one two three", verbose=False)
+        next(response_iterator)
+        response_iterator.close()
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(":memory:", max_bytes=100)
+        for key in "abc":
+            cache.put(key, ["x" * 20])
+        cache.get("a")
+        cache.put("d", ["x" * 20])
+        self.assertLessEqual(cache.size, 100)
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("d"))
+        cache.close()
+
+    def test_persistent(self):
+        self.cache.put("k", ["persisted"])
+        self.cache.close()
+        self.cache = ResponseCache(os.path.join(self.tmp.name, "cache.sqlite3"))
+        self.assertEqual(self.cache.get("k"), (["persisted"], []))
+
+    def test_replay_empty(self):
+        self.assertEqual([r.message for r in replay([])], [""])
+
+    def test_run_batch_with_cache(self):
+        stub = _ChatStub()
+        prompts = ["a b", "c d", "a b"]
+        list(run_batch(stub, prompts, concurrency=1, cache=self.cache))
+        results = list(run_batch(stub, prompts, ordered=True, cache=self.cache))
+        self.assertEqual([r.text for r in results], ["a b", "c d", "a b"])
+        self.assertEqual(len(stub.chat_requests), 2)
+        self.assertEqual(stub.config_requests, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from helpers.chunking import estimate_tokens, split_sentences, chunk_text, chunk_file, TextChunker
+
+class TestChunking(unittest.TestCase):
+
+    def test_estimate_tokens(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("abcdefgh"), 2)
+        self.assertEqual(estimate_tokens("你好世界"), 4)
+
+    def test_split_sentences_is_lossless(self):
+        text = "First one. Second one!  Third?\n\n你好。世界！End"
+        sentences = list(split_sentences(text))
+        self.assertEqual("".join(sentences), text)
+        self.assertEqual(sentences[:3], ["First one. ", "Second one!  ", "Third?"])
+        self.assertIn("你好。", sentences)
+
+    def test_chunks_respect_budget_and_sentences(self):
+        text = " ".join(f"Sentence number {i} is here." for i in range(200))
+        chunks = list(chunk_text(text, max_tokens=50))
+        self.assertEqual("".join(chunks), text)
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(estimate_tokens(chunk), 50)
+            self.assertTrue(chunk.rstrip().endswith("."))
+
+    def test_short_lines_are_grouped(self):
+        text = "".join(f"line {i}\n" for i in range(100))
+        chunks = list(chunk_text(text, max_tokens=100))
+        self.assertEqual("".join(chunks), text)
+        self.assertLess(len(chunks), 10)
+
+    def test_long_line_is_split(self):
+        text = "word " * 1000
+        chunks = list(chunk_text(text, max_tokens=20))
+        self.assertEqual("".join(chunks), text)
+        self.assertTrue(all(estimate_tokens(chunk) <= 20 for chunk in chunks))
+
+        cjk = "字" * 1000
+        chunks = list(chunk_text(cjk, max_tokens=64))
+        self.assertEqual("".join(chunks), cjk)
+        self.assertTrue(all(estimate_tokens(chunk) <= 64 for chunk in chunks))
+
+    def test_mixed_script_word_is_cut_within_budget(self):
+        for text in ("好국국你한.e한", "字字字字字字aaaaaaaa", ("ab好" * 300) + " tail"):
+            chunks = list(chunk_text(text, max_tokens=6))
+            self.assertEqual("".join(chunks), text)
+            self.assertTrue(all(estimate_tokens(chunk) <= 6 for chunk in chunks))
+
+    def test_feed_in_pieces_matches_chunk_text(self):
+        text = "".join(f"Line {i} has a sentence. And another one!\n" for i in range(300))
+        chunker = TextChunker(max_tokens=40)
+        chunks = []
+        for start in range(0, len(text), 37):
+            chunks.extend(chunker.feed(text[start:start + 37]))
+        chunks.extend(chunker.flush())
+        self.assertEqual(chunks, list(chunk_text(text, max_tokens=40)))
+
+    def test_feed_without_newlines_stays_bounded(self):
+        text = ("Sentence number %d is here. " * 2000) % tuple(range(2000)) + "x" * 3000 + " tail"
+        chunker = TextChunker(max_tokens=40)
+        chunks = []
+        held = 0
+        for start in range(0, len(text), 7):
+            chunks.extend(chunker.feed(text[start:start + 7]))
+            held = max(held, len(''.join(chunker._pending)))
+        chunks.extend(chunker.flush())
+        self.assertEqual(''.join(chunks), text)
+        self.assertTrue(all(estimate_tokens(chunk) <= 40 for chunk in chunks))
+        # Held-back text stays around twice the budget (40 tokens, ~4 characters each) plus one piece
+        self.assertLess(held, 2 * 40 * 4 + 7 + 1)
+        self.assertEqual(chunks[:3], list(chunk_text(text, max_tokens=40))[:3])
+
+    def test_chunk_file(self):
+        text = "".join(f"第{i}行。Line {i}.\n" for i in range(500))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "input.txt")
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                f.write(text)
+            chunks = list(chunk_file(path, max_tokens=60, block_size=101))
+        self.assertEqual("".join(chunks), text)
+        self.assertEqual(chunks, list(chunk_text(text, max_tokens=60)))
+
+    def test_invalid_budget(self):
+        with self.assertRaises(ValueError):
+            list(chunk_text("text", max_tokens=0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import superbuilder_service_pb2 as sb
+from fake_server import serve
+from helpers.pool import SuperBuilderClient
+from helpers.context import ConversationContext, ROLE_SYSTEM, SUMMARY_PREFIX
+import helpers.chat as chat
+
+def _count_words(text):
+    return len(text.split())
+
+class TestConversationContext(unittest.TestCase):
+
+    def setUp(self):
+        self.server, self.servicer, address = serve(tokens_per_second=0, ttft=0, response_tokens=4)
+        self.client = SuperBuilderClient(address)
+        self.addCleanup(self.server.stop, None)
+        self.addCleanup(self.client.close)
+
+    def test_conversation_history(self):
+        history = chat.conversation_history([("user", "hi"), sb.ConversationHistory(role="assistant", content="hello")])
+        self.assertEqual([(h.role, h.content) for h in history], [("user", "hi"), ("assistant", "hello")])
+        self.assertEqual(chat.conversation_history(None), [])
+
+    def test_truncates_to_budget(self):
+        context = ConversationContext(max_tokens=6, count_tokens=_count_words)
+        context.add_exchange("one two", "three four")
+        context.add_exchange("five six", "seven eight")
+        self.assertEqual([h.content for h in context.window()], ["three four", "five six", "seven eight"])
+        self.assertEqual(context.compact(), 1)
+        self.assertEqual(len(context.turns), 3)
+
+    def test_ask_sends_window(self):
+        context = ConversationContext(max_tokens=10, isolate_turns=False, count_tokens=_count_words)
+        for i in range(5):
+            context.ask(self.client, f"question {i}")
+        request = self.servicer.last_chat_request
+        self.assertEqual(request.prompt, "question 4")
+        self.assertEqual(request.sessionId, context.session_id)
+        sent = [(h.role, h.content) for h in request.history]
+        # Two exchanges of 2 + 4 words fit in 10 tokens
+        self.assertEqual(len(sent), 3)
+        self.assertEqual(sent[-1], ("assistant", "question 3 question 3 "))
+        self.assertLessEqual(sum(_count_words(content) for _role, content in sent), 10)
+
+    def test_summarizes_dropped_turns(self):
+        context = ConversationContext(max_tokens=8, summarize=True, summary_tokens=4, count_tokens=_count_words)
+        context.add_exchange("alpha beta", "gamma delta")
+        context.add_exchange("epsilon zeta", "eta theta")
+        context.add_exchange("iota kappa", "lambda mu")
+        context.ask(self.client, "next")
+        request = self.servicer.last_chat_request
+        self.assertEqual(request.history[0].role, ROLE_SYSTEM)
+        self.assertTrue(request.history[0].content.startswith(SUMMARY_PREFIX))
+        self.assertLessEqual(_count_words(context.summary), 4)
+        # The summary requests and the turn each ran in their own session, removed afterwards
+        self.assertGreaterEqual(self.servicer.calls["RemoveSession"], 2)
+        self.assertEqual(self.servicer.sessions, {})
+        self.assertLessEqual(sum(_count_words(h.content) for h in request.history[1:]) + _count_words(context.summary), 8)
+
+    def test_summary_growth_folds_more_turns(self):
+        context = ConversationContext(max_tokens=8, summarize=True, count_tokens=_count_words)
+        for i in range(4):
+            context.add_exchange(f"q{i} a", f"a{i} b")
+        summarized = []
+
+        def summarize(stub, turns):
+            summarized.extend(turns)
+            return "one two three four"
+
+        context._summarize = summarize
+        # The 4-word summary leaves room for 2 of the 4 turns that fit before: those are folded in too
+        self.assertEqual(context.compact(self.client), 6)
+        self.assertEqual(len(context.turns), 2)
+        self.assertEqual(len(summarized), 6)
+
+    def test_isolate_turns(self):
+        context = ConversationContext()
+        context.ask(self.client, "hello")
+        context.ask(self.client, "again")
+        self.assertIsNone(context.session_id)
+        self.assertEqual(self.servicer.calls["RemoveSession"], 2)
+        self.assertEqual(len(self.servicer.last_chat_request.history), 2)
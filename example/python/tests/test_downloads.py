@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from helpers.downloads import DownloadManager, TokenBucket, repository_items
+
+FILES = {
+    "model.bin": os.urandom(300_000),
+    "config.json": b'{"name": "fake"}',
+}
+
+class _Handler(BaseHTTPRequestHandler):
+    # A model hub stand-in serving FILES with ETag and Range support, plus the repository tree API
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        _Handler.requests.append((self.path, self.headers.get("Range")))
+        if self.path.startswith("/api/models/org/fake/tree/main"):
+            tree = [{"type": "directory", "path": "sub"}] + [
+                {"type": "file", "path": name, "size": len(data),
+                 **({"lfs": {"oid": hashlib.sha256(data).hexdigest(), "size": len(data)}} if name.endswith(".bin") else {})}
+                for name, data in FILES.items()
+            ]
+            return self._send(200, json.dumps(tree).encode())
+        name = self.path.rsplit("/", 1)[-1]
+        if name not in FILES:
+            return self._send(404, b"")
+        data = FILES[name]
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range") == '"v1"':
+            start = int(range_header.split("=")[1].rstrip("-"))
+            return self._send(206, data[start:])
+        self._send(200, data)
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", '"v1"')
+        self.end_headers()
+        self.wfile.write(body)
+
+class TestDownloads(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("localhost", 0), _Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://localhost:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.state = os.path.join(self.folder, "state.json")
+        _Handler.requests = []
+
+    def test_repository_download_and_skip(self):
+        items = repository_items("org/fake", os.path.join(self.folder, "fake"), endpoint=self.base)
+        self.assertEqual(len(items), 2)
+        self.assertEqual(items[0].sha256, hashlib.sha256(FILES["model.bin"]).hexdigest())
+
+        manager = DownloadManager(self.state, concurrency=2)
+        manager.add_repository("org/fake", os.path.join(self.folder, "fake"), endpoint=self.base)
+        progress = []
+        results = manager.run(progress.append)
+        self.assertEqual([r.status for r in results], ["downloaded", "downloaded"])
+        with open(os.path.join(self.folder, "fake", "model.bin"), "rb") as f:
+            self.assertEqual(f.read(), FILES["model.bin"])
+        self.assertEqual(progress[-1].transferred, sum(len(d) for d in FILES.values()))
+        self.assertGreater(manager.throughput(), 0)
+
+        again = DownloadManager(self.state)
+        again.add_repository("org/fake", os.path.join(self.folder, "fake"), endpoint=self.base)
+        self.assertEqual([r.status for r in again.run()], ["skipped", "skipped"])
+
+    def test_resume_with_range(self):
+        path = os.path.join(self.folder, "model.bin")
+        data = FILES["model.bin"]
+        manager = DownloadManager(self.state, chunk_size=10_000)
+        manager.add(f"{self.base}/model.bin", path, hashlib.sha256(data).hexdigest(), len(data))
+        stop_after = []
+
+        def stop_half_way(progress):
+            if progress.bytes_done >= 100_000 and not stop_after:
+                stop_after.append(progress.bytes_done)
+                manager.stop()
+
+        self.assertEqual(manager.run(stop_half_way)[0].status, "stopped")
+        self.assertTrue(os.path.exists(path + ".part"))
+
+        resumed = DownloadManager(self.state, chunk_size=10_000)
+        resumed.add(f"{self.base}/model.bin", path, hashlib.sha256(data).hexdigest(), len(data))
+        result = resumed.run()[0]
+        self.assertEqual(result.status, "downloaded")
+        self.assertEqual(result.transferred, len(data) - stop_after[0])
+        self.assertEqual(_Handler.requests[-1][1], f"bytes={stop_after[0]}-")
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), data)
+        self.assertFalse(os.path.exists(path + ".part"))
+
+    def test_checksum_mismatch(self):
+        path = os.path.join(self.folder, "config.json")
+        manager = DownloadManager(self.state)
+        manager.add(f"{self.base}/config.json", path, "0" * 64)
+        result = manager.run()[0]
+        self.assertEqual(result.status, "failed")
+        self.assertIn("sha256", str(result.error))
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(path + ".part"))
+
+    def test_missing_file(self):
+        manager = DownloadManager(self.state)
+        manager.add(f"{self.base}/missing.bin", os.path.join(self.folder, "missing.bin"))
+        self.assertEqual(manager.run()[0].status, "failed")
+
+    def test_bandwidth_cap(self):
+        manager = DownloadManager(self.state, concurrency=2, max_bytes_per_second=300_000, chunk_size=50_000)
+        manager.add(f"{self.base}/model.bin", os.path.join(self.folder, "a.bin"))
+        manager.add(f"{self.base}/model.bin", os.path.join(self.folder, "b.bin"))
+        start = time.perf_counter()
+        manager.run()
+        # 600 kB at 300 kB/s: the first 300 kB are the burst, the rest takes a second
+        self.assertGreaterEqual(time.perf_counter() - start, 0.9)
+        self.assertLess(manager.throughput(), 700_000)
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(1000, burst=100)
+        start = time.monotonic()
+        for _ in range(3):
+            bucket.consume(100)
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
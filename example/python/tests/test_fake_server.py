@@ -0,0 +1,73 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+import grpc
+import superbuilder_service_pb2 as sb
+from fake_server import serve
+from helpers.pool import SuperBuilderClient
+import helpers.chat as chat
+import helpers.config as config
+import helpers.rag as rag
+from helpers.batch import run_batch
+
+class TestFakeServer(unittest.TestCase):
+
+    def start(self, **kwargs):
+        self.server, self.servicer, address = serve(**kwargs)
+        self.client = SuperBuilderClient(address, pool_size=2)
+        self.assertTrue(self.client.connect(timeout=5, attempts=1))
+        self.addCleanup(self.server.stop, None)
+        self.addCleanup(self.client.close)
+
+    def test_chat_timing(self):
+        self.start(tokens_per_second=200, ttft=0.2, response_tokens=20, history_sessions=3)
+        self.assertEqual(len(chat.get_chat_history(self.client)), 3)
+        start = time.perf_counter()
+        responses = iter(chat.set_chat_request(self.client, "hello world", verbose=False))
+        first = next(responses)
+        ttft = time.perf_counter() - start
+        rest = list(responses)
+        total = time.perf_counter() - start
+        self.assertEqual(first.message, "hello ")
+        self.assertEqual(len(rest), 19)
+        self.assertGreaterEqual(ttft, 0.2)
+        self.assertGreaterEqual(total, 0.2 + 19 / 200)
+        self.assertEqual(len(chat.get_chat_history(self.client)), 4)
+
+    def test_stop_chat(self):
+        self.start(tokens_per_second=20, ttft=0, response_tokens=100)
+        responses = chat.set_chat_request(self.client, "a b", session_id=1, verbose=False)
+        threading.Timer(0.2, lambda: self.client.StopChat(sb.StopChatRequest())).start()
+        self.assertLess(len(list(responses)), 100)
+
+    def test_injected_errors_are_retried(self):
+        self.start(tokens_per_second=0, ttft=0, response_tokens=3, fail_first=2, error_methods=["Chat"])
+        results = list(run_batch(self.client, ["x y"], session_id=1, backoff=0.01))
+        self.assertIsNone(results[0].error)
+        self.assertEqual(results[0].attempts, 3)
+
+    def test_error_code(self):
+        self.start(error_rate=1.0, error_code=grpc.StatusCode.RESOURCE_EXHAUSTED, error_methods=["GetFileList"])
+        with self.assertRaises(grpc.RpcError) as raised:
+            rag.get_file_list(self.client)
+        self.assertEqual(raised.exception.code(), grpc.StatusCode.RESOURCE_EXHAUSTED)
+
+    def test_files_and_config(self):
+        self.start(add_files_delay=0)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "doc.txt")
+            with open(path, "w") as f:
+                f.write("content")
+            progress = []
+            uploaded = rag.upload_file_to_knowledge_base(self.client, [path], on_progress=progress.append, verbose=False)
+        self.assertEqual(uploaded, [path])
+        self.assertIn("100", [p.currentFileProgress for p in progress])
+        self.assertEqual([entry[0] for entry in rag.get_file_list(self.client)], [path])
+        self.assertEqual(config.get_active_model(self.client), "Fake-LLM-7B-int4")
+        self.client.SetModels(sb.SetModelsRequest(llm=os.path.join("hub", "Other-LLM"), embedder="", ranker=""))
+        self.assertEqual(config.get_active_model(self.client), "Other-LLM")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import json
+import os
+import unittest
+from datetime import datetime, timezone
+import superbuilder_service_pb2 as sb
+from helpers.filestore import FileStoreIndex, parse_timestamp
+
+def _abs(*parts):
+    return os.path.abspath(os.path.join(os.sep, "docs", *parts))
+
+class _FileListStub:
+    def __init__(self, files):
+        self.files = files
+        self.calls = 0
+
+    def GetFileList(self, request):
+        self.calls += 1
+        return sb.GetFileListResponse(fileList=json.dumps(self.files))
+
+class TestFileStoreIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.stub = _FileListStub([
+            [_abs("a.pdf"), {"modified": "2025-01-01T00:00:00+00:00", "size": "10"}],
+            [_abs("reports", "b.docx"), {"modified": 1_740_000_000_000}],
+            [_abs("reports", "2024", "c.xlsx"), {"date_added": "1750000000"}],
+            [_abs("reports-old", "d.txt"), {}],
+        ])
+        self.index = FileStoreIndex(self.stub)
+
+    def test_parse_timestamp(self):
+        self.assertEqual(parse_timestamp("2025-01-01T00:00:00Z"), datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp())
+        self.assertEqual(parse_timestamp(1_740_000_000_000), 1_740_000_000)
+        self.assertEqual(parse_timestamp("Tue Mar 04 2025 10:12:33 GMT-0800 (Pacific Standard Time)"),
+                         datetime(2025, 3, 4, 18, 12, 33, tzinfo=timezone.utc).timestamp())
+        self.assertIsNone(parse_timestamp("yesterday"))
+        self.assertIsNone(parse_timestamp(None))
+
+    def test_membership_loads_once(self):
+        self.assertIn(_abs("a.pdf"), self.index)
+        self.assertIn(os.path.join(os.sep, "docs", "reports", "..", "a.pdf"), self.index)
+        self.assertNotIn(_abs("missing.pdf"), self.index)
+        self.assertEqual(self.index.get(_abs("a.pdf"))["size"], "10")
+        self.assertIsNone(self.index.get(_abs("missing.pdf")))
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.stub.calls, 1)
+
+    def test_under_folder(self):
+        self.assertEqual(self.index.under(_abs("reports")), [_abs("reports", "2024", "c.xlsx"), _abs("reports", "b.docx")])
+        self.assertEqual(self.index.under(_abs("reports", "2024")), [_abs("reports", "2024", "c.xlsx")])
+        self.assertEqual(len(self.index.under(_abs())), 4)
+
+    def test_changed_since(self):
+        self.assertEqual(self.index.changed_since(1_739_999_999), [_abs("reports", "b.docx"), _abs("reports", "2024", "c.xlsx")])
+        self.assertEqual(self.index.changed_since(datetime(2024, 1, 1, tzinfo=timezone.utc))[0], _abs("a.pdf"))
+        self.assertEqual(self.index.changed_since(1_740_000_000), [_abs("reports", "2024", "c.xlsx")])
+
+    def test_invalidate_and_max_age(self):
+        self.assertIn(_abs("a.pdf"), self.index)
+        self.stub.files = []
+        self.assertIn(_abs("a.pdf"), self.index)
+        self.index.invalidate()
+        self.assertNotIn(_abs("a.pdf"), self.index)
+        self.assertEqual(self.stub.calls, 2)
+
+        index = FileStoreIndex(self.stub, max_age=0)
+        len(index)
+        len(index)
+        self.assertEqual(self.stub.calls, 4)
+
+if __name__ == '__main__':
+    unittest.main()
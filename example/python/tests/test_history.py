@@ -0,0 +1,108 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from fake_server import serve
+from helpers.pool import SuperBuilderClient
+from helpers.history import HistoryIndex, iter_sessions, tokenize
+
+def _session(sid, texts):
+    return {"sid": sid, "name": f"Session {sid}", "date": "2025-01-01", "messages": [
+        {"timestamp": "2025-01-01", "text": text, "sender": "user" if i % 2 == 0 else "bot"} for i, text in enumerate(texts)
+    ]}
+
+class TestHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.index = HistoryIndex(os.path.join(self.folder, "history.jsonl"))
+        self.addCleanup(self.index.close)
+        self.history = [
+            _session(1, ["How do I reset the router?", "Unplug the router for ten seconds."]),
+            _session(2, ["Translate 你好世界", "Hello world"]),
+        ]
+
+    def test_iter_sessions(self):
+        data = " [ " + ", ".join(json.dumps(s) for s in self.history) + " ] "
+        self.assertEqual(list(iter_sessions(data)), self.history)
+        self.assertEqual(list(iter_sessions("[]")), [])
+        with self.assertRaises(ValueError):
+            list(iter_sessions('{"sid": 1}'))
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("Reset the Router, 你好"), ["reset", "the", "router", "你", "好"])
+
+    def test_pages_and_search(self):
+        self.assertEqual(self.index.update(json.dumps(self.history)), 4)
+        self.assertEqual([s.messages for s in self.index.sessions()], [2, 2])
+        page = self.index.messages(1, start=1, limit=5)
+        self.assertEqual([m["text"] for m in page], ["Unplug the router for ten seconds."])
+        self.assertEqual(page[0]["index"], 1)
+
+        self.assertEqual([m["index"] for m in self.index.search("router")], [1, 0])
+        self.assertEqual([m["index"] for m in self.index.search("reset ROUTER")], [0])
+        self.assertEqual([m["sid"] for m in self.index.search("你好")], [2])
+        self.assertEqual(self.index.search("router modem"), [])
+        self.assertEqual(self.index.search("router", session_id=2), [])
+
+    def test_incremental_update(self):
+        self.index.update(json.dumps(self.history))
+        self.history[0]["messages"].append({"text": "Thanks, the router works", "sender": "user"})
+        self.assertEqual(self.index.update(json.dumps(self.history)), 1)
+        self.assertEqual(self.index.search("thanks")[0]["index"], 2)
+        # Removed sessions disappear from pages, search and export
+        self.assertEqual(self.index.update(json.dumps(self.history[:1])), 0)
+        self.assertEqual(self.index.messages(2), [])
+        self.assertEqual(self.index.search("hello"), [])
+
+    def test_edited_and_removed_messages(self):
+        self.index.update(json.dumps(self.history))
+        self.history[0]["messages"][0]["text"] = "How do I restart the modem?"
+        self.assertEqual(self.index.update(json.dumps(self.history)), 1)
+        self.assertEqual([m["index"] for m in self.index.search("modem")], [0])
+        self.assertEqual([m["index"] for m in self.index.search("router")], [1])
+        # Removing the first message shifts the second one up
+        del self.history[0]["messages"][0]
+        self.index.update(json.dumps(self.history))
+        self.assertEqual(self.index.search("modem"), [])
+        self.assertEqual([m["text"] for m in self.index.messages(1)], ["Unplug the router for ten seconds."])
+        self.assertEqual(self.index.messages(1)[0]["index"], 0)
+        output = io.StringIO()
+        self.index.export_jsonl(output)
+        self.assertEqual(len(output.getvalue().splitlines()), 3)
+
+    def test_default_files_are_separate(self):
+        with mock.patch("helpers.history.HISTORY_DIR", self.folder), HistoryIndex() as first, HistoryIndex() as second:
+            self.assertNotEqual(first.path, second.path)
+            first.update(json.dumps(self.history))
+            second.update(json.dumps(self.history[:1]))
+            self.assertEqual(len(first.search("hello")), 1)
+            self.assertEqual(first.messages(2)[0]["text"], "Translate 你好世界")
+        self.assertFalse(os.path.exists(first.path))
+
+    def test_paginated_export(self):
+        self.index.update(json.dumps(self.history))
+        pages, cursor = [], 0
+        while cursor is not None:
+            output = io.StringIO()
+            cursor = self.index.export_jsonl(output, start=cursor, limit=3)
+            pages.append([json.loads(line) for line in output.getvalue().splitlines()])
+        self.assertEqual([len(page) for page in pages], [3, 1])
+        self.assertEqual(pages[1][0]["text"], "Hello world")
+
+        path = os.path.join(self.folder, "session1.jsonl")
+        self.assertIsNone(self.index.export_jsonl(path, session_id=1))
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+    def test_refresh_from_server(self):
+        server, _servicer, address = serve(history_sessions=3, messages_per_session=4)
+        client = SuperBuilderClient(address)
+        self.addCleanup(server.stop, None)
+        self.addCleanup(client.close)
+        self.assertEqual(self.index.refresh(client), 12)
+        self.assertEqual(len(self.index.search("message 3")), 3)
@@ -0,0 +1,112 @@
+import json
+import os
+import tempfile
+import unittest
+import superbuilder_service_pb2 as sb
+from helpers.ingest import ingest, make_batches, Checkpoint
+
+class _AddFilesStub:
+    """Streams per-file progress for AddFiles; stops the stream after 'stop_after' files, like StopAddFiles."""
+    def __init__(self, stop_after=None, error_after=None):
+        self.stop_after = stop_after
+        self.error_after = error_after
+        self.requests = []
+        self.stored = []
+
+    def AddFiles(self, request):
+        paths = json.loads(request.filesToUpload)
+        self.requests.append(paths)
+        uploaded = []
+        for path in paths:
+            if self.stop_after is not None and len(self.stored) >= self.stop_after:
+                return
+            if self.error_after is not None and len(self.stored) >= self.error_after:
+                yield sb.AddFilesResponse(filesUploaded=f"Error: cannot parse {path}")
+                return
+            for percent in ("0", "50", "100"):
+                yield sb.AddFilesResponse(filesUploaded=json.dumps(uploaded), currentFileUploading=path, currentFileProgress=percent)
+            uploaded.append(path)
+            self.stored.append(path)
+            yield sb.AddFilesResponse(filesUploaded=json.dumps(uploaded))
+
+class TestIngest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.tmp.name, "ingest.log")
+        self.paths = []
+        for i in range(7):
+            path = os.path.join(self.tmp.name, f"doc{i}.txt")
+            with open(path, "w") as f:
+                f.write("x" * (i + 1) * 10)
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_make_batches(self):
+        sizes = [("a", 10), ("b", 10), ("c", 100), ("d", 1), ("e", 1)]
+        self.assertEqual(list(make_batches(sizes, max_files=2, max_bytes=50)), [["a", "b"], ["c"], ["d", "e"]])
+
+    def test_ingest_in_batches_with_progress(self):
+        stub = _AddFilesStub()
+        progress = []
+        result = ingest(stub, self.paths, self.checkpoint, max_files=3, on_progress=progress.append)
+        self.assertEqual([len(r) for r in stub.requests], [3, 3, 1])
+        self.assertFalse(result.stopped)
+        self.assertEqual(result.uploaded, self.paths)
+        self.assertEqual(result.remaining, [])
+        self.assertEqual(Checkpoint(self.checkpoint).done, set(self.paths))
+        # Progress advances per file, not per checkpointed batch
+        files_done = [p.files_done for p in progress]
+        self.assertEqual(files_done, sorted(files_done))
+        self.assertEqual(sorted(set(files_done)), list(range(8)))
+        self.assertEqual(progress[-1].bytes_done, progress[-1].bytes_total)
+        self.assertEqual(progress[-1].bytes_total, sum(os.path.getsize(p) for p in self.paths))
+        bytes_done = [p.bytes_done for p in progress]
+        self.assertEqual(bytes_done, sorted(bytes_done))
+
+    def test_resume_after_stop(self):
+        stub = _AddFilesStub(stop_after=4)
+        result = ingest(stub, self.paths, self.checkpoint, max_files=3)
+        self.assertTrue(result.stopped)
+        self.assertEqual(result.uploaded, self.paths[:4])
+        self.assertEqual(result.remaining, self.paths[4:])
+
+        stub.stop_after = None
+        result = ingest(stub, self.paths, self.checkpoint, max_files=3)
+        self.assertFalse(result.stopped)
+        self.assertEqual(result.skipped, self.paths[:4])
+        self.assertEqual(result.uploaded, self.paths[4:])
+        self.assertEqual(stub.stored, self.paths)
+
+    def test_error_keeps_finished_files(self):
+        stub = _AddFilesStub(error_after=2)
+        with self.assertRaises(Exception):
+            ingest(stub, self.paths, self.checkpoint, max_files=3)
+        self.assertEqual(Checkpoint(self.checkpoint).done, set(self.paths[:2]))
+
+        stub = _AddFilesStub()
+        result = ingest(stub, self.paths, self.checkpoint, max_files=3)
+        self.assertEqual(result.skipped, self.paths[:2])
+        self.assertEqual(result.uploaded, self.paths[2:])
+
+    def test_checkpoint_compares_normalized_paths(self):
+        checkpoint = Checkpoint(self.checkpoint)
+        checkpoint.add([self.paths[0]])
+        other_spelling = os.path.join(os.path.dirname(self.paths[0]), ".", os.path.basename(self.paths[0]))
+        self.assertIn(other_spelling, Checkpoint(self.checkpoint))
+
+    def test_checkpoint_ignores_torn_line(self):
+        with open(self.checkpoint, "w") as f:
+            f.write(self.paths[0] + "\n" + self.paths[1][:5])
+        checkpoint = Checkpoint(self.checkpoint)
+        self.assertEqual(checkpoint.done, {self.paths[0]})
+        checkpoint.add([self.paths[2]])
+        reloaded = Checkpoint(self.checkpoint)
+        self.assertEqual(len(reloaded.done), 3)
+        for path in (self.paths[0], self.paths[1][:5], self.paths[2]):
+            self.assertIn(path, reloaded)
+
+if __name__ == '__main__':
+    unittest.main()
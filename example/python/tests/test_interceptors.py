@@ -0,0 +1,64 @@
+import unittest
+import grpc
+import superbuilder_service_pb2 as sb
+from fake_server import serve
+from helpers.pool import SuperBuilderClient
+from helpers.interceptors import MetricsInterceptor, Histogram
+
+class TestMetricsInterceptor(unittest.TestCase):
+
+    def setUp(self):
+        self.server, self.servicer, address = serve(tokens_per_second=0, ttft=0, response_tokens=5)
+        self.spans = []
+        self.metrics = MetricsInterceptor(on_span=self.spans.append)
+        self.client = SuperBuilderClient(address, interceptors=[self.metrics])
+        self.addCleanup(self.server.stop, None)
+        self.addCleanup(self.client.close)
+
+    def test_histogram(self):
+        histogram = Histogram((1, 2))
+        for value in (0.5, 1, 1.5, 3):
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative(), [(1, 2), (2, 3), ("+Inf", 4)])
+        self.assertEqual(histogram.sum, 6)
+
+    def test_unary_and_stream(self):
+        self.client.GetChatHistory(sb.GetChatHistoryRequest())
+        self.client.GetFileList.future(sb.GetFileListRequest()).result()
+        tokens = [r.message for r in self.client.Chat(sb.ChatRequest(prompt="a b", sessionId=1))]
+        self.assertEqual(len(tokens), 5)
+
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot["GetChatHistory"]["calls"], 1)
+        self.assertEqual(snapshot["GetFileList"]["calls"], 1)
+        chat = snapshot["Chat"]
+        self.assertEqual((chat["calls"], chat["response_messages"], chat["first_message_count"]), (1, 5, 1))
+        self.assertGreater(chat["request_bytes"], 0)
+        self.assertGreater(chat["response_bytes"], 0)
+
+        span = [s for s in self.spans if s["name"] == "SuperBuilder.SuperBuilder/Chat"][0]
+        self.assertEqual(span["attributes"]["rpc.response.messages"], 5)
+        self.assertEqual(span["status"]["code"], "STATUS_CODE_OK")
+        self.assertGreaterEqual(span["endTimeUnixNano"], span["startTimeUnixNano"])
+
+    def test_errors(self):
+        self.servicer.fail_first = 1
+        self.servicer.error_methods = {"GetChatHistory", "Chat"}
+        with self.assertRaises(grpc.RpcError):
+            self.client.GetChatHistory(sb.GetChatHistoryRequest())
+        with self.assertRaises(grpc.RpcError):
+            list(self.client.Chat(sb.ChatRequest(prompt="a")))
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot["GetChatHistory"]["errors"], {"UNAVAILABLE": 1})
+        self.assertEqual(snapshot["Chat"]["errors"], {"UNAVAILABLE": 1})
+        self.assertEqual(self.spans[-1]["status"]["code"], "STATUS_CODE_ERROR")
+
+    def test_prometheus_text(self):
+        self.client.GetChatHistory(sb.GetChatHistoryRequest())
+        text = self.metrics.prometheus_text()
+        self.assertIn('superbuilder_client_rpc_duration_seconds_bucket{method="GetChatHistory",le="+Inf"} 1', text)
+        self.assertIn('superbuilder_client_rpc_calls_total{method="GetChatHistory"} 1', text)
+        self.assertIn("# TYPE superbuilder_client_rpc_duration_seconds histogram", text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import threading
+import time
+import unittest
+from fake_server import serve
+from helpers.pool import SuperBuilderClient
+from helpers.model_manager import ModelManager, ModelSet
+import helpers.model as model
+import superbuilder_service_pb2 as sb
+
+class TestModelManager(unittest.TestCase):
+
+    def setUp(self):
+        self.server, self.servicer, address = serve(tokens_per_second=0, ttft=0)
+        self.client = SuperBuilderClient(address)
+        self.manager = ModelManager(self.client, local_model_path="/models", idle_delay=0.05)
+        self.addCleanup(self.server.stop, None)
+        self.addCleanup(self.client.close)
+        self.addCleanup(self.manager.close)
+
+    def test_resident(self):
+        self.assertEqual(self.manager.resident(), ModelSet("Fake-LLM-7B-int4", "Fake-Embedder", "Fake-Ranker"))
+        self.assertTrue(self.manager.is_resident("Fake-LLM-7B-int4"))
+        self.assertTrue(self.manager.is_resident("/somewhere/Fake-LLM-7B-int4"))
+        self.assertFalse(self.manager.is_resident("Other-LLM"))
+
+    def test_skips_redundant_switches(self):
+        self.assertFalse(self.manager.ensure("Fake-LLM-7B-int4"))
+        self.assertNotIn("SetModels", self.servicer.calls)
+        self.assertEqual(self.servicer.calls["LoadModels"], 1)
+
+        self.assertTrue(self.manager.ensure(ModelSet("VLM", "Fake-Embedder", "Fake-Ranker")))
+        self.assertFalse(self.manager.ensure("VLM"))
+        self.assertEqual(self.servicer.calls["SetModels"], 1)
+        self.assertEqual(self.manager.resident(refresh=True).llm, "VLM")
+        self.assertEqual(self.servicer.calls["LoadModels"], 2)
+
+    def test_rereads_models_before_skipping(self):
+        self.manager.ensure("VLM")
+        # Another client switches back behind the manager's back
+        self.client.SetModels(sb.SetModelsRequest(llm="/models/Fake-LLM-7B-int4"))
+        self.assertTrue(self.manager.ensure("VLM"))
+        self.assertEqual(self.servicer.models[0]["full_name"], "VLM")
+
+    def test_concurrent_switches_load_once(self):
+        threads = [threading.Thread(target=self.manager.ensure, args=("VLM",)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.servicer.calls["SetModels"], 1)
+
+    def test_submit_groups_work_per_model(self):
+        order = []
+        gate = threading.Event()
+        # Hold the worker so the queue fills up with alternating requests
+        first = self.manager.submit("Fake-LLM-7B-int4", gate.wait)
+        futures = [self.manager.submit("VLM" if i % 2 else "Fake-LLM-7B-int4", order.append, i) for i in range(6)]
+        gate.set()
+        first.result(timeout=5)
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(order, [0, 2, 4, 1, 3, 5])
+        self.assertEqual(self.servicer.calls["SetModels"], 1)
+
+    def test_submit_reports_errors(self):
+        future = self.manager.submit("Fake-LLM-7B-int4", lambda: 1 / 0)
+        with self.assertRaises(ZeroDivisionError):
+            future.result(timeout=5)
+
+    def test_prewarm_when_idle(self):
+        self.manager.prewarm("VLM")
+        deadline = time.monotonic() + 5
+        while self.manager.switches == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.servicer.models[0]["full_name"], "VLM")
+
+    def test_prewarm_waits_for_use(self):
+        with self.manager.use("Fake-LLM-7B-int4"):
+            self.manager.prewarm("VLM")
+            time.sleep(0.3)
+            self.assertNotIn("SetModels", self.servicer.calls)
+        deadline = time.monotonic() + 5
+        while self.manager.switches == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.servicer.models[0]["full_name"], "VLM")
+
+    def test_ensure_waits_for_use(self):
+        switched = threading.Event()
+        with self.manager.use("Fake-LLM-7B-int4"):
+            thread = threading.Thread(target=lambda: self.manager.ensure("VLM") and switched.set())
+            thread.start()
+            self.assertFalse(switched.wait(0.3))
+            # Work for the held models still goes ahead
+            self.assertFalse(self.manager.ensure("Fake-LLM-7B-int4"))
+        thread.join(timeout=5)
+        self.assertTrue(switched.is_set())
+
+    def test_set_model_uses_shared_manager(self):
+        response = model.set_model(self.client, "/models", "VLM", "Fake-Embedder", "Fake-Ranker")
+        self.assertEqual(response.modelsLoaded, "True")
+        response = model.set_model(self.client, "/models", "VLM", "Fake-Embedder", "Fake-Ranker")
+        self.assertEqual(response.modelsLoaded, "True")
+        self.assertEqual(self.servicer.calls["SetModels"], 1)
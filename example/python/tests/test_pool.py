@@ -0,0 +1,96 @@
+import unittest
+import threading
+import warnings
+from concurrent import futures
+import grpc
+import superbuilder_service_pb2 as sb
+import superbuilder_service_pb2_grpc as sb_grpc
+import helpers.pool as pool
+from helpers.pool import SuperBuilderClient, get_shared_client
+from helpers.retry import RetryInterceptor
+from helpers.mw import check_pybackend
+
+class _HelloServicer(sb_grpc.SuperBuilderServicer):
+    def __init__(self):
+        self.peers = set()
+
+    def SayHelloPyllm(self, request, context):
+        self.peers.add(context.peer())
+        return sb.SayHelloResponse(message=f"Hello {request.name}")
+
+    def Chat(self, request, context):
+        for token in request.prompt.split():
+            yield sb.ChatResponse(message=token)
+
+class TestSuperBuilderClient(unittest.TestCase):
+
+    def setUp(self):
+        # In-process stand-in for the middleware
+        self.servicer = _HelloServicer()
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=8))
+        sb_grpc.add_SuperBuilderServicer_to_server(self.servicer, self.server)
+        self.port = self.server.add_insecure_port('localhost:0')
+        self.server.start()
+        self.client = SuperBuilderClient(f'localhost:{self.port}', pool_size=3)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop(None)
+
+    def test_connect(self):
+        self.assertTrue(self.client.connect(timeout=5, attempts=1))
+
+    def test_client_used_as_stub(self):
+        self.assertTrue(check_pybackend(self.client))
+        tokens = [r.message for r in self.client.Chat(sb.ChatRequest(prompt="a b c"))]
+        self.assertEqual(tokens, ["a", "b", "c"])
+
+    def test_calls_spread_over_channels(self):
+        for _ in range(9):
+            self.client.SayHelloPyllm(sb.SayHelloRequest(name="pool"))
+        self.assertEqual(len(self.servicer.peers), 3, "Each pooled channel should own its own connection")
+
+    def test_concurrent_calls(self):
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(20):
+                    self.client.SayHelloPyllm(sb.SayHelloRequest(name="thread"))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_unknown_attribute(self):
+        with self.assertRaises(AttributeError):
+            self.client.NotAnRpc
+
+    def test_closed_client(self):
+        self.client.close()
+        with self.assertRaises(ValueError):
+            self.client.SayHelloPyllm(sb.SayHelloRequest(name="closed"))
+
+    def test_connect_failure(self):
+        with SuperBuilderClient('localhost:1', pool_size=1) as client:
+            self.assertFalse(client.connect(timeout=0.2, attempts=2, backoff=0.01))
+
+    def test_shared_client_warns_on_other_settings(self):
+        address = f'localhost:{self.port}'
+        shared = get_shared_client(address, pool_size=2, interceptors=[RetryInterceptor()])
+        self.addCleanup(pool._shared_clients.pop, address, None)
+        self.addCleanup(shared.close)
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            self.assertIs(get_shared_client(address, pool_size=2, interceptors=[RetryInterceptor()]), shared)
+        with self.assertWarns(RuntimeWarning):
+            self.assertIs(get_shared_client(address, pool_size=4), shared)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import time
+import unittest
+import grpc
+import superbuilder_service_pb2 as sb
+from fake_server import serve
+from helpers.pool import SuperBuilderClient
+from helpers.retry import RetryInterceptor, StreamStoppedError, hedged_call, guard_stream, stops_sent
+import helpers.batch as batch
+from helpers.cache import ResponseCache
+
+class TestRetry(unittest.TestCase):
+
+    def setUp(self):
+        self.server, self.servicer, address = serve(tokens_per_second=0, ttft=0, response_tokens=5)
+        self.client = SuperBuilderClient(address, interceptors=[
+            RetryInterceptor(deadlines={"LoadModels": 0.2}, backoff=0.01)
+        ])
+        self.addCleanup(self.server.stop, None)
+        self.addCleanup(self.client.close)
+
+    def test_default_deadline(self):
+        self.servicer.ttft = 1
+        with self.assertRaises(grpc.RpcError) as raised:
+            self.client.LoadModels(sb.LoadModelsRequest())
+        self.assertEqual(raised.exception.code(), grpc.StatusCode.DEADLINE_EXCEEDED)
+        # Not idempotent, so it is not retried
+        self.assertEqual(self.servicer.calls["LoadModels"], 1)
+
+    def test_retries_idempotent_calls(self):
+        self.servicer.fail_first = 2
+        self.client.GetFileList(sb.GetFileListRequest())
+        self.assertEqual(self.servicer.calls["GetFileList"], 3)
+
+    def test_gives_up_after_max_attempts(self):
+        self.servicer.fail_first = 10
+        with self.assertRaises(grpc.RpcError) as raised:
+            self.client.GetChatHistory(sb.GetChatHistoryRequest())
+        self.assertEqual(raised.exception.code(), grpc.StatusCode.UNAVAILABLE)
+        self.assertEqual(self.servicer.calls["GetChatHistory"], 4)
+
+    def test_does_not_retry_other_calls(self):
+        self.servicer.fail_first = 1
+        with self.assertRaises(grpc.RpcError):
+            self.client.SetParameters(sb.SetParametersRequest(parameters_json="{}"))
+        self.assertEqual(self.servicer.calls["SetParameters"], 1)
+
+    def test_does_not_retry_permanent_errors(self):
+        self.servicer.fail_first = 1
+        self.servicer.error_code = grpc.StatusCode.INVALID_ARGUMENT
+        with self.assertRaises(grpc.RpcError):
+            self.client.GetFileList(sb.GetFileListRequest())
+        self.assertEqual(self.servicer.calls["GetFileList"], 1)
+
+    def test_hedged_call(self):
+        plain = SuperBuilderClient(self.client.address)
+        self.addCleanup(plain.close)
+        self.servicer.fail_first = 1
+        response = hedged_call(plain.GetFileList, sb.GetFileListRequest(), hedge_after=5)
+        self.assertEqual(response.fileList, "[]")
+        self.assertEqual(self.servicer.calls["GetFileList"], 2)
+
+    def test_future_returns_before_retries(self):
+        self.servicer.fail_first = 2
+        self.servicer.slow_first = 2
+        self.servicer.slow_delay = 0.3
+        start = time.perf_counter()
+        future = self.client.GetFileList.future(sb.GetFileListRequest())
+        self.assertLess(time.perf_counter() - start, 0.2)
+        self.assertEqual(future.result().fileList, "[]")
+        self.assertEqual(self.servicer.calls["GetFileList"], 3)
+
+    def test_hedged_call_through_interceptor(self):
+        self.servicer.slow_first = 1
+        self.servicer.slow_delay = 3
+        start = time.perf_counter()
+        response = hedged_call(self.client.GetFileList, sb.GetFileListRequest(), hedge_after=0.2)
+        self.assertEqual(response.fileList, "[]")
+        # The hedge answered while the slow first attempt was still running
+        self.assertLess(time.perf_counter() - start, 2)
+        self.assertEqual(self.servicer.calls["GetFileList"], 2)
+
+    def test_guard_stream_stops_stalled_chat(self):
+        self.servicer.ttft = 3
+        start = time.perf_counter()
+        call = self.client.Chat(sb.ChatRequest(prompt="a b", sessionId=1))
+        with self.assertRaises(TimeoutError):
+            list(guard_stream(self.client, call, first_message_timeout=0.2))
+        self.assertLess(time.perf_counter() - start, 2)
+        self.assertEqual(self.servicer.calls["StopChat"], 1)
+
+    def test_guard_stream_passes_healthy_chat(self):
+        call = self.client.Chat(sb.ChatRequest(prompt="a b", sessionId=1))
+        messages = list(guard_stream(self.client, call, first_message_timeout=2, idle_timeout=2))
+        self.assertEqual(len(messages), 5)
+        self.assertNotIn("StopChat", self.servicer.calls)
+
+    def test_batch_stall_timeout(self):
+        self.servicer.ttft = 3
+        results = list(batch.run_batch(self.client, ["a b"], stall_timeout=0.2))
+        self.assertIsInstance(results[0].error, TimeoutError)
+
+    def test_batch_stall_not_cached(self):
+        self.servicer.tokens_per_second = 3
+        cache = ResponseCache(":memory:")
+        self.addCleanup(cache.close)
+        result, = batch.run_batch(self.client, ["a b"], stall_timeout=0.1, cache=cache)
+        self.assertIsInstance(result.error, TimeoutError)
+        self.assertEqual(len(cache), 0)
+
+    def test_batch_stall_with_cache_frees_worker(self):
+        # The first Chat stalls while the second streams, so no StopChat is sent: the stalled
+        # call itself has to be cancelled, also when it goes through the cache
+        self.servicer.slow_first, self.servicer.slow_delay, self.servicer.error_methods = 1, 3, {"Chat"}
+        cache = ResponseCache(":memory:")
+        self.addCleanup(cache.close)
+        start = time.perf_counter()
+        errors = [result.error for result in batch.run_batch(self.client, ["a", "b"], concurrency=2,
+                                                             stall_timeout=0.3, cache=cache)]
+        self.assertLess(time.perf_counter() - start, 1.5)
+        # Either prompt may have been the one that stalled
+        self.assertEqual(sorted(type(error).__name__ for error in errors), ["NoneType", "TimeoutError"])
+        self.assertEqual(len(cache), 1)
+
+    def test_guard_stream_spares_other_streams(self):
+        self.servicer.ttft = 0.5
+        stalled = guard_stream(self.client, self.client.Chat(sb.ChatRequest(prompt="a b", sessionId=1)), first_message_timeout=0.1)
+        healthy = guard_stream(self.client, self.client.Chat(sb.ChatRequest(prompt="a b", sessionId=2)), first_message_timeout=2)
+        with self.assertRaises(TimeoutError):
+            list(stalled)
+        # Another guarded stream was active, so only the stalled call was cancelled
+        self.assertEqual(len(list(healthy)), 5)
+        self.assertNotIn("StopChat", self.servicer.calls)
+
+    def test_guard_stream_reports_foreign_stop(self):
+        self.servicer.ttft = 0.5
+        stops_before = stops_sent(self.client)
+        other = self.client.Chat(sb.ChatRequest(prompt="a b", sessionId=2))
+        # Stalls while it is the only guarded stream, so it sends StopChat, which also ends 'other'
+        with self.assertRaises(TimeoutError):
+            list(guard_stream(self.client, self.client.Chat(sb.ChatRequest(prompt="a b", sessionId=1)), first_message_timeout=0.1))
+        self.assertEqual(self.servicer.calls["StopChat"], 1)
+        with self.assertRaises(StreamStoppedError):
+            list(guard_stream(self.client, other, idle_timeout=2, stops_before=stops_before))
@@ -0,0 +1,91 @@
+import json
+import threading
+import unittest
+from unittest import mock
+import superbuilder_service_pb2 as sb
+from helpers.chat import init_chat_session
+from helpers.session import SessionIdAllocator, get_allocator, SESSION_ID_BASE, SESSION_ID_MAX
+
+class _HistoryStub:
+    """Counts GetChatHistory calls instead of talking to the middleware."""
+    def __init__(self, session_ids):
+        self.session_ids = list(session_ids)
+        self.calls = 0
+
+    def GetChatHistory(self, request):
+        self.calls += 1
+        return sb.GetChatHistoryResponse(data=json.dumps([{"sid": sid} for sid in self.session_ids]))
+
+class TestSessionIdAllocator(unittest.TestCase):
+
+    def test_history_fetched_once(self):
+        stub = _HistoryStub([12345678])
+        allocator = SessionIdAllocator(stub)
+        ids = [allocator.next_id() for _ in range(100)]
+        self.assertEqual(stub.calls, 1)
+        self.assertEqual(len(set(ids)), 100)
+        self.assertNotIn(12345678, ids)
+
+    def test_skips_ids_in_use(self):
+        stub = _HistoryStub([SESSION_ID_BASE + 10, 42])
+        allocator = SessionIdAllocator(stub)
+        allocator._random = mock.Mock()
+        allocator._random.randint.side_effect = [SESSION_ID_BASE + 10, SESSION_ID_BASE + 11, SESSION_ID_BASE + 11, SESSION_ID_BASE + 12]
+        self.assertEqual(allocator.next_id(), SESSION_ID_BASE + 11)
+        self.assertEqual(allocator.next_id(), SESSION_ID_BASE + 12)
+
+    def test_processes_draw_different_ids(self):
+        # Two clients seeded from the same history must not hand out the same IDs
+        first = SessionIdAllocator(_HistoryStub([SESSION_ID_BASE + 10]))
+        second = SessionIdAllocator(_HistoryStub([SESSION_ID_BASE + 10]))
+        first_ids = {first.next_id() for _ in range(100)}
+        second_ids = {second.next_id() for _ in range(100)}
+        self.assertFalse(first_ids & second_ids)
+        self.assertTrue(all(SESSION_ID_BASE <= sid <= SESSION_ID_MAX for sid in first_ids | second_ids))
+
+    def test_no_round_trip(self):
+        allocator = SessionIdAllocator(fetch_history=False)
+        first, second = allocator.next_id(), allocator.next_id()
+        self.assertTrue(SESSION_ID_BASE <= first <= SESSION_ID_MAX)
+        self.assertNotEqual(first, second)
+
+    def test_refresh_merges_new_ids(self):
+        stub = _HistoryStub([])
+        allocator = SessionIdAllocator(stub, max_age=0)
+        first = allocator.next_id()
+        stub.session_ids.append(first + 1)  # created by another client meanwhile
+        allocator._random = mock.Mock()
+        allocator._random.randint.side_effect = [first + 1, first + 2]
+        self.assertEqual(allocator.next_id(), first + 2)
+        self.assertEqual(stub.calls, 2)
+
+    def test_get_allocator_enables_history(self):
+        stub = _HistoryStub([1, 2, 3])
+        self.assertIs(get_allocator(stub, fetch_history=False), get_allocator(stub))
+        get_allocator(stub).next_id()
+        self.assertEqual(stub.calls, 1)
+
+    def test_thread_safe(self):
+        allocator = SessionIdAllocator(fetch_history=False)
+        ids = []
+
+        def worker():
+            for _ in range(1000):
+                ids.append(allocator.next_id())
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(ids)), 4000)
+
+    def test_init_chat_session_caches_history(self):
+        stub = _HistoryStub([1, 2, 3])
+        ids = {init_chat_session(stub) for _ in range(10)}
+        self.assertEqual(len(ids), 10)
+        self.assertEqual(stub.calls, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
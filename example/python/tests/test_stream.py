@@ -0,0 +1,72 @@
+import asyncio
+import io
+import threading
+import unittest
+import superbuilder_service_pb2 as sb
+from helpers.chat import get_chat_response, get_chat_result
+from helpers.stream import stream_chat_response, CallbackSink, QueueSink, AsyncIteratorSink, PrintSink
+
+def _synthetic_stream(tokens, references=()):
+    responses = [sb.ChatResponse(message=token) for token in tokens]
+    responses[-1].references.extend(sb.Reference(file=f) for f in references)
+    return iter(responses)
+
+class TestStreamHelpers(unittest.TestCase):
+
+    def test_stream_chat_response(self):
+        result = stream_chat_response(_synthetic_stream(["Hello", ", ", "world"], references=["a.pdf"]))
+        self.assertEqual(result.text, "Hello, world")
+        self.assertEqual(result.chunks, 3)
+        self.assertEqual([r.file for r in result.references], ["a.pdf"])
+
+    def test_get_chat_response_is_text(self):
+        tokens = []
+        result = get_chat_response(_synthetic_stream(["a", "b"]), verbose=False, on_token=tokens.append)
+        self.assertEqual(result, "ab")
+        self.assertEqual(tokens, ["a", "b"])
+
+    def test_get_chat_result_references(self):
+        result = get_chat_result(_synthetic_stream(["x"], references=["b.docx"]), verbose=False)
+        self.assertEqual(result.references[0].file, "b.docx")
+
+    def test_callback_sink(self):
+        tokens = []
+        stream_chat_response(_synthetic_stream(["1", "2"]), [CallbackSink(tokens.append)])
+        self.assertEqual(tokens, ["1", "2"])
+
+    def test_queue_sink(self):
+        sink = QueueSink()
+        worker = threading.Thread(target=stream_chat_response, args=(_synthetic_stream(["q", "r"]), [sink]))
+        worker.start()
+        self.assertEqual(list(sink), ["q", "r"])
+        worker.join()
+
+    def test_async_iterator_sink(self):
+        async def consume():
+            sink = AsyncIteratorSink()
+            worker = asyncio.get_running_loop().run_in_executor(None, stream_chat_response, _synthetic_stream(["s", "t"]), [sink])
+            tokens = [token async for token in sink]
+            await worker
+            return tokens
+
+        self.assertEqual(asyncio.run(consume()), ["s", "t"])
+
+    def test_print_sink_buffers_output(self):
+        output = io.StringIO()
+        sink = PrintSink(output, flush_interval=60)
+        stream_chat_response(_synthetic_stream(["line\n", "more"]), [sink])
+        self.assertEqual(output.getvalue(), "line\nmore")
+
+    def test_sinks_closed_on_error(self):
+        def failing_stream():
+            yield sb.ChatResponse(message="partial")
+            raise RuntimeError("stream broken")
+
+        sink = QueueSink()
+        with self.assertRaises(RuntimeError):
+            stream_chat_response(failing_stream(), [sink])
+        self.assertEqual(list(sink), ["partial"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+import superbuilder_service_pb2 as sb
+from helpers.sync import sync, scan_tree, load_manifest
+
+class _FileStoreStub:
+    """Keeps the uploaded paths in memory and records the paths of every AddFiles/RemoveFiles call."""
+    def __init__(self):
+        self.files = {}
+        self.added = []
+        self.removed = []
+        # The middleware may store a path spelled differently from the one uploaded
+        self.store_as = lambda path: path
+        self.fail_on = set()
+
+    def GetFileList(self, request):
+        return sb.GetFileListResponse(fileList=json.dumps([[path, meta] for path, meta in self.files.items()]))
+
+    def AddFiles(self, request):
+        paths = json.loads(request.filesToUpload)
+        self.added.append(sorted(paths))
+        uploaded = []
+        for path in paths:
+            if path in self.fail_on:
+                yield sb.AddFilesResponse(filesUploaded=f"Error: cannot read {path}")
+                return
+            self.files[self.store_as(path)] = {"size": os.path.getsize(path)}
+            uploaded.append(self.store_as(path))
+            yield sb.AddFilesResponse(filesUploaded=json.dumps(uploaded), currentFileUploading=path, currentFileProgress="100")
+
+    def RemoveFiles(self, request):
+        paths = json.loads(request.filesToRemove)
+        self.removed.append(sorted(paths))
+        for path in paths:
+            self.files.pop(path, None)
+        return sb.RemoveFilesResponse(filesRemoved=request.filesToRemove)
+
+class TestSync(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, "docs")
+        self.manifest = os.path.join(self.tmp.name, "manifest.json")
+        os.makedirs(os.path.join(self.root, "sub"))
+        self.paths = [self._write(name, name) for name in ("a.txt", "b.pdf", os.path.join("sub", "c.txt"))]
+        self.stub = _FileStoreStub()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, name, content):
+        path = os.path.join(self.root, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_scan_tree(self):
+        self.assertEqual(sorted(p for p, _, _ in scan_tree(self.root)), sorted(self.paths))
+        self.assertEqual([p for p, _, _ in scan_tree(self.root, {".pdf"})], [self.paths[1]])
+
+    def test_missing_root_raises(self):
+        sync(self.stub, self.root, self.manifest)
+        with self.assertRaises(FileNotFoundError):
+            sync(self.stub, os.path.join(self.tmp.name, "missing"), self.manifest)
+        os.rename(self.root, self.root + ".moved")
+        with self.assertRaises(FileNotFoundError):
+            sync(self.stub, self.root, self.manifest)
+        self.assertEqual(self.stub.removed, [])
+
+    def test_unreadable_folder_is_not_removed(self):
+        sync(self.stub, self.root, self.manifest)
+        sub = os.path.join(self.root, "sub")
+        scandir = os.scandir
+
+        def failing_scandir(path):
+            if path == sub:
+                raise PermissionError(13, "Permission denied", path)
+            return scandir(path)
+
+        with mock.patch("helpers.sync.os.scandir", failing_scandir):
+            os.remove(self.paths[0])
+            plan = sync(self.stub, self.root, self.manifest)
+        # a.txt was deleted, sub/c.txt could not be read and is kept
+        self.assertEqual(plan.removed, [self.paths[0]])
+        self.assertIn(self.paths[2], self.stub.files)
+        self.assertIn(self.paths[2], load_manifest(self.manifest))
+
+    def test_initial_sync_uploads_everything(self):
+        plan = sync(self.stub, self.root, self.manifest)
+        self.assertEqual(plan.added, sorted(self.paths))
+        self.assertEqual(self.stub.added, [sorted(self.paths)])
+        self.assertEqual(set(load_manifest(self.manifest)), set(self.paths))
+
+    def test_second_sync_is_noop(self):
+        sync(self.stub, self.root, self.manifest)
+        plan = sync(self.stub, self.root, self.manifest)
+        self.assertEqual((plan.added, plan.modified, plan.removed), ([], [], []))
+        self.assertEqual(len(plan.unchanged), 3)
+        self.assertEqual(len(self.stub.added), 1)
+        self.assertEqual(self.stub.removed, [])
+
+    def test_only_changes_are_sent(self):
+        sync(self.stub, self.root, self.manifest)
+        modified = self._write("a.txt", "new content")
+        stat = os.stat(modified)
+        os.utime(modified, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        new = self._write("d.txt", "d")
+        os.remove(self.paths[2])
+
+        plan = sync(self.stub, self.root, self.manifest)
+        self.assertEqual(plan.added, [new])
+        self.assertEqual(plan.modified, [modified])
+        self.assertEqual(plan.removed, [self.paths[2]])
+        self.assertEqual(self.stub.removed[-1], sorted([self.paths[2], modified]))
+        self.assertEqual(self.stub.added[-1], sorted([new, modified]))
+        self.assertEqual(set(self.stub.files), {modified, self.paths[1], new})
+
+    def test_modified_file_removed_under_stored_path(self):
+        self.stub.store_as = lambda path: os.path.join(os.path.dirname(path), ".", os.path.basename(path))
+        sync(self.stub, self.root, self.manifest)
+        modified = self._write("a.txt", "new content")
+        stat = os.stat(modified)
+        os.utime(modified, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        plan = sync(self.stub, self.root, self.manifest)
+        self.assertEqual(plan.modified, [modified])
+        self.assertEqual(self.stub.removed[-1], [self.stub.store_as(modified)])
+        self.assertEqual(len(self.stub.files), 3)
+
+    def test_failed_upload_is_not_recorded(self):
+        self.stub.fail_on = {self.paths[2]}
+        with self.assertRaises(Exception):
+            sync(self.stub, self.root, self.manifest)
+        self.assertNotIn(self.paths[2], self.stub.files)
+        self.assertEqual(load_manifest(self.manifest), {})
+
+        # Files that did upload are only hashed again, the failed one is sent again
+        self.stub.fail_on = set()
+        plan = sync(self.stub, self.root, self.manifest)
+        self.assertEqual(plan.added, [self.paths[2]])
+        self.assertEqual(len(plan.unchanged), 2)
+        self.assertEqual(set(load_manifest(self.manifest)), set(self.paths))
+
+    def test_touched_but_identical_file_is_unchanged(self):
+        sync(self.stub, self.root, self.manifest)
+        os.utime(self.paths[0], (time.time() + 10, time.time() + 10))
+        plan = sync(self.stub, self.root, self.manifest)
+        self.assertEqual(plan.modified, [])
+
+    def test_dry_run(self):
+        plan = sync(self.stub, self.root, self.manifest, dry_run=True)
+        self.assertEqual(len(plan.added), 3)
+        self.assertEqual(self.stub.added, [])
+        self.assertFalse(os.path.exists(self.manifest))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,7 +9,9 @@ import time
 from tqdm import tqdm
 
 import superbuilder_service_pb2 as sb
-import superbuilder_service_pb2_grpc as sbg
+from helpers.pool import get_shared_client
+from helpers.retry import RetryInterceptor
+from helpers.model_manager import ModelSet, get_shared_manager
 
 GRPC_ADDRESS = 'localhost:5006'
 
@@ -57,21 +59,21 @@ def load_models(stub):
         return False
 
 def aab_connect():
-
+    """
+    Connects through the shared pooled client (long-lived channels with keepalive, default
+    deadlines and retries of idempotent calls).
+    The client is returned as both stub and channel; disconnect() closes the pool.
+    """
     success = False
     stub = None
-    channel = grpc.insecure_channel(GRPC_ADDRESS)
-    try:
-        grpc.channel_ready_future(channel).result(timeout=15)  # Wait until the channel is ready
-        stub = sbg.SuperBuilderStub(channel)
-    except grpc.RpcError as e:
-        print(f"gRPC error: {e.details()}")
-    except grpc.FutureTimeoutError:
-        print("gRPC channel connection busy or missing")
-    else:
+    client = get_shared_client(GRPC_ADDRESS, interceptors=[RetryInterceptor()])
+    if client.connect():
+        stub = client
         success = True
-    
-    return success, stub, channel
+    else:
+        print("gRPC channel connection busy or missing")
+
+    return success, stub, client
 
 
 def disconnect(stub, channel):
@@ -123,12 +125,16 @@ def download(stub, url, local_path, token_id: Optional[str] = None):
         print(f"download failed: {e.details()}")
 
 def set_model(stub, local_model_path, llm, embedder, ranker):
+    """
+    Loads the given models (e.g. DEFAULT_VLM) through the shared ModelManager, which skips SetModels
+    when they are already resident. Returns the SetModels response.
+    """
     llm = os.path.join(local_model_path, llm)
     embedder = os.path.join(local_model_path, embedder)
     ranker = os.path.join(local_model_path, ranker)
 
     try:
         print("Loading Models...")
-        return stub.SetModels(sb.SetModelsRequest(llm=llm, embedder=embedder, ranker=ranker))
+        return get_shared_manager(stub, local_model_path).set_models(ModelSet(llm, embedder, ranker))
     except Exception as e:
         return e
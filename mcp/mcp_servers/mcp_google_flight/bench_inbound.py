@@ -0,0 +1,70 @@
+import asyncio
+import sys
+import time
+from unittest import mock
+
+import server
+
+# Benchmark: a round-trip search_flights_tool call against a fake SerpAPI backend that
+# answers every request after a fixed delay, with the inbound searches run one at a time
+# (as before) and concurrently.
+# Usage: python bench_inbound.py [num_outbound] [latency_seconds]
+
+def leg(flight_number, departure, arrival):
+    return {
+        "airline": "Fake Air",
+        "flight_number": flight_number,
+        "travel_class": "Economy",
+        "departure_airport": {"id": departure, "time": "2025-10-01 08:00"},
+        "arrival_airport": {"id": arrival, "time": "2025-10-01 11:00"},
+    }
+
+class LatencyGoogleSearch:
+    """Stands in for SessionGoogleSearch: answers after `latency` seconds"""
+    latency = 0.5
+    num_outbound = 5
+    calls = 0
+
+    def __init__(self, params):
+        self.params = params
+
+    def get_dict(self):
+        LatencyGoogleSearch.calls += 1
+        time.sleep(self.latency)
+        token = self.params.get("departure_token")
+        if token is None:
+            flights = [
+                {"flights": [leg(f"FA{i}", "JFK", "LAX")], "price": 100 + i, "departure_token": f"token{i}"}
+                for i in range(self.num_outbound)
+            ]
+        else:
+            flights = [
+                {"flights": [leg(f"{token}-R{j}", "LAX", "JFK")], "price": 200 + j, "type": "Round trip"}
+                for j in range(2)
+            ]
+        return {"best_flights": flights, "other_flights": []}
+
+def bench(name, concurrency, num_outbound):
+    server.search_cache.clear()
+    LatencyGoogleSearch.calls = 0
+    with mock.patch.object(server, "INBOUND_SEARCH_CONCURRENCY", concurrency):
+        start = time.perf_counter()
+        flights = asyncio.run(server.search_flights_tool(
+            "JFK", "LAX", "2025-10-01", "2025-10-08", max_num_outbound=num_outbound))
+        elapsed = time.perf_counter() - start
+    print(f"{name:<22} {elapsed * 1000:9.1f} ms {LatencyGoogleSearch.calls:3d} upstream calls {len(flights):3d} flights")
+    return flights
+
+def main():
+    num_outbound = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    LatencyGoogleSearch.latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    LatencyGoogleSearch.num_outbound = num_outbound
+    # Keep the per-request debug logging out of the timings
+    server.configure_logging(json_mode=True)
+    with mock.patch.object(server, "SessionGoogleSearch", LatencyGoogleSearch):
+        sequential = bench("sequential inbound", 1, num_outbound)
+        concurrent = bench("concurrent inbound", num_outbound, num_outbound)
+    assert sequential == concurrent
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+import urllib.request
+
+# Regenerates airports.tsv, the airport data bundled with the server, from the MIT licensed
+# airportsdata set (every airport with an IATA code, with its IANA timezone) and the ISO 3166
+# country names of the iso-codes project.
+# Usage: python build_airports.py [--airports airports.csv] [--countries iso_3166-1.json] [--output airports.tsv]
+
+AIRPORTS_URL = "https://raw.githubusercontent.com/mborsetti/airportsdata/main/airportsdata/airports.csv"
+COUNTRIES_URL = "https://salsa.debian.org/iso-codes-team/iso-codes/-/raw/main/data/iso_3166-1.json"
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+HEADER = ["code", "name", "city", "country", "timezone"]
+
+# Country names used by the original airport list, kept for continuity
+COUNTRY_NAMES = {"US": "USA", "GB": "UK"}
+
+def read_text(path, url):
+    """Read a local file, downloading it from url when it does not exist."""
+    if os.path.isfile(path):
+        with open(path, encoding="utf-8", newline="") as f:
+            return f.read()
+    print(f"Downloading {url}", file=sys.stderr)
+    with urllib.request.urlopen(url, timeout=60) as response:
+        return io.TextIOWrapper(response, encoding="utf-8", newline="").read()
+
+def read_airports(path):
+    return list(csv.DictReader(io.StringIO(read_text(path, AIRPORTS_URL))))
+
+def read_countries(path):
+    return json.loads(read_text(path, COUNTRIES_URL))["3166-1"]
+
+def clean(value):
+    return re.sub(r"\s+", " ", value or "").strip()
+
+def build_rows(airports, countries):
+    """
+    Select one airport per IATA code.
+
+    Args:
+        airports: Rows of airportsdata airports.csv
+        countries: Entries of iso-codes iso_3166-1.json
+
+    Returns:
+        airports.tsv rows, sorted by code
+    """
+    country_names = {
+        country["alpha_2"]: COUNTRY_NAMES.get(country["alpha_2"], country.get("common_name") or country["name"])
+        for country in countries
+    }
+    best = {}
+    for row in airports:
+        code = (row.get("iata") or "").strip().upper()
+        if not re.fullmatch(r"[A-Z]{3}", code) or code in best:
+            continue
+        best[code] = row
+    return [
+        [code, clean(row["name"]), clean(row.get("city")),
+         country_names.get(row.get("country"), clean(row.get("country"))), clean(row.get("tz"))]
+        for code, row in sorted(best.items())
+    ]
+
+def write_rows(rows, path):
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write("\t".join(HEADER) + "\n")
+        for row in rows:
+            f.write("\t".join(value.replace("\t", " ") for value in row) + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build airports.tsv from airportsdata and ISO 3166 data")
+    parser.add_argument("--airports", default="airports.csv", help="airportsdata airports.csv, downloaded if missing")
+    parser.add_argument("--countries", default="iso_3166-1.json", help="iso-codes iso_3166-1.json, downloaded if missing")
+    parser.add_argument("--output", default=os.path.join(SCRIPT_DIR, "airports.tsv"))
+    args = parser.parse_args()
+
+    rows = build_rows(read_airports(args.airports), read_countries(args.countries))
+    write_rows(rows, args.output)
+    print(f"Wrote {len(rows)} airports to {args.output}")
+
+if __name__ == "__main__":
+    main()
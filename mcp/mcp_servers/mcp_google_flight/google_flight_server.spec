@@ -1,12 +1,15 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+import os
+
 block_cipher = None
 
 a = Analysis(
     ['server.py'],
-    pathex=[],
+    # serpapi_upstream.py is shared with the other Google servers
+    pathex=[os.path.join(SPECPATH, '..', 'shared')],
     binaries=[],
-    datas=[],
+    datas=[('airports.tsv', '.')],
     hiddenimports=[
         'mcp.server.fastmcp',
         'fastapi',
@@ -32,6 +35,7 @@ a = Analysis(
         'rich.logging',
         'pydantic',
         'google-search-results',
+        'serpapi_upstream',
         # Add project-specific imports as needed
         # 'python_dotenv',     # For environment variables
     ],
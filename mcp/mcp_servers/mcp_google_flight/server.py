@@ -8,12 +8,20 @@ import socket
 import subprocess
 import json
 import logging
+import mmap
+import bisect
+import re
+import unicodedata
 from pathlib import Path
 from mcp.server.fastmcp import FastMCP
 from typing import List, Dict, Optional, Any
-from serpapi import GoogleSearch
 from rich.logging import RichHandler
 
+# The SerpAPI thread pool, session and search cache are shared with the other Google servers;
+# the .spec file bundles the module into the executable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+from serpapi_upstream import SessionGoogleSearch, SearchCache, upstream
+
 # Message templates
 SERVER_MESSAGES = {
     'server_start': 'google_flight MCP server starting' + (' on port {port}' if 'http' != 'stdio' else ''),
@@ -111,24 +119,264 @@ _server_loop = None
 _server_running = False
 _server_start_time = None
 
+search_cache = SearchCache()
+
+
+async def _search_upstream(params: Dict[str, Any]):
+    try:
+        logger.debug(
+            f"Sending SerpAPI request with params: {json.dumps({k: v for k, v in params.items() if k != 'api_key'}, indent=2)}"
+        )
+        result = await upstream.run(lambda: SessionGoogleSearch(params).get_dict())
+        logger.debug(f"SerpAPI response received, keys: {list(result.keys())}")
+        return result
+    except Exception as e:
+        logger.exception(f"SerpAPI search error: {str(e)}")
+        return {"error": str(e)}
+
+
 async def run_search(params: Dict[str, Any]):
     """
-    Run SerpAPI search asynchronously.
-    
+    Run SerpAPI search asynchronously, reusing recent results of the same search.
+
     Args:
         params: Parameters for the SerpAPI search
-        
+
     Returns:
         Search results from SerpAPI
     """
-    try:
-        logger.debug(f"Sending SerpAPI request with params: {json.dumps(params, indent=2)}")
-        result = await asyncio.to_thread(lambda: GoogleSearch(params).get_dict())
-        logger.debug(f"SerpAPI response received, keys: {list(result.keys())}")
-        return result
-    except Exception as e:
-        logger.exception(f"SerpAPI search error: {str(e)}")
-        return {"error": str(e)}
+    return await search_cache.get(params, _search_upstream)
+
+# Inbound flight searches of a round trip run at the same time, at most this many at once
+INBOUND_SEARCH_CONCURRENCY = int(os.getenv("INBOUND_SEARCH_CONCURRENCY", 4))
+
+async def run_searches(params_list: List[Optional[Dict[str, Any]]], limit: Optional[int] = None) -> List[Optional[Dict[str, Any]]]:
+    """
+    Run several SerpAPI searches concurrently.
+    
+    Args:
+        params_list: Parameters of each search; None entries are skipped
+        limit: Maximum number of searches running at once (default: INBOUND_SEARCH_CONCURRENCY)
+        
+    Returns:
+        The results in the order of params_list, None for skipped entries
+    """
+    semaphore = asyncio.Semaphore(max(1, limit or INBOUND_SEARCH_CONCURRENCY))
+
+    async def search(params):
+        if params is None:
+            return None
+        async with semaphore:
+            return await run_search(params)
+
+    return list(await asyncio.gather(*(search(params) for params in params_list)))
+
+# Airport data bundled with the server (regenerate it with build_airports.py): one line per
+# airport, tab separated, with a header line
+AIRPORTS_FILE = os.path.join(getattr(sys, "_MEIPASS", SCRIPT_DIR), "airports.tsv")
+AIRPORT_FIELDS = ("airport_code", "name", "city", "country", "timezone")
+
+# Used when airports.tsv is missing
+FALLBACK_AIRPORTS = {
+    "ATL": {"name": "Hartsfield-Jackson Atlanta International Airport", "city": "Atlanta", "country": "USA", "timezone": "America/New_York"},
+    "LAX": {"name": "Los Angeles International Airport", "city": "Los Angeles", "country": "USA", "timezone": "America/Los_Angeles"},
+    "ORD": {"name": "O'Hare International Airport", "city": "Chicago", "country": "USA", "timezone": "America/Chicago"},
+    "DFW": {"name": "Dallas/Fort Worth International Airport", "city": "Dallas", "country": "USA", "timezone": "America/Chicago"},
+    "JFK": {"name": "John F. Kennedy International Airport", "city": "New York", "country": "USA", "timezone": "America/New_York"},
+    "LGA": {"name": "LaGuardia Airport", "city": "New York", "country": "USA", "timezone": "America/New_York"},
+    "SFO": {"name": "San Francisco International Airport", "city": "San Francisco", "country": "USA", "timezone": "America/Los_Angeles"},
+    "LAS": {"name": "Harry Reid International Airport", "city": "Las Vegas", "country": "USA", "timezone": "America/Los_Angeles"},
+    "SEA": {"name": "Seattle-Tacoma International Airport", "city": "Seattle", "country": "USA", "timezone": "America/Los_Angeles"},
+    "MIA": {"name": "Miami International Airport", "city": "Miami", "country": "USA", "timezone": "America/New_York"},
+    "BOS": {"name": "Logan International Airport", "city": "Boston", "country": "USA", "timezone": "America/New_York"},
+    "MSP": {"name": "Minneapolis-Saint Paul International Airport", "city": "Minneapolis", "country": "USA", "timezone": "America/Chicago"},
+    "DEN": {"name": "Denver International Airport", "city": "Denver", "country": "USA", "timezone": "America/Denver"},
+    # International airports
+    "LHR": {"name": "Heathrow Airport", "city": "London", "country": "UK", "timezone": "Europe/London"},
+    "CDG": {"name": "Charles de Gaulle Airport", "city": "Paris", "country": "France", "timezone": "Europe/Paris"},
+    "FRA": {"name": "Frankfurt Airport", "city": "Frankfurt", "country": "Germany", "timezone": "Europe/Berlin"},
+    "NRT": {"name": "Narita International Airport", "city": "Tokyo", "country": "Japan", "timezone": "Asia/Tokyo"},
+    "ICN": {"name": "Incheon International Airport", "city": "Seoul", "country": "South Korea", "timezone": "Asia/Seoul"},
+    "SIN": {"name": "Singapore Changi Airport", "city": "Singapore", "country": "Singapore", "timezone": "Asia/Singapore"},
+    "HKG": {"name": "Hong Kong International Airport", "city": "Hong Kong", "country": "Hong Kong", "timezone": "Asia/Hong_Kong"},
+    "SYD": {"name": "Sydney Kingsford Smith Airport", "city": "Sydney", "country": "Australia", "timezone": "Australia/Sydney"},
+    "YVR": {"name": "Vancouver International Airport", "city": "Vancouver", "country": "Canada", "timezone": "America/Vancouver"},
+    "YYZ": {"name": "Toronto Pearson International Airport", "city": "Toronto", "country": "Canada", "timezone": "America/Toronto"}
+}
+
+# Minimum trigram similarity of a fuzzy airport match
+AIRPORT_FUZZY_THRESHOLD = 0.3
+
+
+def _fold(text: str) -> str:
+    """Lowercase text and strip accents, so "Sao Paulo" finds "São Paulo"."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"\w+", _fold(text))
+
+
+def _trigrams(term: str) -> set:
+    padded = f" {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AirportIndex:
+    """
+    Airport lookup by IATA code, city or airport name, over the bundled airports.tsv.
+
+    Nothing is read until the first lookup, which memory-maps the file and records the
+    offset of every line under its code; airports are decoded only when returned. The
+    search indexes are built on the first search: city names, a sorted word list for
+    prefix matches and trigram postings for misspelled names.
+
+    Args:
+        path: The airport data file (default: AIRPORTS_FILE)
+    """
+
+    def __init__(self, path: str = AIRPORTS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = None
+        self._offsets = None  # code -> offset of its line in _data
+        self._cities = None  # folded city name -> codes
+        self._words = None  # sorted (word, code) pairs of city and airport names
+        self._term_codes = None  # search term -> codes
+        self._term_sizes = None  # search term -> trigram count
+        self._postings = None  # trigram -> search terms
+
+    def _load(self) -> None:
+        if self._offsets is not None:
+            return
+        with self._lock:
+            if self._offsets is not None:
+                return
+            try:
+                with open(self.path, "rb") as f:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Airport data {self.path} not available ({e}), using the built-in airports")
+                lines = ["\t".join(AIRPORT_FIELDS)]
+                lines.extend(
+                    "\t".join([code] + [info[field] for field in AIRPORT_FIELDS[1:]])
+                    for code, info in sorted(FALLBACK_AIRPORTS.items())
+                )
+                data = ("\n".join(lines) + "\n").encode("utf-8")
+            offsets = {}
+            # Skip the header line
+            pos = data.find(b"\n") + 1
+            while 0 < pos < len(data):
+                end = data.find(b"\n", pos)
+                if end == -1:
+                    end = len(data)
+                tab = data.find(b"\t", pos, end)
+                if tab != -1:
+                    offsets[data[pos:tab].decode("ascii")] = pos
+                pos = end + 1
+            self._data = data
+            self._offsets = offsets
+
+    def _record(self, offset: int) -> Dict[str, str]:
+        end = self._data.find(b"\n", offset)
+        line = self._data[offset:end if end != -1 else len(self._data)].decode("utf-8").rstrip("\r")
+        return dict(zip(AIRPORT_FIELDS, line.split("\t")))
+
+    def __len__(self) -> int:
+        self._load()
+        return len(self._offsets)
+
+    def get(self, code: str) -> Optional[Dict[str, str]]:
+        """Return the airport with an IATA code, or None."""
+        self._load()
+        offset = self._offsets.get(code.strip().upper())
+        return self._record(offset) if offset is not None else None
+
+    def _build_search(self) -> None:
+        self._load()
+        with self._lock:
+            if self._postings is not None:
+                return
+            cities = {}
+            words = set()
+            term_codes = {}
+            for code, offset in self._offsets.items():
+                airport = self._record(offset)
+                city = " ".join(_words(airport.get("city", "")))
+                name_words = _words(airport.get("name", ""))
+                if city:
+                    cities.setdefault(city, []).append(code)
+                for word in _words(airport.get("city", "")) + name_words:
+                    words.add((word, code))
+                for term in [city] + [word for word in name_words if len(word) > 3]:
+                    if term:
+                        term_codes.setdefault(term, set()).add(code)
+            postings = {}
+            for term in term_codes:
+                for trigram in _trigrams(term):
+                    postings.setdefault(trigram, []).append(term)
+            self._cities = cities
+            self._words = sorted(words)
+            self._term_codes = term_codes
+            self._term_sizes = {term: len(_trigrams(term)) for term in term_codes}
+            self._postings = postings
+
+    def _prefix_codes(self, word: str) -> set:
+        codes = set()
+        i = bisect.bisect_left(self._words, (word, ""))
+        while i < len(self._words) and self._words[i][0].startswith(word):
+            codes.add(self._words[i][1])
+            i += 1
+        return codes
+
+    def search(self, query: str, limit: int = 5) -> List[Dict[str, str]]:
+        """
+        Find airports by IATA code, city or airport name.
+
+        Exact codes rank first, then airports in a city of that name, then airports whose
+        city or name has words starting with every query word, then similar spellings.
+
+        Args:
+            query: A code, city or airport name, e.g. "Chicago" or "heathrow"
+            limit: Maximum number of airports returned (default: 5)
+
+        Returns:
+            The matching airports, best first
+        """
+        self._build_search()
+        query_words = _words(query)
+        if not query_words:
+            return []
+        scores = {}
+
+        def rank(codes, score):
+            for code in codes:
+                if score > scores.get(code, 0):
+                    scores[code] = score
+
+        if len(query_words) == 1 and query_words[0].upper() in self._offsets:
+            rank([query_words[0].upper()], 4)
+        rank(self._cities.get(" ".join(query_words), []), 3)
+        prefix_matches = set.intersection(*(self._prefix_codes(word) for word in query_words))
+        rank(prefix_matches, 2)
+        if len(scores) < limit:
+            query_trigrams = _trigrams(" ".join(query_words))
+            shared = {}
+            for trigram in query_trigrams:
+                for term in self._postings.get(trigram, ()):
+                    shared[term] = shared.get(term, 0) + 1
+            for term, count in shared.items():
+                similarity = count / (len(query_trigrams) + self._term_sizes[term] - count)
+                if similarity >= AIRPORT_FUZZY_THRESHOLD:
+                    rank(self._term_codes[term], similarity)
+
+        best = sorted(scores, key=lambda code: (-scores[code], code))[:limit]
+        return [self._record(self._offsets[code]) for code in best]
+
+
+airport_index = AirportIndex()
+
 
 #### Server Tools ####
 
@@ -195,9 +443,20 @@ async def search_flights_tool(origin: str, destination: str, outbound_date: str,
         logger.warning("No flights found for outbound")
         return []
     
+    # For round trips, the return flights of every outbound option are searched at once, each
+    # search with its own copy of params; the results come back in outbound order
+    inbound_searches = [
+        {**params, "departure_token": flight["departure_token"]}
+        if params["type"] == 1 and flight.get("flights") and "departure_token" in flight else None
+        for flight in best_outbound
+    ]
+    if any(inbound_searches):
+        logger.debug(f"Searching inbound flights for {sum(1 for p in inbound_searches if p)} outbound flights...")
+    all_inbound_results = await run_searches(inbound_searches)
+
     # Format flight data
     formatted_flights = []
-    for i, flight in enumerate(best_outbound):
+    for i, (flight, inbound_results) in enumerate(zip(best_outbound, all_inbound_results)):
         logger.debug(f"Processing outbound flight {i+1} of {len(best_outbound)}")
         if not flight.get("flights") or len(flight["flights"]) == 0:
             logger.debug(f"Skipping outbound flight {i+1} as it has no flight segments")
@@ -226,13 +485,8 @@ async def search_flights_tool(origin: str, destination: str, outbound_date: str,
         else:
             stop = stop + f"Outbound {num_outbound_stop} stops, "
             
-        # if it is round trip, we need to get the return flights based on departure_token
-        if params["type"] == 1 and "departure_token" in flight:                     
-            # Execute search            
-            logger.debug(f"Searching inbound flights for outbound flight {i+1}...")
-            params["departure_token"] = flight["departure_token"]   
-            inbound_results = await run_search(params)
-            
+        # if it is round trip, the return flights were searched based on departure_token
+        if inbound_results is not None:
             # Check for errors
             if "error" in inbound_results:
                 logger.error(f"Inbound flight search for outbound flight {i+1} got error: {inbound_results['error']}")
@@ -308,47 +562,43 @@ async def get_airport_info(airport_code: str) -> dict:
     """
     logger.info(f"Getting airport info for: {airport_code}")
     
-    # Common airport codes mapping
-    airports = {
-        "ATL": {"name": "Hartsfield-Jackson Atlanta International Airport", "city": "Atlanta", "country": "USA", "timezone": "EST"},
-        "LAX": {"name": "Los Angeles International Airport", "city": "Los Angeles", "country": "USA", "timezone": "PST"},
-        "ORD": {"name": "O'Hare International Airport", "city": "Chicago", "country": "USA", "timezone": "CST"},
-        "DFW": {"name": "Dallas/Fort Worth International Airport", "city": "Dallas", "country": "USA", "timezone": "CST"},
-        "JFK": {"name": "John F. Kennedy International Airport", "city": "New York", "country": "USA", "timezone": "EST"},
-        "LGA": {"name": "LaGuardia Airport", "city": "New York", "country": "USA", "timezone": "EST"},
-        "SFO": {"name": "San Francisco International Airport", "city": "San Francisco", "country": "USA", "timezone": "PST"},
-        "LAS": {"name": "McCarran International Airport", "city": "Las Vegas", "country": "USA", "timezone": "PST"},
-        "SEA": {"name": "Seattle-Tacoma International Airport", "city": "Seattle", "country": "USA", "timezone": "PST"},
-        "MIA": {"name": "Miami International Airport", "city": "Miami", "country": "USA", "timezone": "EST"},
-        "BOS": {"name": "Logan International Airport", "city": "Boston", "country": "USA", "timezone": "EST"},
-        "MSP": {"name": "Minneapolis-Saint Paul International Airport", "city": "Minneapolis", "country": "USA", "timezone": "CST"},
-        "DEN": {"name": "Denver International Airport", "city": "Denver", "country": "USA", "timezone": "MST"},
-        # International airports
-        "LHR": {"name": "Heathrow Airport", "city": "London", "country": "UK", "timezone": "GMT"},
-        "CDG": {"name": "Charles de Gaulle Airport", "city": "Paris", "country": "France", "timezone": "CET"},
-        "FRA": {"name": "Frankfurt Airport", "city": "Frankfurt", "country": "Germany", "timezone": "CET"},
-        "NRT": {"name": "Narita International Airport", "city": "Tokyo", "country": "Japan", "timezone": "JST"},
-        "ICN": {"name": "Incheon International Airport", "city": "Seoul", "country": "South Korea", "timezone": "KST"},
-        "SIN": {"name": "Singapore Changi Airport", "city": "Singapore", "country": "Singapore", "timezone": "SGT"},
-        "HKG": {"name": "Hong Kong International Airport", "city": "Hong Kong", "country": "Hong Kong", "timezone": "HKT"},
-        "SYD": {"name": "Sydney Kingsford Smith Airport", "city": "Sydney", "country": "Australia", "timezone": "AEST"},
-        "YVR": {"name": "Vancouver International Airport", "city": "Vancouver", "country": "Canada", "timezone": "PST"},
-        "YYZ": {"name": "Toronto Pearson International Airport", "city": "Toronto", "country": "Canada", "timezone": "EST"}
-    }
-    
     code = airport_code.upper().strip()
-    if code in airports:
-        return {
-            "airport_code": code,
-            **airports[code]
-        }
+    airport = airport_index.get(code)
+    if airport is not None:
+        return airport
     else:
         return {
             "airport_code": code,
             "error": "Airport code not found in database",
-            "suggestion": "Please verify the IATA airport code is correct"
+            "suggestion": "Please verify the IATA airport code is correct, or find it with search_airports"
         }
 
+async def search_airports(query: str, limit: Optional[int] = 5) -> dict:
+    """
+    Find airports by city or airport name.
+    
+    This MCP tool allows AI models to resolve a city or airport name, even misspelled,
+    to IATA airport codes, e.g. "Chicago" to ORD and MDW.
+    
+    Args:
+        query: City name, airport name or IATA code (e.g., Chicago, Heathrow)
+        limit: Maximum number of airports to return (default: 5)
+        
+    Returns:
+        dict: The matching airports with code, name, city, country
+    """
+    logger.info(f"Searching airports for: {query}")
+    
+    airports = airport_index.search(query, limit or 5)
+    if not airports:
+        return {
+            "query": query,
+            "airports": [],
+            "error": "No airport found",
+            "suggestion": "Please try the city name in English"
+        }
+    return {"query": query, "airports": airports}
+
 async def get_travel_classes() -> dict:
     """
     Get available travel classes and their descriptions.
@@ -432,11 +682,28 @@ async def validate_date_format(date_string: str) -> dict:
             "example": "2024-12-25"
         }
 
+async def get_search_stats() -> dict:
+    """
+    Get the SerpAPI usage of this server.
+
+    This MCP tool reports how searches reach SerpAPI: the upstream queue (calls queued,
+    running, completed and rejected, average and maximum queue wait in seconds) and the
+    search cache (hits, misses, coalesced searches, cached and in-flight searches).
+
+    Returns:
+        dict: Upstream queue and search cache statistics
+    """
+    logger.info("Getting search statistics")
+    return {"upstream": upstream.stats(), "search_cache": search_cache.stats()}
+
 #### Tool Registration ####
 
 # List of all tool functions to register
 TOOL_FUNCTIONS = [
     search_flights_tool,
+    get_airport_info,
+    search_airports,
+    get_search_stats,
     # Add additional tool functions here
 ]
 
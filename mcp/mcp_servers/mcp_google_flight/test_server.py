@@ -1,4 +1,5 @@
 import unittest
+import asyncio
 import os
 import sys
 import json
@@ -6,6 +7,9 @@ import time
 import subprocess
 import signal
 from pathlib import Path
+from unittest import mock
+
+ENGINE = "google_flights"
 
 class TestGoogle_flightServer(unittest.TestCase):
     @classmethod
@@ -101,5 +105,206 @@ class TestGoogle_flightServer(unittest.TestCase):
         except json.JSONDecodeError as e:
             self.fail(f"Could not parse JSON from output: {output}\nError: {e}")
 
+
+class FakeGoogleSearch:
+    """Stands in for SessionGoogleSearch, counting the upstream calls"""
+    calls = []
+    delay = 0.2
+    result = {"search_metadata": {"status": "Success"}}
+
+    def __init__(self, params):
+        self.params = params
+
+    def get_dict(self):
+        FakeGoogleSearch.calls.append(self.params)
+        time.sleep(FakeGoogleSearch.delay)
+        if self.params.get("q") == "fail":
+            return {"error": "Invalid query"}
+        return dict(FakeGoogleSearch.result)
+
+
+class TestSearchCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        import server
+        self.server = server
+        FakeGoogleSearch.calls = []
+        patcher = mock.patch.object(server, "SessionGoogleSearch", FakeGoogleSearch)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = server.SearchCache(ttl={ENGINE: 60}, max_entries=2)
+        patcher = mock.patch.object(server, "search_cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _params(self, q="a", api_key="key1"):
+        return {"api_key": api_key, "engine": ENGINE, "q": q, "hl": "en"}
+
+    async def test_repeated_search_hits_cache(self):
+        first = await self.server.run_search(self._params())
+        # Same search, other key order and API key
+        params = dict(reversed(list(self._params(api_key="key2").items())))
+        second = await self.server.run_search(params)
+        self.assertIs(first, second)
+        self.assertEqual(len(FakeGoogleSearch.calls), 1)
+        self.assertEqual(self.cache.hits, 1)
+
+    async def test_concurrent_searches_coalesce(self):
+        results = await asyncio.gather(*(self.server.run_search(self._params()) for _ in range(5)))
+        self.assertEqual(len(FakeGoogleSearch.calls), 1)
+        self.assertEqual(self.cache.coalesced, 4)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    async def test_errors_not_cached(self):
+        await self.server.run_search(self._params(q="fail"))
+        result = await self.server.run_search(self._params(q="fail"))
+        self.assertIn("error", result)
+        self.assertEqual(len(FakeGoogleSearch.calls), 2)
+
+    async def test_expiry_and_eviction(self):
+        await self.server.run_search(self._params(q="a"))
+        await self.server.run_search(self._params(q="b"))
+        await self.server.run_search(self._params(q="c"))
+        # "a" was evicted to keep two entries
+        await self.server.run_search(self._params(q="a"))
+        self.assertEqual(len(FakeGoogleSearch.calls), 4)
+        with mock.patch.object(self.server.time, "monotonic", return_value=time.monotonic() + 61):
+            await self.server.run_search(self._params(q="a"))
+        self.assertEqual(len(FakeGoogleSearch.calls), 5)
+
+    async def test_round_trip_inbound_searches_concurrent(self):
+        def leg(number):
+            return {"airline": "Fake Air", "flight_number": number, "travel_class": "Economy",
+                    "departure_airport": {"id": "JFK", "time": "2025-10-01 08:00"},
+                    "arrival_airport": {"id": "LAX", "time": "2025-10-01 11:00"}}
+
+        def get_dict(search):
+            FakeGoogleSearch.calls.append(search.params)
+            token = search.params.get("departure_token")
+            # Later inbound searches answer first
+            time.sleep(0.3 if token is None else 0.5 - 0.1 * int(token[-1]))
+            if token is None:
+                flights = [{"flights": [leg(f"FA{i}")], "price": 100, "departure_token": f"t{i}"} for i in range(3)]
+            else:
+                flights = [{"flights": [leg(f"{token}R")], "type": "Round trip"}]
+            return {"best_flights": flights}
+
+        with mock.patch.object(FakeGoogleSearch, "get_dict", get_dict):
+            start = time.monotonic()
+            flights = await self.server.search_flights_tool("JFK", "LAX", "2025-10-01", "2025-10-08", max_num_outbound=3)
+            elapsed = time.monotonic() - start
+        # Merged in outbound order whatever order the inbound searches finished in
+        self.assertEqual(len(flights), 3)
+        for i, flight in enumerate(flights):
+            self.assertIn(f"Outbound: Fake Air FA{i},", flight["segments"])
+            self.assertIn(f"Inbound: Fake Air t{i}R,", flight["segments"])
+        self.assertEqual(len(FakeGoogleSearch.calls), 4)
+        self.assertEqual(len({params.get("departure_token") for params in FakeGoogleSearch.calls}), 4)
+        # One outbound round trip plus the slowest inbound search, not the sum of all of them
+        self.assertLess(elapsed, 1.2)
+
+
+class TestUpstreamClient(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        import server
+        import serpapi_upstream
+        self.server = server
+        self.upstream = serpapi_upstream
+        self.client = serpapi_upstream.UpstreamClient(max_workers=2, max_queue=2)
+        self.addCleanup(self.client.close)
+
+    async def test_concurrency_limit_and_queue(self):
+        active = []
+        peak = []
+
+        def call():
+            active.append(1)
+            peak.append(len(active))
+            time.sleep(0.2)
+            active.pop()
+            return "ok"
+
+        calls = [asyncio.ensure_future(self.client.run(call)) for _ in range(4)]
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.client.stats()["queued"], 2)
+        # Two running and two queued: a fifth call is turned away
+        with self.assertRaises(self.upstream.UpstreamBusyError):
+            await self.client.run(call)
+        self.assertEqual(await asyncio.gather(*calls), ["ok"] * 4)
+        self.assertEqual(max(peak), 2)
+        stats = self.client.stats()
+        self.assertEqual((stats["queued"], stats["running"], stats["completed"], stats["rejected"]), (0, 0, 4, 1))
+        self.assertGreater(stats["max_wait"], 0.1)
+
+    async def test_search_stats_tool(self):
+        with mock.patch.object(self.server, "upstream", self.client), \
+                mock.patch.object(self.server, "search_cache", self.server.SearchCache()):
+            await self.client.run(lambda: "ok")
+            stats = await self.server.get_search_stats()
+        self.assertEqual(stats["upstream"]["completed"], 1)
+        self.assertEqual(stats["search_cache"], {"hits": 0, "misses": 0, "coalesced": 0, "entries": 0, "in_flight": 0})
+        self.assertIn(self.server.get_search_stats, self.server.TOOL_FUNCTIONS)
+
+    async def test_busy_error_not_cached(self):
+        with mock.patch.object(self.server, "upstream", self.client), \
+                mock.patch.object(self.client, "run", side_effect=self.upstream.UpstreamBusyError("busy")), \
+                mock.patch.object(self.server, "search_cache", self.server.SearchCache()):
+            result = await self.server.run_search({"engine": ENGINE, "q": "a"})
+            self.assertEqual(result, {"error": "busy"})
+            self.assertEqual(len(self.server.search_cache._entries), 0)
+
+
+class TestAirportIndex(unittest.TestCase):
+    def setUp(self):
+        import server
+        self.server = server
+        self.index = server.AirportIndex()
+
+    def test_code_lookup(self):
+        airport = self.index.get(" lax ")
+        self.assertEqual(airport["airport_code"], "LAX")
+        self.assertEqual(airport["city"], "Los Angeles")
+        self.assertIsNone(self.index.get("XXX"))
+        self.assertGreaterEqual(len(self.index), len(self.server.FALLBACK_AIRPORTS))
+
+    def test_city_and_name_search(self):
+        # Airports in the city come first, then those only named after it (e.g. GYY, Gary/Chicago)
+        self.assertEqual([a["airport_code"] for a in self.index.search("Chicago")][:2], ["MDW", "ORD"])
+        self.assertEqual(self.index.search("heathrow")[0]["airport_code"], "LHR")
+        # Word prefixes, accents and codes
+        self.assertIn("SFO", [a["airport_code"] for a in self.index.search("san fran")])
+        self.assertIn("GRU", [a["airport_code"] for a in self.index.search("São Paulo")])
+        self.assertEqual(self.index.search("jfk")[0]["airport_code"], "JFK")
+        self.assertEqual(self.index.search("?"), [])
+
+    def test_fuzzy_search(self):
+        self.assertLessEqual({"MDW", "ORD"}, {a["airport_code"] for a in self.index.search("Chicgo")})
+        self.assertIn("FRA", [a["airport_code"] for a in self.index.search("Frankfrt")])
+
+    def test_missing_file_falls_back(self):
+        index = self.server.AirportIndex(os.path.join(os.path.dirname(os.path.abspath(__file__)), "missing.tsv"))
+        self.assertEqual(len(index), len(self.server.FALLBACK_AIRPORTS))
+        self.assertEqual(index.get("ORD")["city"], "Chicago")
+        self.assertEqual(index.search("Tokyo")[0]["airport_code"], "NRT")
+
+    def test_build_rows(self):
+        from build_airports import build_rows
+        airports = [
+            {"iata": "ORD", "name": "Chicago O'Hare International Airport", "city": "Chicago", "country": "US", "tz": "America/Chicago"},
+            {"iata": "ORD", "name": "Duplicate", "city": "Chicago", "country": "US", "tz": "America/Chicago"},
+            {"iata": "", "name": "No Code", "city": "Nowhere", "country": "US", "tz": "America/Denver"},
+            {"iata": "LHR", "name": "London Heathrow  Airport", "city": "London", "country": "GB", "tz": "Europe/London"},
+            {"iata": "ICN", "name": "Incheon International Airport", "city": "Seoul", "country": "KR", "tz": "Asia/Seoul"},
+        ]
+        countries = [
+            {"alpha_2": "US", "name": "United States"}, {"alpha_2": "GB", "name": "United Kingdom"},
+            {"alpha_2": "KR", "name": "Korea, Republic of", "common_name": "South Korea"},
+        ]
+        self.assertEqual(build_rows(airports, countries), [
+            ["ICN", "Incheon International Airport", "Seoul", "South Korea", "Asia/Seoul"],
+            ["LHR", "London Heathrow Airport", "London", "UK", "Europe/London"],
+            ["ORD", "Chicago O'Hare International Airport", "Chicago", "USA", "America/Chicago"],
+        ])
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
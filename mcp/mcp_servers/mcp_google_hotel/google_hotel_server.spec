@@ -1,10 +1,13 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+import os
+
 block_cipher = None
 
 a = Analysis(
     ['server.py'],
-    pathex=[],
+    # serpapi_upstream.py is shared with the other Google servers
+    pathex=[os.path.join(SPECPATH, '..', 'shared')],
     binaries=[],
     datas=[],
     hiddenimports=[
@@ -33,6 +36,7 @@ a = Analysis(
         'pydantic',
         'psutil',
         'google-search-results',
+        'serpapi_upstream',
         # Add project-specific imports as needed
         # 'python_dotenv',     # For environment variables
     ],
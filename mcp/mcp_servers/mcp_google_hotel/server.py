@@ -11,9 +11,13 @@ import logging
 from pathlib import Path
 from mcp.server.fastmcp import FastMCP
 from typing import List, Dict, Optional, Any
-from serpapi import GoogleSearch
 from rich.logging import RichHandler
 
+# The SerpAPI thread pool, session and search cache are shared with the other Google servers;
+# the .spec file bundles the module into the executable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+from serpapi_upstream import SessionGoogleSearch, SearchCache, upstream
+
 # Message templates
 SERVER_MESSAGES = {
     'server_start': 'google_hotel MCP server starting' + (' on port {port}' if 'http' != 'stdio' else ''),
@@ -108,21 +112,15 @@ _server_start_time = None
 
 #### Utility Functions ####
 
-async def run_search(params: Dict[str, Any]):
-    """
-    Run SerpAPI search asynchronously.
+search_cache = SearchCache()
 
-    Args:
-        params: Parameters for the SerpAPI search
 
-    Returns:
-        Search results from SerpAPI
-    """
+async def _search_upstream(params: Dict[str, Any]):
     try:
         logger.debug(
-            f"Sending SerpAPI request with params: {json.dumps(params, indent=2)}"
+            f"Sending SerpAPI request with params: {json.dumps({k: v for k, v in params.items() if k != 'api_key'}, indent=2)}"
         )
-        result = await asyncio.to_thread(lambda: GoogleSearch(params).get_dict())
+        result = await upstream.run(lambda: SessionGoogleSearch(params).get_dict())
         logger.debug(f"SerpAPI response received, keys: {list(result.keys())}")
         return result
     except Exception as e:
@@ -130,6 +128,19 @@ async def run_search(params: Dict[str, Any]):
         return {"error": str(e)}
 
 
+async def run_search(params: Dict[str, Any]):
+    """
+    Run SerpAPI search asynchronously, reusing recent results of the same search.
+
+    Args:
+        params: Parameters for the SerpAPI search
+
+    Returns:
+        Search results from SerpAPI
+    """
+    return await search_cache.get(params, _search_upstream)
+
+
 def prepare_hotels_search_params(
     city: str,
     check_in_date: str,
@@ -212,6 +223,107 @@ def prepare_hotel_property_search_params(
 
     return params
 
+# Hotels returned by search_hotel_tool
+MAX_HOTEL_RESULTS = 3
+# Property lookups in flight at once
+HOTEL_LOOKUP_CONCURRENCY = int(os.getenv("HOTEL_LOOKUP_CONCURRENCY", 6))
+# Extra lookups started ahead once a candidate turned out to have no address, so the next
+# replacement is usually already on its way; every lookup costs API quota
+HOTEL_LOOKUP_MARGIN = int(os.getenv("HOTEL_LOOKUP_MARGIN", 1))
+
+
+async def lookup_hotel_properties(
+    hotels: List[Dict[str, Any]],
+    check_in_date: str,
+    check_out_date: str,
+    adults: Optional[int] = 1,
+    children: Optional[int] = 0,
+    hotel_class: Optional[int] = 4,
+    needed: int = MAX_HOTEL_RESULTS,
+    concurrency: Optional[int] = None,
+    margin: Optional[int] = None,
+) -> List[tuple]:
+    """
+    Look up the property details of hotels until enough of them have an address.
+
+    Lookups start in ranking order, only as many at once as hotels are still missing, so when
+    the best candidates all have an address no lookup is wasted. Once a candidate turns out to
+    have no address, `margin` more lookups run ahead to replace the next miss. When the first
+    `needed` hotels with an address are known, the remaining lookups are cancelled.
+
+    Args:
+        hotels: Hotels from a hotel search, best first
+        check_in_date: Check in date (YYYY-MM-DD)
+        check_out_date: Check out date (YYYY-MM-DD)
+        adults: Number of adult passengers (default: 1)
+        children: Number of children passengers (default: 0)
+        hotel_class: defines to include only certain hotel class in the results (default: 4)
+        needed: Number of hotels to return (default: MAX_HOTEL_RESULTS)
+        concurrency: Maximum lookups running at once (default: HOTEL_LOOKUP_CONCURRENCY)
+        margin: Extra lookups after the first miss (default: HOTEL_LOOKUP_MARGIN)
+
+    Returns:
+        (hotel, property results) pairs in ranking order
+    """
+    candidates = []
+    for i, hotel in enumerate(hotels):
+        if not hotel.get("name"):
+            logger.debug(f"Skipping hotel {i+1} as it has no hotel name")
+            continue
+        candidates.append(hotel)
+
+    concurrency = max(1, concurrency or HOTEL_LOOKUP_CONCURRENCY)
+    margin = HOTEL_LOOKUP_MARGIN if margin is None else max(0, margin)
+    missed = False
+    found = []
+    finished = {}  # candidate index -> property results
+    running = {}  # lookup task -> candidate index
+    next_candidate = 0
+    checked = 0  # candidates before this index have been checked, in order
+    try:
+        while len(found) < needed and checked < len(candidates):
+            # Lookups started but not checked yet, against the hotels still missing
+            ahead = min(concurrency, needed - len(found) + (margin if missed else 0))
+            while next_candidate - checked < ahead and next_candidate < len(candidates):
+                hotel_name = str(candidates[next_candidate].get("name"))
+                property_params = prepare_hotel_property_search_params(
+                    hotel_name, check_in_date, check_out_date, adults, children, hotel_class
+                )
+                logger.debug(f"Executing SerpAPI search for hotel {hotel_name}...")
+                running[asyncio.ensure_future(run_search(property_params))] = next_candidate
+                next_candidate += 1
+
+            done, _pending = await asyncio.wait(
+                running, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                finished[running.pop(task)] = task.result()
+
+            # Accept hotels in ranking order, so the result does not depend on which lookup answered first
+            while checked in finished and len(found) < needed:
+                hotel = candidates[checked]
+                hotel_name = str(hotel.get("name"))
+                property_results = finished.pop(checked)
+                checked += 1
+                if "error" in property_results:
+                    logger.error(
+                        f"Search hotel {hotel_name} got error: {property_results['error']}"
+                    )
+                    missed = True
+                elif "address" not in property_results:
+                    logger.debug(f"Skip hotel {hotel_name} since it has no address")
+                    missed = True
+                else:
+                    found.append((hotel, property_results))
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            logger.debug(f"Cancelled {len(running)} hotel lookups no longer needed")
+
+    return found
+
+
 #### Server Tools ####
 
 async def search_hotel_tool(
@@ -268,47 +380,20 @@ async def search_hotel_tool(
         logger.warning("No hotels found in search results")
         return []
 
+    # Look up the property details of the best hotels, concurrently
+    found = await lookup_hotel_properties(
+        best_hotels, check_in_date, check_out_date, adults, children, hotel_class
+    )
+
     # Format hotel data
     formatted_hotels = []
-    num_valid = 0
-    for i, hotel in enumerate(best_hotels):
-        if num_valid > 2:
-            break
-        logger.debug(f"Processing hotel {i+1} of {len(best_hotels)}")
-        if not hotel.get("name"):
-            logger.debug(f"Skipping hotel {i+1} as it has no hotel name")
-            continue
-
-        hotel_name = str(hotel.get("name"))
-        # search address based on hotel_name
-        property_params = prepare_hotel_property_search_params(
-            hotel_name, check_in_date, check_out_date, adults, children, hotel_class
-        )
-
-        # Execute search
-        logger.debug(f"Executing SerpAPI search for hotel {hotel_name}...")
-        property_results = await run_search(property_params)
-        # Check for errors
-        if "error" in property_results:
-            logger.error(
-                f"Search hotel {hotel_name} got error: {property_results['error']}"
-            )
-            continue
-
-        if "address" not in property_results:
-            logger.debug(f"Skip hotel {hotel_name} since it has no address")
-            continue
-
+    for hotel, property_results in found:
         rate_per_night = property_results.get("rate_per_night", {})
-        total_rate = hotel.get("total_rate", {})
-
-        link = str(property_results.get("link", "N/A"))
-        print(f"@@@@link: {link}")
 
         # Add formatted hotels to results
         formatted_hotels.append(
             {
-                "name": hotel_name,
+                "name": str(hotel.get("name")),
                 "address": str(property_results.get("address", "N/A")),
                 "hotel_class": str(hotel.get("hotel_class", "N/A")),
                 "rate_per_night": str(rate_per_night.get("lowest", "N/A")),
@@ -318,16 +403,30 @@ async def search_hotel_tool(
                 # "check_out_time": str(hotel.get("check_out_time", "N/A"))
             }
         )
-        num_valid += 1
 
     logger.info(f"Returning {len(formatted_hotels)} formatted hotels")
     return formatted_hotels
 
+async def get_search_stats() -> dict:
+    """
+    Get the SerpAPI usage of this server.
+
+    This MCP tool reports how searches reach SerpAPI: the upstream queue (calls queued,
+    running, completed and rejected, average and maximum queue wait in seconds) and the
+    search cache (hits, misses, coalesced searches, cached and in-flight searches).
+
+    Returns:
+        dict: Upstream queue and search cache statistics
+    """
+    logger.info("Getting search statistics")
+    return {"upstream": upstream.stats(), "search_cache": search_cache.stats()}
+
 #### Tool Registration ####
 
 # List of all tool functions to register
 TOOL_FUNCTIONS = [
     search_hotel_tool,
+    get_search_stats,
     # Add additional tool functions here
 ]
 
@@ -1,4 +1,5 @@
 import unittest
+import asyncio
 import os
 import sys
 import json
@@ -6,6 +7,9 @@ import time
 import subprocess
 import signal
 from pathlib import Path
+from unittest import mock
+
+ENGINE = "google_hotels"
 
 class TestGoogle_hotelServer(unittest.TestCase):
     @classmethod
@@ -101,5 +105,192 @@ class TestGoogle_hotelServer(unittest.TestCase):
         except json.JSONDecodeError as e:
             self.fail(f"Could not parse JSON from output: {output}\nError: {e}")
 
+
+class FakeGoogleSearch:
+    """Stands in for SessionGoogleSearch, counting the upstream calls"""
+    calls = []
+    delay = 0.2
+    result = {"search_metadata": {"status": "Success"}}
+
+    def __init__(self, params):
+        self.params = params
+
+    def get_dict(self):
+        FakeGoogleSearch.calls.append(self.params)
+        time.sleep(FakeGoogleSearch.delay)
+        if self.params.get("q") == "fail":
+            return {"error": "Invalid query"}
+        return dict(FakeGoogleSearch.result)
+
+
+class TestSearchCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        import server
+        self.server = server
+        FakeGoogleSearch.calls = []
+        patcher = mock.patch.object(server, "SessionGoogleSearch", FakeGoogleSearch)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = server.SearchCache(ttl={ENGINE: 60}, max_entries=2)
+        patcher = mock.patch.object(server, "search_cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _params(self, q="a", api_key="key1"):
+        return {"api_key": api_key, "engine": ENGINE, "q": q, "hl": "en"}
+
+    async def test_repeated_search_hits_cache(self):
+        first = await self.server.run_search(self._params())
+        # Same search, other key order and API key
+        params = dict(reversed(list(self._params(api_key="key2").items())))
+        second = await self.server.run_search(params)
+        self.assertIs(first, second)
+        self.assertEqual(len(FakeGoogleSearch.calls), 1)
+        self.assertEqual(self.cache.hits, 1)
+
+    async def test_concurrent_searches_coalesce(self):
+        results = await asyncio.gather(*(self.server.run_search(self._params()) for _ in range(5)))
+        self.assertEqual(len(FakeGoogleSearch.calls), 1)
+        self.assertEqual(self.cache.coalesced, 4)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    async def test_errors_not_cached(self):
+        await self.server.run_search(self._params(q="fail"))
+        result = await self.server.run_search(self._params(q="fail"))
+        self.assertIn("error", result)
+        self.assertEqual(len(FakeGoogleSearch.calls), 2)
+
+    async def test_expiry_and_eviction(self):
+        await self.server.run_search(self._params(q="a"))
+        await self.server.run_search(self._params(q="b"))
+        await self.server.run_search(self._params(q="c"))
+        # "a" was evicted to keep two entries
+        await self.server.run_search(self._params(q="a"))
+        self.assertEqual(len(FakeGoogleSearch.calls), 4)
+        with mock.patch.object(self.server.time, "monotonic", return_value=time.monotonic() + 61):
+            await self.server.run_search(self._params(q="a"))
+        self.assertEqual(len(FakeGoogleSearch.calls), 5)
+
+    async def test_property_lookups_concurrent(self):
+        names = [f"Hotel {i}" for i in range(10)]
+
+        def get_dict(search):
+            FakeGoogleSearch.calls.append(search.params)
+            query = search.params["q"]
+            if query not in names:
+                time.sleep(0.2)
+                return {"properties": [{"name": name, "hotel_class": "4-star hotel"} for name in names] + [{}]}
+            i = names.index(query)
+            # Later hotels answer first; Hotel 1 has no address
+            time.sleep(0.5 - 0.05 * i)
+            if i == 1:
+                return {"name": query}
+            return {"name": query, "address": f"{i} Main St", "rate_per_night": {"lowest": "$100"}}
+
+        with mock.patch.object(FakeGoogleSearch, "get_dict", get_dict), \
+                mock.patch.object(self.server, "HOTEL_LOOKUP_MARGIN", 1):
+            start = time.monotonic()
+            hotels = await self.server.search_hotel_tool("Boston", "2025-10-01", "2025-10-03")
+            elapsed = time.monotonic() - start
+        # The first three hotels with an address, in ranking order
+        self.assertEqual([hotel["name"] for hotel in hotels], ["Hotel 0", "Hotel 2", "Hotel 3"])
+        self.assertEqual(hotels[1]["address"], "2 Main St")
+        # One hotel search, three lookups together, then after Hotel 1's miss one replacement
+        # plus one ahead: two rounds of lookups, the rest never started
+        self.assertEqual(len(FakeGoogleSearch.calls), 6)
+        self.assertLess(elapsed, 1.5)
+
+    async def test_property_lookups_spend_no_extra_quota(self):
+        names = [f"Hotel {i}" for i in range(8)]
+
+        def get_dict(search):
+            FakeGoogleSearch.calls.append(search.params)
+            time.sleep(0.1)
+            if search.params["q"] not in names:
+                return {"properties": [{"name": name} for name in names]}
+            return {"name": search.params["q"], "address": "Main St"}
+
+        with mock.patch.object(FakeGoogleSearch, "get_dict", get_dict):
+            hotels = await self.server.search_hotel_tool("Boston", "2025-10-01", "2025-10-03")
+            # Give cancelled or leftover lookups the time to reach the backend
+            await asyncio.sleep(0.5)
+        self.assertEqual([hotel["name"] for hotel in hotels], names[:3])
+        # As many upstream calls as before the lookups ran concurrently
+        self.assertEqual(len(FakeGoogleSearch.calls), 4)
+
+    async def test_last_waiter_cancels_search(self):
+        started = asyncio.Event()
+        finished = []
+
+        async def fetch(params):
+            started.set()
+            await asyncio.sleep(1)
+            finished.append(params)
+            return {}
+
+        first = asyncio.ensure_future(self.cache.get(self._params(), fetch))
+        second = asyncio.ensure_future(self.cache.get(self._params(), fetch))
+        await started.wait()
+        first.cancel()
+        await asyncio.sleep(0.05)
+        # Still awaited by the second caller
+        self.assertEqual(len(self.cache._inflight), 1)
+        second.cancel()
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.cache._inflight, {})
+        await asyncio.sleep(1)
+        self.assertEqual(finished, [])
+
+
+class TestUpstreamClient(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        import server
+        import serpapi_upstream
+        self.server = server
+        self.upstream = serpapi_upstream
+        self.client = serpapi_upstream.UpstreamClient(max_workers=2, max_queue=2)
+        self.addCleanup(self.client.close)
+
+    async def test_concurrency_limit_and_queue(self):
+        active = []
+        peak = []
+
+        def call():
+            active.append(1)
+            peak.append(len(active))
+            time.sleep(0.2)
+            active.pop()
+            return "ok"
+
+        calls = [asyncio.ensure_future(self.client.run(call)) for _ in range(4)]
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.client.stats()["queued"], 2)
+        # Two running and two queued: a fifth call is turned away
+        with self.assertRaises(self.upstream.UpstreamBusyError):
+            await self.client.run(call)
+        self.assertEqual(await asyncio.gather(*calls), ["ok"] * 4)
+        self.assertEqual(max(peak), 2)
+        stats = self.client.stats()
+        self.assertEqual((stats["queued"], stats["running"], stats["completed"], stats["rejected"]), (0, 0, 4, 1))
+        self.assertGreater(stats["max_wait"], 0.1)
+
+    async def test_search_stats_tool(self):
+        with mock.patch.object(self.server, "upstream", self.client), \
+                mock.patch.object(self.server, "search_cache", self.server.SearchCache()):
+            await self.client.run(lambda: "ok")
+            stats = await self.server.get_search_stats()
+        self.assertEqual(stats["upstream"]["completed"], 1)
+        self.assertEqual(stats["search_cache"], {"hits": 0, "misses": 0, "coalesced": 0, "entries": 0, "in_flight": 0})
+        self.assertIn(self.server.get_search_stats, self.server.TOOL_FUNCTIONS)
+
+    async def test_busy_error_not_cached(self):
+        with mock.patch.object(self.server, "upstream", self.client), \
+                mock.patch.object(self.client, "run", side_effect=self.upstream.UpstreamBusyError("busy")), \
+                mock.patch.object(self.server, "search_cache", self.server.SearchCache()):
+            result = await self.server.run_search({"engine": ENGINE, "q": "a"})
+            self.assertEqual(result, {"error": "busy"})
+            self.assertEqual(len(self.server.search_cache._entries), 0)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
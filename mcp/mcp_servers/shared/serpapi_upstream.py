@@ -0,0 +1,258 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Any
+from serpapi import GoogleSearch
+import requests
+
+# SerpAPI access shared by the Google Flights and Google Hotels MCP servers: a bounded thread
+# pool with one keep-alive HTTP session for the blocking upstream calls, and a result cache.
+# Each server imports it from this folder, and bundles it through its .spec file.
+
+logger = logging.getLogger("serpapi_upstream")
+
+# Upstream SerpAPI calls block, so they run on a thread pool of their own: at most
+# SERPAPI_MAX_WORKERS at once, with up to SERPAPI_MAX_QUEUE more waiting for a thread
+SERPAPI_MAX_WORKERS = int(os.getenv("SERPAPI_MAX_WORKERS", 4))
+SERPAPI_MAX_QUEUE = int(os.getenv("SERPAPI_MAX_QUEUE", 32))
+
+
+class UpstreamBusyError(RuntimeError):
+    """Raised when more upstream calls are waiting than the queue allows."""
+
+
+class UpstreamClient:
+    """
+    Runs blocking upstream calls on a bounded thread pool sharing one keep-alive HTTP session.
+
+    Unlike asyncio.to_thread(), a burst of tool calls neither grows the number of threads
+    nor opens a new HTTPS connection per request: calls beyond max_workers wait in a queue
+    of at most max_queue, and the time they wait is recorded.
+
+    Args:
+        max_workers: Calls running at once (default: SERPAPI_MAX_WORKERS)
+        max_queue: Calls allowed to wait for a thread (default: SERPAPI_MAX_QUEUE)
+    """
+
+    def __init__(
+        self, max_workers: int = SERPAPI_MAX_WORKERS, max_queue: int = SERPAPI_MAX_QUEUE
+    ):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = ThreadPoolExecutor(
+            self.max_workers, thread_name_prefix="serpapi"
+        )
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.max_workers
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def run(self, func, *args):
+        """
+        Run func(*args) on the pool and return its result.
+
+        Raises:
+            UpstreamBusyError: If the queue is full
+        """
+        with self._lock:
+            if self.running + self.queued >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise UpstreamBusyError(
+                    f"Too many upstream requests waiting ({self.queued} queued)"
+                )
+            self.queued += 1
+        submitted = time.monotonic()
+
+        def call():
+            wait = time.monotonic() - submitted
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+                depth = self.queued
+            logger.debug(
+                f"Upstream call started after waiting {wait * 1000:.0f} ms, {depth} still queued"
+            )
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+
+        future = self._executor.submit(call)
+
+        def release_if_cancelled(done):
+            # A call cancelled while queued never ran, so it never left the queue
+            if done.cancelled():
+                with self._lock:
+                    self.queued -= 1
+
+        future.add_done_callback(release_if_cancelled)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the queue depth, running and finished calls, and queue wait times in seconds."""
+        with self._lock:
+            started = self.completed + self.running
+            return {
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "average_wait": self.total_wait / started if started else 0.0,
+                "max_wait": self.max_wait,
+            }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+
+upstream = UpstreamClient()
+
+
+class SessionGoogleSearch(GoogleSearch):
+    """GoogleSearch sending its requests through the shared upstream session."""
+
+    def get_response(self, path="/search"):
+        url, parameter = self.construct_url(path)
+        return upstream.session.get(url, params=parameter, timeout=self.timeout)
+
+
+# Search result cache: agents repeat near-identical searches within seconds, each costing
+# API quota and a few seconds of latency. Seconds an engine's results are reused for:
+SEARCH_CACHE_TTL = {
+    "google_flights": int(os.getenv("SEARCH_CACHE_TTL_FLIGHTS", 300)),
+    "google_hotels": int(os.getenv("SEARCH_CACHE_TTL_HOTELS", 900)),
+}
+SEARCH_CACHE_DEFAULT_TTL = 300
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 256))
+
+
+class SearchCache:
+    """
+    Caches SerpAPI results, keyed by the search parameters without the API key.
+
+    Entries expire after the TTL of their engine and the least recently used entry is evicted
+    once max_entries is reached. Identical searches arriving while one is in flight share it
+    instead of calling SerpAPI again. Error results are never cached.
+
+    Args:
+        ttl: Seconds results are reused for, per engine (default: SEARCH_CACHE_TTL)
+        default_ttl: Seconds for engines not in ttl (default: SEARCH_CACHE_DEFAULT_TTL)
+        max_entries: Number of results kept (default: SEARCH_CACHE_MAX_ENTRIES)
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[Dict[str, float]] = None,
+        default_ttl: float = SEARCH_CACHE_DEFAULT_TTL,
+        max_entries: int = SEARCH_CACHE_MAX_ENTRIES,
+    ):
+        self.ttl = dict(SEARCH_CACHE_TTL if ttl is None else ttl)
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expiry time, result)
+        self._inflight = {}  # key -> task running the upstream search
+        self._waiters = {}  # key -> callers awaiting the in-flight search
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(params: Dict[str, Any]) -> str:
+        """Return the cache key of a search: its parameters without api_key, in sorted order."""
+        return json.dumps(
+            {k: v for k, v in params.items() if k != "api_key"},
+            sort_keys=True,
+            default=str,
+        )
+
+    async def get(self, params: Dict[str, Any], fetch):
+        """
+        Return the cached result of a search, or run it with fetch(params) and cache the result.
+
+        Args:
+            params: Parameters for the SerpAPI search
+            fetch: Coroutine function running the search
+
+        Returns:
+            Search results from the cache or from fetch
+        """
+        key = self.make_key(params)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(fetch(dict(params)))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._store(key, params.get("engine"), done))
+        # A cancelled caller must not cancel the search other callers are waiting for, but
+        # the last one cancels it, so a search nobody waits for anymore does not use quota
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters.get(key) == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            remaining = self._waiters.get(key, 1) - 1
+            if remaining:
+                self._waiters[key] = remaining
+            else:
+                self._waiters.pop(key, None)
+
+    def _store(self, key: str, engine: Optional[str], task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        result = task.result()
+        ttl = self.ttl.get(engine, self.default_ttl)
+        if not isinstance(result, dict) or "error" in result or ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the hit, miss and coalesced search counts, and the cached and in-flight searches."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "entries": len(self._entries),
+            "in_flight": len(self._inflight),
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._inflight.clear()
+        self._waiters.clear()